@@ -0,0 +1,315 @@
+"""Load test for the read API (``/data/{collection}`` and ``/data/?q=``).
+
+Replays a weighted, seeded mix of query shapes (first and deep pages, sorts,
+filters, collection searches, global search) against the FastAPI app
+in-process (``httpx.ASGITransport``), so results reflect the app and MongoDB
+rather than the network. Reports p50/p95/p99 latency and throughput per
+shape, plus a MongoDB ``explain`` summary of the find and count each shape
+runs: winning plan stages, index used, keys and documents examined.
+
+Seed a database first (or pass ``--seed-data``), then run from the
+repository root with MongoDB listening on ``MONGODB_URL``:
+
+    python -m benchmarks.seed_data --commits 10000000
+    python -m benchmarks.bench_data_api --commits 10000000 --output data.json
+    python -m benchmarks.bench_data_api --commits 10000000 --baseline data.json
+
+The request plan is drawn from ``--seed`` up front, so two runs with the same
+options issue exactly the same requests. Data API quotas are turned off, since
+the replay comes from one client and would mostly be answered with 429s;
+pass ``--rate-limit`` to measure with them on.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import sys
+import time
+
+import httpx
+from bson import SON
+
+from benchmarks.seed_data import WORDS, add_scale_arguments, scale_config, seed
+from src.config import settings
+
+# Stop pages from running past the data on small seeds
+MAX_DEEP_PAGE = 5000
+
+def _repo_id(rng: random.Random, config: Dict[str, int], hot: bool = False) -> int:
+    # Repository 0 is the largest under the seeder's Zipf weights
+    return 100_000 + (0 if hot else rng.randrange(config["repos"]))
+
+def _deep_page(rng: random.Random, total: int, limit: int) -> int:
+    return rng.randrange(1, max(min(total // limit, MAX_DEEP_PAGE), 1) + 1)
+
+# name -> (weight, request builder returning (path, params))
+QUERY_SHAPES: Dict[str, Tuple[int, Callable[[random.Random, Dict[str, int]], Tuple[str, Dict[str, Any]]]]] = {
+    "commits_first_page": (15, lambda rng, c: ("/data/github_commits", {"page": 1, "limit": 20})),
+    "commits_deep_page": (5, lambda rng, c: ("/data/github_commits", {"page": _deep_page(rng, c["commits"], 100), "limit": 100})),
+    "commits_by_repo": (15, lambda rng, c: ("/data/github_commits", {
+        "filter": json.dumps({"repository_id": _repo_id(rng, c, hot=rng.random() < 0.3)}), "limit": 50
+    })),
+    "commits_by_repo_by_date": (10, lambda rng, c: ("/data/github_commits", {
+        "filter": json.dumps({"repository_id": _repo_id(rng, c, hot=rng.random() < 0.3)}),
+        "sort_by": "author_date", "sort_order": "desc", "limit": 50
+    })),
+    "commits_search": (5, lambda rng, c: ("/data/github_commits", {"search": rng.choice(WORDS), "limit": 20})),
+    "pulls_by_updated": (8, lambda rng, c: ("/data/github_pulls", {
+        "sort_by": "updated_at", "sort_order": "asc", "page": _deep_page(rng, c["pulls"], 20), "limit": 20
+    })),
+    "pulls_search": (4, lambda rng, c: ("/data/github_pulls", {"search": rng.choice(WORDS), "limit": 20})),
+    "issues_open": (8, lambda rng, c: ("/data/github_issues", {
+        "filter": json.dumps({"state": "open"}), "page": rng.randrange(1, 21), "limit": 20
+    })),
+    "issues_by_repo_state": (8, lambda rng, c: ("/data/github_issues", {
+        "filter": json.dumps({"repository_id": _repo_id(rng, c), "state": rng.choice(["open", "closed"])}), "limit": 20
+    })),
+    "changelogs_by_issue": (5, lambda rng, c: ("/data/github_changelogs", {
+        "filter": json.dumps({"repository_id": _repo_id(rng, c), "issue_number": rng.randrange(1, max(c["issues"], 1) + 1)}),
+        "limit": 50
+    })),
+    "repos_page": (5, lambda rng, c: ("/data/github_repos", {"page": rng.randrange(1, 6), "limit": 50})),
+    "users_page": (4, lambda rng, c: ("/data/github_users", {"page": rng.randrange(1, 11), "limit": 50})),
+    "global_search": (8, lambda rng, c: ("/data/", {"q": rng.choice(WORDS), "limit": 20}))
+}
+
+def plan_requests(count: int, seed_value: int, config: Dict[str, int], shapes: List[str]) -> List[Tuple[str, str, Dict[str, Any]]]:
+    rng = random.Random(seed_value)
+    weights = [QUERY_SHAPES[name][0] for name in shapes]
+    plan = []
+    for name in rng.choices(shapes, weights=weights, k=count):
+        path, params = QUERY_SHAPES[name][1](rng, config)
+        # Every data request is scoped to one integration (tenant)
+        params["user_id"] = rng.randrange(config["tenants"]) + 1
+        plan.append((name, path, params))
+    return plan
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+async def replay(client: httpx.AsyncClient, plan: List[Tuple[str, str, Dict[str, Any]]], concurrency: int) -> Tuple[Dict[str, Dict[str, Any]], float]:
+    latencies: Dict[str, List[float]] = {}
+    statuses: Dict[str, Dict[int, int]] = {}
+    queue = iter(plan)
+
+    async def worker():
+        for name, path, params in queue:
+            started = time.perf_counter()
+            response = await client.get(path, params=params)
+            latencies.setdefault(name, []).append(time.perf_counter() - started)
+            counts = statuses.setdefault(name, {})
+            counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    shapes = {}
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        shapes[name] = {
+            "requests": len(values),
+            "errors": sum(count for code, count in statuses[name].items() if code >= 400),
+            "status": {str(code): count for code, count in sorted(statuses[name].items())},
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2)
+        }
+    return shapes, elapsed
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Stage names of a winning plan, outermost first (classic and SBE formats)"""
+    plan = plan.get("queryPlan", plan)
+    stages = []
+    while plan:
+        label = plan.get("stage", "?")
+        if plan.get("indexName"):
+            label += f"({plan['indexName']})"
+        stages.append(label)
+        children = plan.get("inputStages") or ([plan["inputStage"]] if "inputStage" in plan else [])
+        plan = children[0] if children else None
+    return stages
+
+def _find_key(document: Any, key: str) -> Optional[Dict[str, Any]]:
+    """First nested value stored under ``key`` (explain output nests differently per command)"""
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        children = document.values()
+    elif isinstance(document, list):
+        children = document
+    else:
+        return None
+    for child in children:
+        found = _find_key(child, key)
+        if found is not None:
+            return found
+    return None
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    planner = _find_key(explain, "queryPlanner") or {}
+    stats = _find_key(explain, "executionStats") or {}
+    stages = _plan_stages(planner.get("winningPlan", {}))
+    return {
+        "plan": " <- ".join(stages),
+        "collection_scan": any(stage.startswith("COLLSCAN") for stage in stages),
+        "in_memory_sort": any(stage.startswith("SORT") for stage in stages),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis")
+    }
+
+async def explain_shape(database, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Explain the find and count ``DataController`` runs for one request"""
+    from src.controllers.data_controller import DataController
+
+    if path == "/data/":
+        # Global search runs one capped find per collection; report the largest
+        query = DataController._search_query("github_commits", params["q"])
+        query["tenant_id"] = params["user_id"]
+        command = SON([("find", "github_commits"), ("filter", query), ("limit", params["limit"])])
+        return {"find": summarize_explain(await database.command("explain", command, verbosity="executionStats"))}
+
+    collection = path.rsplit("/", 1)[1]
+    limit = params.get("limit", 20)
+    query = DataController._build_query(collection, params["user_id"], params.get("filter"), params.get("search"))
+    sort = DataController._build_sort(collection, params.get("sort_by"), params.get("sort_order", "desc"))
+    find = SON([
+        ("find", collection), ("filter", query), ("sort", SON(sort)),
+        ("skip", (params.get("page", 1) - 1) * limit), ("limit", limit)
+    ])
+    count = SON([
+        ("aggregate", collection),
+        ("pipeline", [{"$match": query}, {"$group": {"_id": 1, "n": {"$sum": 1}}}]),
+        ("cursor", {})
+    ])
+    return {
+        "find": summarize_explain(await database.command("explain", find, verbosity="executionStats")),
+        "count": summarize_explain(await database.command("explain", count, verbosity="executionStats"))
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from src.helpers.database import close_mongo_connection, connect_to_mongo, get_database
+    from src.server import app
+
+    settings.DATABASE_NAME = args.database
+    settings.RATE_LIMIT_ENABLED = args.rate_limit
+    config = scale_config(args)
+    await connect_to_mongo()
+    try:
+        database = get_database()
+        if args.seed_data:
+            await seed(database, config)
+        documents = {
+            name: await database[name].estimated_document_count()
+            for name in sorted(await database.list_collection_names()) if name.startswith("github_")
+        }
+
+        shapes = args.shapes or list(QUERY_SHAPES)
+        warmup = plan_requests(args.warmup, args.seed + 1, config, shapes)
+        plan = plan_requests(args.requests, args.seed, config, shapes)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await replay(client, warmup, args.concurrency)
+            results, elapsed = await replay(client, plan, args.concurrency)
+
+        if args.explain:
+            samples = {}
+            for name, path, params in plan:
+                samples.setdefault(name, (path, params))
+            for name, (path, params) in samples.items():
+                try:
+                    results[name]["explain"] = await explain_shape(database, path, params)
+                except Exception as e:
+                    results[name]["explain"] = {"error": str(e)}
+    finally:
+        await close_mongo_connection()
+
+    return {
+        "benchmark": "data_api",
+        "config": {
+            **config, "requests": args.requests, "concurrency": args.concurrency, "rate_limit": args.rate_limit,
+            "shapes": {name: QUERY_SHAPES[name][0] for name in shapes}
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "documents": documents,
+        "wall_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(plan) / elapsed, 1) if elapsed > 0 else 0.0,
+        "shapes": results
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Human-readable regressions of ``report`` against ``baseline``"""
+    if report["config"] != baseline.get("config") or report["documents"] != baseline.get("documents"):
+        return ["Baseline was recorded against different data or settings; results are not comparable"]
+    regressions = []
+    before, after = baseline["throughput_rps"], report["throughput_rps"]
+    if before and (after - before) / before < -tolerance:
+        regressions.append(f"throughput_rps {before} -> {after} ({(after - before) / before:+.1%})")
+    for name, shape in report["shapes"].items():
+        old = baseline["shapes"].get(name)
+        if old is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if old[metric] and (shape[metric] - old[metric]) / old[metric] > tolerance:
+                regressions.append(f"{name}: {metric} {old[metric]} -> {shape[metric]} ({(shape[metric] - old[metric]) / old[metric]:+.1%})")
+        if shape["errors"] > old["errors"]:
+            regressions.append(f"{name}: errors {old['errors']} -> {shape['errors']}")
+    return regressions
+
+def print_summary(report: Dict[str, Any]):
+    print(f"{report['throughput_rps']:,.1f} requests/s over {report['wall_seconds']:.1f}s")
+    print(f"{'shape':<26}{'n':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  plan")
+    for name, shape in report["shapes"].items():
+        plan = shape.get("explain", {}).get("find", {})
+        note = plan.get("plan", "")
+        if plan.get("docs_examined") is not None:
+            note += f" [docs {plan['docs_examined']:,}, keys {plan['keys_examined']:,}]"
+        print(
+            f"{name:<26}{shape['requests']:>6}{shape['errors']:>5}"
+            f"{shape['p50_ms']:>9.1f}{shape['p95_ms']:>9.1f}{shape['p99_ms']:>9.1f}  {note}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_scale_arguments(parser)
+    parser.add_argument("--database", default="github_integration_load")
+    parser.add_argument("--seed-data", action="store_true", help="drop and reseed the database first")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--shapes", nargs="*", choices=list(QUERY_SHAPES), help="limit the mix to these query shapes")
+    parser.add_argument("--rate-limit", action="store_true", help="keep data API quotas on (429s count as errors)")
+    parser.add_argument("--no-explain", dest="explain", action="store_false")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark: commit ingestion from a local git mirror.
+
+Builds a throwaway repository with ``git fast-import`` (every commit edits a
+few files, some binary), mirrors it with ``GitMirror`` as a sync would, and
+streams every commit through ``git log --numstat`` and the commit
+transformer. Then it adds commits upstream and times the incremental run,
+which excludes the commits already ingested. Checks that every commit was
+read once and that the stats match what was written.
+
+Needs only git; run from the repository root:
+
+    python -m benchmarks.bench_git_commits [--commits 100000] [--new 1000]
+"""
+from unittest import mock
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+from src.config import settings
+from src.helpers.git_commits import GitMirror
+from src.helpers.transformers import TRANSFORMERS
+
+def fast_import_stream(start: int, count: int, seed: int, parent: bool) -> tuple:
+    """A fast-import stream of ``count`` commits and the number of lines it adds"""
+    rng = random.Random(seed)
+    chunks = []
+    added = 0
+    for i in range(start, start + count):
+        lines = [f"line {i} {n}" for n in range(rng.randrange(1, 20))]
+        text = ("\n".join(lines) + "\n").encode()
+        message = f"Change {i}\n\nDétails of change {i}\n".encode()
+        when = 1_600_000_000 + i * 60
+        chunks.append(f"commit refs/heads/main\nmark :{i + 1}\n".encode())
+        chunks.append(f"author Dev {i % 7} <dev{i % 7}@example.com> {when} +0200\n".encode())
+        chunks.append(f"committer Dev {i % 7} <dev{i % 7}@example.com> {when} +0000\n".encode())
+        chunks.append(f"data {len(message)}\n".encode() + message)
+        if i == start and parent:
+            # Continue the branch already in the repository
+            chunks.append(b"from refs/heads/main^0\n")
+        # Each commit replaces one of 50 files, so earlier content is removed too
+        chunks.append(f"M 644 inline src/file{i % 50}.txt\ndata {len(text)}\n".encode() + text + b"\n")
+        added += len(lines)
+        if rng.random() < 0.05:
+            blob = b"\x00" + bytes(rng.randrange(256) for _ in range(63))
+            chunks.append(f"M 644 inline assets/blob{i}.bin\ndata {len(blob)}\n".encode() + blob + b"\n")
+    return b"".join(chunks), added
+
+def git(*args: str, cwd: str, stdin: bytes = None) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, input=stdin, check=True, capture_output=True).stdout.decode()
+
+async def ingest(mirror: GitMirror, exclude: list, page_size: int) -> tuple:
+    transform = TRANSFORMERS["github_commits"]
+    context = {"user_id": 1, "repository_id": 1, "repository_name": "o/r"}
+    shas, additions = [], 0
+    async for items in mirror.commits(exclude, "https://github.com/o/r", page_size):
+        for item in items:
+            doc = transform(item, context)
+            shas.append(doc["sha"])
+            additions += doc["additions"]
+    return shas, additions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commits", type=int, default=100000)
+    parser.add_argument("--new", type=int, default=1000, help="commits added before the incremental run")
+    parser.add_argument("--page-size", type=int, default=settings.GIT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        upstream = os.path.join(workdir, "upstream.git")
+        git("init", "--bare", "--quiet", "--initial-branch=main", upstream, cwd=workdir)
+        stream, added = fast_import_stream(0, args.commits, 42, parent=False)
+        started = time.perf_counter()
+        git("fast-import", "--quiet", cwd=upstream, stdin=stream)
+        print(f"Built {args.commits:,} commits in {time.perf_counter() - started:.1f}s")
+
+        with mock.patch.object(settings, "GIT_MIRROR_PATH", os.path.join(workdir, "mirrors")):
+            mirror = GitMirror(1, upstream, "main")
+
+            started = time.perf_counter()
+            asyncio.run(mirror.fetch())
+            fetched = time.perf_counter() - started
+            started = time.perf_counter()
+            shas, additions = asyncio.run(ingest(mirror, [], args.page_size))
+            elapsed = time.perf_counter() - started
+            assert len(shas) == len(set(shas)) == args.commits, "every commit is read once"
+            assert additions == added, "numstat counts every added line"
+            print(f"Full:        fetch {fetched:6.1f}s  log {elapsed:6.1f}s  {len(shas) / elapsed:>10,.0f} commits/s")
+
+            stream, _ = fast_import_stream(args.commits, args.new, 7, parent=True)
+            git("fast-import", "--quiet", cwd=upstream, stdin=stream)
+            started = time.perf_counter()
+            asyncio.run(mirror.fetch())
+            reachable = asyncio.run(mirror.reachable())
+            fetched = time.perf_counter() - started
+            started = time.perf_counter()
+            new_shas, _ = asyncio.run(ingest(mirror, [sha for sha in shas if sha in reachable], args.page_size))
+            elapsed = time.perf_counter() - started
+            assert len(new_shas) == args.new and not set(new_shas) & set(shas), "only new commits are read"
+            print(f"Incremental: fetch {fetched:6.1f}s  log {elapsed:6.1f}s  {len(new_shas):,} new commits")
+
+if __name__ == "__main__":
+    main()
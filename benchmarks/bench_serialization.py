@@ -0,0 +1,123 @@
+"""Micro-benchmark: response serialization of ``/data`` pages.
+
+Compares the path FastAPI takes for a returned dict (``str()`` on every
+``_id``, ``jsonable_encoder``, then ``json.dumps``) with ``BSONJSONResponse``
+encoding the documents as read from MongoDB, using orjson when installed and
+the stdlib encoder otherwise. Reports CPU time per page and the bytes
+produced, and checks all paths decode to the same JSON.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_serialization [--docs 100] [--body-chars 4000] [--pages 500]
+"""
+from datetime import datetime, timedelta
+from unittest import mock
+import argparse
+import json
+import random
+import time
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from src.helpers import responses
+
+def make_issues(count: int, body_chars: int, seed: int = 42) -> list:
+    """Issue documents shaped as Motor returns them: ObjectId, naive datetimes, nested lists"""
+    rng = random.Random(seed)
+    base = datetime(2023, 1, 1)
+    docs = []
+    for i in range(count):
+        created = base + timedelta(minutes=rng.randrange(500000), microseconds=rng.randrange(1000000))
+        docs.append({
+            "_id": ObjectId(),
+            "tenant_id": 1,
+            "github_id": 1_000_000 + i,
+            "number": i,
+            "title": f"Issue {i}: " + " ".join(rng.choice(["crash", "slow", "login", "sync", "docs"]) for _ in range(6)),
+            "body": ("Steps to reproduce ... " * (body_chars // 22 + 1))[:body_chars],
+            "state": rng.choice(["open", "closed"]),
+            "user_login": "octocat",
+            "user_id": 1,
+            "labels": [rng.choice(["bug", "enhancement", "question"]) for _ in range(rng.randrange(4))],
+            "assignees": [{"login": "hubot", "id": 2}],
+            "html_url": f"https://github.com/o/r/issues/{i}",
+            "created_at": created,
+            "updated_at": created + timedelta(days=rng.randrange(30)),
+            "closed_at": created + timedelta(days=31) if rng.random() < 0.5 else None,
+            "repository_id": 100,
+            "repository_name": "o/r",
+            "content_hash": f"{rng.getrandbits(128):032x}"
+        })
+    return docs
+
+def page(docs: list) -> dict:
+    return {
+        "data": docs,
+        "pagination": {
+            "current_page": 1, "total_pages": 10, "total_items": 1000,
+            "items_per_page": len(docs), "has_next": True, "has_prev": False
+        }
+    }
+
+def legacy_render(docs: list) -> bytes:
+    """What the controller and FastAPI's default JSONResponse did per request"""
+    for doc in docs:
+        if "_id" in doc:
+            doc["_id"] = str(doc["_id"])
+    return json.dumps(
+        jsonable_encoder(page(docs)), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+def stdlib_render(docs: list) -> bytes:
+    with mock.patch.object(responses, "orjson", None):
+        return responses.dumps(page(docs))
+
+def fast_render(docs: list) -> bytes:
+    return responses.dumps(page(docs))
+
+def measure(runs: list, make_docs, pages: int, repeat: int) -> list:
+    """Best-of-N CPU seconds per page for each run, interleaved so they share noise"""
+    best = [float("inf")] * len(runs)
+    for _ in range(repeat):
+        for index, run in enumerate(runs):
+            # Fresh documents each time: the legacy path rewrites _id in place
+            batches = [make_docs() for _ in range(pages)]
+            started = time.process_time()
+            for docs in batches:
+                run(docs)
+            best[index] = min(best[index], (time.process_time() - started) / pages)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100, help="documents per page")
+    parser.add_argument("--body-chars", type=int, default=4000)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    template = make_issues(args.docs, args.body_chars)
+    make_docs = lambda: [dict(doc, _id=ObjectId()) for doc in template]
+
+    runs = [("legacy", legacy_render), ("stdlib", stdlib_render)]
+    if responses.orjson is not None:
+        runs.append(("orjson", fast_render))
+    else:
+        print("orjson is not installed; only the stdlib fallback is measured")
+
+    sample = template[:5]
+    expected = json.loads(legacy_render([dict(doc) for doc in sample]))
+    for name, run in runs[1:]:
+        assert json.loads(run([dict(doc) for doc in sample])) == expected, f"{name} output differs"
+
+    sizes = [len(run(make_docs())) for _, run in runs]
+    timings = measure([run for _, run in runs], make_docs, args.pages, args.repeat)
+
+    print(f"{args.docs} documents per page, {args.body_chars} character bodies")
+    print(f"{'path':<10}{'CPU ms/page':>14}{'bytes':>12}{'speedup':>10}")
+    for (name, _), seconds, size in zip(runs, timings, sizes):
+        print(f"{name:<10}{seconds * 1000:>14.3f}{size:>12,}{timings[0] / seconds:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
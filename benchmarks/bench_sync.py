@@ -0,0 +1,218 @@
+"""End-to-end sync benchmark against the mock GitHub API and a local MongoDB.
+
+Starts ``benchmarks.mock_github`` in a subprocess, points ``GitHubClient`` at
+it and runs ``SyncController.sync_all_data`` into a scratch database (dropped
+first). With ``--resync`` the mock then advances one generation and a second
+sync measures the incremental path. Each run reports GitHub requests, stored
+and written documents, docs/sec, wall time and peak RSS as JSON.
+
+Run from the repository root with MongoDB listening on ``MONGODB_URL``:
+
+    python -m benchmarks.bench_sync --repos 20 --commits 2000 --resync --output sync.json
+    python -m benchmarks.bench_sync --repos 20 --commits 2000 --resync --baseline sync.json
+
+Given the same options, the mock serves identical data, so results are
+comparable across commits. ``--baseline`` exits non-zero when a run is slower,
+makes more requests or uses more memory than the baseline by more than
+``--tolerance``.
+"""
+from datetime import datetime
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.mock_github import add_synthetic_arguments, synthetic_argv, synthetic_org
+from src.config import settings
+
+COLLECTIONS = [
+    "github_organizations", "github_repos", "github_commits", "github_pulls",
+    "github_issues", "github_changelogs", "github_users"
+]
+
+# (metric, higher is better)
+COMPARED = [
+    ("wall_seconds", False),
+    ("docs_per_sec", True),
+    ("github_requests", False),
+    ("peak_rss_mb", False)
+]
+
+def peak_rss_mb() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(usage / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_mock(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_github", "--port", str(port)] + synthetic_argv(args)
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Mock GitHub API exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/_stats", timeout=1).raise_for_status()
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Mock GitHub API did not start within 30s")
+
+async def run_sync(name: str, mock_url: str, expected: Dict[str, int]) -> Dict[str, Any]:
+    from src.controllers.sync_controller import SyncController
+    from src.helpers.database import get_database
+
+    async with httpx.AsyncClient(base_url=mock_url) as mock:
+        before = (await mock.get("/_stats")).json()
+        started = time.perf_counter()
+        stats = await SyncController().sync_all_data(1, f"bench-token-{name}")
+        wall = time.perf_counter() - started
+        after = (await mock.get("/_stats")).json()
+
+    db = get_database()
+    stored = {collection: await db[collection].count_documents({}) for collection in COLLECTIONS}
+    change_detection = stats.get("change_detection") or {}
+    processed = stats["documents_written"] + change_detection.get("skipped", 0)
+    routes = {
+        route: count - before["routes"].get(route, 0)
+        for route, count in after["routes"].items()
+        if count - before["routes"].get(route, 0)
+    }
+    return {
+        "name": name,
+        "wall_seconds": round(wall, 3),
+        "github_requests": after["requests"] - before["requests"],
+        "github_requests_by_route": routes,
+        "documents_processed": processed,
+        "documents_written": stats["documents_written"],
+        "documents_deleted": stats["documents_deleted"],
+        "docs_per_sec": round(processed / wall, 1) if wall > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stored": stored,
+        "missing": {
+            collection: expected[collection] - stored[collection]
+            for collection in COLLECTIONS if stored[collection] != expected[collection]
+        },
+        "sync_stats": stats
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from src.helpers.database import close_mongo_connection, connect_to_mongo, db
+
+    port = free_port()
+    mock_url = f"http://127.0.0.1:{port}"
+    process = start_mock(args, port)
+    settings.GITHUB_API_BASE = mock_url
+    settings.DATABASE_NAME = args.database
+    org = synthetic_org(args)
+
+    try:
+        await connect_to_mongo()
+        await db.client.drop_database(args.database)
+        # Recreate the indexes dropped with the database
+        await close_mongo_connection()
+        await connect_to_mongo()
+        # Syncs only write for a tenant whose integration is active
+        user = org.user()
+        await db.database.github_integration.insert_one({
+            "github_user_id": user["id"],
+            "username": user["login"],
+            "email": user["email"],
+            "access_token": "bench-token",
+            "integration_status": "active",
+            "connection_timestamp": datetime.utcnow(),
+            "last_sync": None
+        })
+
+        runs = [await run_sync("initial", mock_url, org.expected_documents(settings.COMMIT_STORAGE == "shared"))]
+        if args.resync:
+            async with httpx.AsyncClient(base_url=mock_url) as mock:
+                await mock.post("/_generation")
+            org.generation += 1
+            runs.append(await run_sync("resync", mock_url, org.expected_documents(settings.COMMIT_STORAGE == "shared")))
+    finally:
+        await close_mongo_connection()
+        process.terminate()
+        process.wait()
+
+    return {
+        "benchmark": "sync",
+        "config": {**org.config(), "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "rate_limit": args.rate_limit},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "settings": {
+            name: getattr(settings, name)
+            for name in dir(settings) if name.startswith(("SYNC_", "TOKEN_POOL_"))
+        },
+        "runs": runs
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Human-readable regressions of ``report`` against ``baseline``"""
+    if report["config"] != baseline.get("config"):
+        return ["Baseline was recorded with different data; results are not comparable"]
+    previous = {run["name"]: run for run in baseline.get("runs", [])}
+    regressions = []
+    for run in report["runs"]:
+        old = previous.get(run["name"])
+        if old is None:
+            continue
+        for metric, higher_is_better in COMPARED:
+            before, after = old[metric], run[metric]
+            if not before:
+                continue
+            change = (after - before) / before
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append(f"{run['name']}: {metric} {before} -> {after} ({change:+.1%})")
+    return regressions
+
+def print_summary(report: Dict[str, Any]):
+    print(f"{'run':<10}{'wall s':>10}{'requests':>10}{'processed':>11}{'written':>10}{'docs/s':>10}{'rss MB':>9}")
+    for run in report["runs"]:
+        print(
+            f"{run['name']:<10}{run['wall_seconds']:>10.2f}{run['github_requests']:>10}"
+            f"{run['documents_processed']:>11}{run['documents_written']:>10}"
+            f"{run['docs_per_sec']:>10,.0f}{run['peak_rss_mb']:>9.1f}"
+        )
+        if run["missing"]:
+            print(f"  documents missing vs generated data: {run['missing']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_synthetic_arguments(parser)
+    parser.add_argument("--database", default="github_integration_bench", help="scratch database, dropped before the run")
+    parser.add_argument("--resync", action="store_true", help="also time a second sync after the data changes")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
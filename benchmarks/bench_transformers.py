@@ -0,0 +1,160 @@
+"""Micro-benchmark: hand-written document builders vs compiled transformers.
+
+Reports the compiled transformers with a cold timestamp cache (first page of a
+sync) and a warm one (steady state, timestamps repeat across pages), plus
+per-document Pydantic validation vs one ``TypeAdapter`` call per batch.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_transformers [--docs 50000] [--repeat 5]
+"""
+from datetime import datetime, timedelta
+import argparse
+import random
+import time
+
+from src.helpers.transformers import MAPPINGS, TRANSFORMERS, parse_timestamp
+
+def legacy_commit_doc(commit_data: dict, context: dict) -> dict:
+    """The builder SyncController used before the declarative mappings"""
+    return {
+        "sha": commit_data["sha"],
+        "message": commit_data["commit"]["message"],
+        "author_name": commit_data["commit"]["author"].get("name"),
+        "author_email": commit_data["commit"]["author"].get("email"),
+        "author_date": datetime.fromisoformat(commit_data["commit"]["author"]["date"].replace("Z", "+00:00")),
+        "committer_name": commit_data["commit"]["committer"].get("name"),
+        "committer_email": commit_data["commit"]["committer"].get("email"),
+        "committer_date": datetime.fromisoformat(commit_data["commit"]["committer"]["date"].replace("Z", "+00:00")),
+        "html_url": commit_data["html_url"],
+        "repository_id": context["repository_id"],
+        "repository_name": context["repository_name"],
+        "additions": commit_data.get("stats", {}).get("additions"),
+        "deletions": commit_data.get("stats", {}).get("deletions"),
+        "total_changes": commit_data.get("stats", {}).get("total"),
+        "user_id": context["user_id"]
+    }
+
+def legacy_pull_doc(pull_data: dict, context: dict) -> dict:
+    return {
+        "github_id": pull_data["id"],
+        "number": pull_data["number"],
+        "title": pull_data["title"],
+        "body": pull_data.get("body"),
+        "state": pull_data["state"],
+        "user_login": pull_data["user"]["login"],
+        "user_id": pull_data["user"]["id"],
+        "assignee_login": pull_data["assignee"]["login"] if pull_data.get("assignee") else None,
+        "assignee_id": pull_data["assignee"]["id"] if pull_data.get("assignee") else None,
+        "html_url": pull_data["html_url"],
+        "created_at": datetime.fromisoformat(pull_data["created_at"].replace("Z", "+00:00")),
+        "updated_at": datetime.fromisoformat(pull_data["updated_at"].replace("Z", "+00:00")),
+        "closed_at": datetime.fromisoformat(pull_data["closed_at"].replace("Z", "+00:00")) if pull_data.get("closed_at") else None,
+        "merged_at": datetime.fromisoformat(pull_data["merged_at"].replace("Z", "+00:00")) if pull_data.get("merged_at") else None,
+        "head_ref": pull_data["head"]["ref"],
+        "base_ref": pull_data["base"]["ref"],
+        "repository_id": context["repository_id"],
+        "repository_name": context["repository_name"],
+        "integration_user_id": context["user_id"]
+    }
+
+def _timestamp(rng: random.Random, base: datetime) -> str:
+    # Commit timestamps cluster (rebases, merges, bots), so values repeat
+    return (base + timedelta(minutes=rng.randrange(20000))).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def make_commits(count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    base = datetime(2023, 1, 1)
+    items = []
+    for i in range(count):
+        when = _timestamp(rng, base)
+        items.append({
+            "sha": f"{i:040x}",
+            "commit": {
+                "message": f"Fix issue #{i}",
+                "author": {"name": "Octo Cat", "email": "octo@example.com", "date": when},
+                "committer": {"name": "GitHub", "email": "noreply@github.com", "date": when}
+            },
+            "html_url": f"https://github.com/o/r/commit/{i:040x}"
+        })
+    return items
+
+def make_pulls(count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    base = datetime(2023, 1, 1)
+    items = []
+    for i in range(count):
+        merged = rng.random() < 0.5
+        # GitHub stamps closed_at and merged_at identically when a PR is merged
+        closed_at = _timestamp(rng, base) if merged else None
+        items.append({
+            "id": i,
+            "number": i,
+            "title": f"Pull request {i}",
+            "body": "Body " * 20,
+            "state": "closed" if merged else "open",
+            "user": {"login": "octocat", "id": 1},
+            "assignee": {"login": "hubot", "id": 2} if rng.random() < 0.3 else None,
+            "html_url": f"https://github.com/o/r/pull/{i}",
+            "created_at": _timestamp(rng, base),
+            "updated_at": _timestamp(rng, base),
+            "closed_at": closed_at,
+            "merged_at": closed_at,
+            "head": {"ref": "feature"},
+            "base": {"ref": "main"}
+        })
+    return items
+
+def measure(runs: list, count: int, repeat: int) -> list:
+    """Best-of-N documents per second for each run, interleaved so they share noise"""
+    best = [float("inf")] * len(runs)
+    for _ in range(repeat):
+        for index, (run, warm) in enumerate(runs):
+            if not warm:
+                parse_timestamp.cache_clear()
+            started = time.perf_counter()
+            run()
+            best[index] = min(best[index], time.perf_counter() - started)
+    return [count / elapsed for elapsed in best]
+
+def transform_all(transform, items: list, context: dict):
+    return lambda: [transform(item, context) for item in items]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    context = {"user_id": 1, "repository_id": 1, "repository_name": "o/r"}
+    cases = [
+        ("github_commits", legacy_commit_doc, make_commits(args.docs)),
+        ("github_pulls", legacy_pull_doc, make_pulls(args.docs))
+    ]
+
+    print("Transformation (docs/s)")
+    print(f"{'collection':<16}{'legacy':>12}{'compiled':>12}{'warm':>12}{'speedup':>10}")
+    for collection, legacy, items in cases:
+        compiled = TRANSFORMERS[collection]
+        legacy_rate, cold_rate, warm_rate = measure([
+            (transform_all(legacy, items, context), False),
+            (transform_all(compiled, items, context), False),
+            (transform_all(compiled, items, context), True)
+        ], len(items), args.repeat)
+        print(f"{collection:<16}{legacy_rate:>12,.0f}{cold_rate:>12,.0f}{warm_rate:>12,.0f}{warm_rate / legacy_rate:>9.2f}x")
+
+    print()
+    print("Validation (docs/s)")
+    print(f"{'collection':<16}{'per-doc':>12}{'batch':>12}{'speedup':>10}")
+    for collection, _, items in cases:
+        mapping = MAPPINGS[collection]
+        docs = [mapping.transform(item, context) for item in items]
+        pages = [docs[start:start + 100] for start in range(0, len(docs), 100)]
+        per_doc_rate, batch_rate = measure([
+            (lambda: [mapping.model(**doc) for doc in docs], True),
+            (lambda: [mapping.validate(page) for page in pages], True)
+        ], len(docs), max(args.repeat // 2, 1))
+        print(f"{collection:<16}{per_doc_rate:>12,.0f}{batch_rate:>12,.0f}{batch_rate / per_doc_rate:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
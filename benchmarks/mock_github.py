@@ -0,0 +1,344 @@
+"""A local stand-in for the GitHub REST endpoints ``GitHubClient`` calls.
+
+Serves a ``SyntheticOrg`` with GitHub's pagination (``page``/``per_page``,
+default 30, max 100, ``Link`` headers), per-token ``X-RateLimit-*`` headers
+and 403s once a token is exhausted, strong ``ETag``s with 304 responses that
+do not count against the limit, and injected latency. Besides the listings
+it answers ``GET /repos/{owner}/{repo}`` (with ``parent`` for forks), the
+compare API across a fork network, ``GET /rate_limit`` and the ``since``
+filters of the commit and issue listings, so the fork, incremental and
+budgeted scheduling paths of a sync can run locally.
+
+Run standalone (the sync benchmark starts it for you):
+
+    python -m benchmarks.mock_github --port 8765 [--latency-ms 50]
+
+``GET /_stats`` returns request counts; ``POST /_generation`` advances the
+synthetic data to its next generation, as if the organization kept working
+between two syncs.
+"""
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+from collections import Counter
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from benchmarks.synthetic import EPOCH, TIMESTAMP_FORMAT, SyntheticOrg
+
+DEFAULT_PER_PAGE = 30
+MAX_PER_PAGE = 100
+
+class RateLimiter:
+    """GitHub's primary rate limit, tracked per token"""
+
+    def __init__(self, limit: int, window: float = 3600):
+        self.limit = limit
+        self.window = window
+        self.tokens: Dict[str, List[float]] = {}
+
+    def charge(self, token: str, cost: int) -> Dict[str, str]:
+        now = time.time()
+        state = self.tokens.get(token)
+        if state is None or now >= state[1]:
+            state = self.tokens[token] = [self.limit, now + self.window]
+        state[0] = max(state[0] - cost, 0)
+        return self.headers(token)
+
+    def exhausted(self, token: str) -> bool:
+        state = self.tokens.get(token)
+        return state is not None and state[0] <= 0 and time.time() < state[1]
+
+    def status(self, token: str) -> Dict[str, int]:
+        """The token's ``core`` budget as ``GET /rate_limit`` reports it"""
+        remaining, reset_at = self.tokens.get(token, [self.limit, time.time() + self.window])
+        return {"limit": self.limit, "remaining": int(remaining), "reset": int(reset_at), "used": int(self.limit - remaining)}
+
+    def headers(self, token: str) -> Dict[str, str]:
+        status = self.status(token)
+        return {
+            "X-RateLimit-Limit": str(status["limit"]),
+            "X-RateLimit-Remaining": str(status["remaining"]),
+            "X-RateLimit-Reset": str(status["reset"]),
+            "X-RateLimit-Used": str(status["used"]),
+            "X-RateLimit-Resource": "core"
+        }
+
+def create_app(
+    org: SyntheticOrg,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    rate_limit: int = 5000,
+    seed: int = 0
+) -> FastAPI:
+    app = FastAPI(title="Mock GitHub API", docs_url=None, redoc_url=None, openapi_url=None)
+    limiter = RateLimiter(rate_limit)
+    jitter = random.Random(seed)
+    stats: Dict[str, Counter] = {"routes": Counter(), "status": Counter()}
+
+    async def respond(request: Request, route: str, total: Optional[int], fetch: Callable[[int, int], Any]) -> Response:
+        """Serve one (optionally paginated) listing the way GitHub does"""
+        stats["routes"][route] += 1
+        if latency_ms or jitter_ms:
+            await asyncio.sleep((latency_ms + jitter.uniform(0, jitter_ms)) / 1000)
+
+        token = request.headers.get("authorization", "anonymous")
+        if limiter.exhausted(token):
+            stats["status"][403] += 1
+            return JSONResponse(
+                {"message": "API rate limit exceeded", "documentation_url": "https://docs.github.com/rest/rate-limit"},
+                status_code=403, headers=limiter.headers(token)
+            )
+
+        headers: Dict[str, str] = {}
+        if total is None:
+            body = fetch(0, 0)
+        else:
+            page = max(int(request.query_params.get("page", 1)), 1)
+            per_page = min(max(int(request.query_params.get("per_page", DEFAULT_PER_PAGE)), 1), MAX_PER_PAGE)
+            start = (page - 1) * per_page
+            body = fetch(start, start + per_page)
+            links = _links(request, page, per_page, total)
+            if links:
+                headers["Link"] = links
+
+        content = json.dumps(body, separators=(",", ":")).encode()
+        etag = '"%s"' % hashlib.md5(content).hexdigest()
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "private, max-age=60, s-maxage=60"
+
+        # Conditional requests that hit are free, as on GitHub
+        if request.headers.get("if-none-match") == etag:
+            headers.update(limiter.headers(token))
+            stats["status"][304] += 1
+            return Response(status_code=304, headers=headers)
+
+        headers.update(limiter.charge(token, 1))
+        stats["status"][200] += 1
+        return Response(content, media_type="application/json; charset=utf-8", headers=headers)
+
+    def not_found(route: str) -> Response:
+        stats["routes"][route] += 1
+        stats["status"][404] += 1
+        return JSONResponse({"message": "Not Found"}, status_code=404)
+
+    def invalid(route: str, message: str) -> Response:
+        stats["routes"][route] += 1
+        stats["status"][422] += 1
+        return JSONResponse({"message": message}, status_code=422)
+
+    def resolve(repo: Dict[str, Any], ref: str) -> Optional[Dict[str, Any]]:
+        """A compare ref, ``branch`` or ``owner:branch``, as a repository of the fork network"""
+        owner, _, branch = ref.rpartition(":")
+        target = org.network_repository(repo, owner) if owner else repo
+        if target is None or branch != target["default_branch"]:
+            return None
+        return target
+
+    @app.get("/user")
+    async def get_user(request: Request):
+        return await respond(request, "/user", None, lambda start, stop: org.user())
+
+    @app.get("/rate_limit")
+    async def get_rate_limit(request: Request):
+        # Not counted against the limit, as on GitHub
+        stats["routes"]["/rate_limit"] += 1
+        stats["status"][200] += 1
+        token = request.headers.get("authorization", "anonymous")
+        core = limiter.status(token)
+        return JSONResponse({"resources": {"core": core}, "rate": core}, headers=limiter.headers(token))
+
+    @app.get("/user/orgs")
+    async def get_user_orgs(request: Request):
+        orgs = org.organizations()
+        return await respond(request, "/user/orgs", len(orgs), lambda start, stop: orgs[start:stop])
+
+    @app.get("/user/repos")
+    async def get_user_repos(request: Request):
+        repos = org.user_repositories()
+        return await respond(request, "/user/repos", len(repos), lambda start, stop: repos[start:stop])
+
+    @app.get("/orgs/{login}/repos")
+    async def get_org_repos(request: Request, login: str):
+        repos = org.organization_repositories(login)
+        return await respond(request, "/orgs/{org}/repos", len(repos), lambda start, stop: repos[start:stop])
+
+    @app.get("/orgs/{login}/members")
+    async def get_org_members(request: Request, login: str):
+        members = org.members(login)
+        return await respond(request, "/orgs/{org}/members", len(members), lambda start, stop: members[start:stop])
+
+    @app.get("/repos/{owner}/{name}")
+    async def get_repository(request: Request, owner: str, name: str):
+        repo = org.repository(f"{owner}/{name}")
+        if repo is None:
+            return not_found("/repos/{owner}/{repo}")
+        return await respond(request, "/repos/{owner}/{repo}", None, lambda start, stop: org.repository_detail(repo))
+
+    @app.get("/repos/{owner}/{name}/commits")
+    async def get_commits(request: Request, owner: str, name: str):
+        repo = org.repository(f"{owner}/{name}")
+        if repo is None:
+            return not_found("/repos/{owner}/{repo}/commits")
+        try:
+            since = _since(request)
+        except ValueError:
+            return invalid("/repos/{owner}/{repo}/commits", "Invalid since")
+        total = org.commit_count(repo) - org.first_commit_since(repo, since)
+        return await respond(
+            request, "/repos/{owner}/{repo}/commits", total,
+            lambda start, stop: org.commits(repo, start, stop, since)
+        )
+
+    @app.get("/repos/{owner}/{name}/compare/{basehead}")
+    async def get_comparison(request: Request, owner: str, name: str, basehead: str):
+        repo = org.repository(f"{owner}/{name}")
+        base_ref, separator, head_ref = basehead.partition("...")
+        base = resolve(repo, base_ref) if repo is not None and separator else None
+        head = resolve(repo, head_ref) if base is not None else None
+        if head is None:
+            return not_found("/repos/{owner}/{repo}/compare/{basehead}")
+        comparison = org.compare(base, head)
+        # Only the commits are paginated; every page repeats the summary
+        return await respond(
+            request, "/repos/{owner}/{repo}/compare/{basehead}", comparison["ahead_by"],
+            lambda start, stop: {**comparison, "commits": org.compare_commits(base, head, start, stop)}
+        )
+
+    @app.get("/repos/{owner}/{name}/pulls")
+    async def get_pulls(request: Request, owner: str, name: str):
+        repo = org.repository(f"{owner}/{name}")
+        if repo is None:
+            return not_found("/repos/{owner}/{repo}/pulls")
+        return await respond(
+            request, "/repos/{owner}/{repo}/pulls", org.pulls_per_repo,
+            lambda start, stop: org.pulls(repo, start, stop)
+        )
+
+    @app.get("/repos/{owner}/{name}/issues")
+    async def get_issues(request: Request, owner: str, name: str):
+        repo = org.repository(f"{owner}/{name}")
+        if repo is None:
+            return not_found("/repos/{owner}/{repo}/issues")
+        try:
+            since = _since(request)
+        except ValueError:
+            return invalid("/repos/{owner}/{repo}/issues", "Invalid since")
+        if since is None:
+            return await respond(
+                request, "/repos/{owner}/{repo}/issues", org.issue_count(),
+                lambda start, stop: org.issues(repo, start, stop)
+            )
+        issues = org.issues_since(repo, since)
+        return await respond(request, "/repos/{owner}/{repo}/issues", len(issues), lambda start, stop: issues[start:stop])
+
+    @app.get("/repos/{owner}/{name}/issues/{number}/events")
+    async def get_issue_events(request: Request, owner: str, name: str, number: int):
+        repo = org.repository(f"{owner}/{name}")
+        if repo is None:
+            return not_found("/repos/{owner}/{repo}/issues/{number}/events")
+        total = len(org.events(repo, number, 0, org.events_per_issue))
+        return await respond(
+            request, "/repos/{owner}/{repo}/issues/{number}/events", total,
+            lambda start, stop: org.events(repo, number, start, stop)
+        )
+
+    @app.get("/_stats")
+    async def get_stats():
+        return {
+            "requests": sum(stats["routes"].values()),
+            "routes": dict(stats["routes"]),
+            "status": {str(code): count for code, count in stats["status"].items()},
+            "generation": org.generation,
+            "config": org.config()
+        }
+
+    @app.post("/_generation")
+    async def next_generation():
+        org.generation += 1
+        return {"generation": org.generation}
+
+    return app
+
+def _since(request: Request) -> Optional[str]:
+    """The ``since`` parameter in the synthetic timestamps' format, which sorts like the times"""
+    value = request.query_params.get("since")
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime(TIMESTAMP_FORMAT)
+
+def _links(request: Request, page: int, per_page: int, total: int) -> str:
+    """RFC 5988 ``Link`` header with GitHub's rel names"""
+    last = max((total + per_page - 1) // per_page, 1)
+    rels = []
+    if page < last:
+        rels += [("next", page + 1), ("last", last)]
+    if page > 1:
+        rels += [("first", 1), ("prev", page - 1)]
+    return ", ".join(
+        f'<{request.url.include_query_params(page=target, per_page=per_page)}>; rel="{rel}"'
+        for rel, target in rels
+    )
+
+def add_synthetic_arguments(parser: argparse.ArgumentParser):
+    """Options shared by the mock server and the benchmarks that start it"""
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--orgs", type=int, default=1)
+    parser.add_argument("--repos", type=int, default=5, help="repositories per organization")
+    parser.add_argument("--user-repos", type=int, default=2)
+    parser.add_argument("--commits", type=int, default=500, help="commits per repository")
+    parser.add_argument("--pulls", type=int, default=50, help="pull requests per repository")
+    parser.add_argument("--issues", type=int, default=50, help="issues per repository")
+    parser.add_argument("--events", type=int, default=5, help="events per issue")
+    parser.add_argument("--members", type=int, default=20, help="members per organization")
+    parser.add_argument("--mutate", type=float, default=0.05, help="fraction of items changed per generation")
+    parser.add_argument("--forks", type=int, default=0, help="forks of organization repositories owned by the user")
+    parser.add_argument(
+        "--start", type=datetime.fromisoformat, default=EPOCH,
+        help="date the synthetic history starts (ISO 8601); recent dates exercise since-bounded listings"
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=5000)
+
+def synthetic_argv(args: argparse.Namespace) -> List[str]:
+    """Command-line options reproducing ``args`` for a mock server subprocess"""
+    return [
+        "--seed", str(args.seed), "--orgs", str(args.orgs), "--repos", str(args.repos),
+        "--user-repos", str(args.user_repos), "--commits", str(args.commits), "--pulls", str(args.pulls),
+        "--issues", str(args.issues), "--events", str(args.events), "--members", str(args.members),
+        "--mutate", str(args.mutate), "--forks", str(args.forks), "--start", args.start.isoformat(),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms), "--rate-limit", str(args.rate_limit)
+    ]
+
+def synthetic_org(args: argparse.Namespace) -> SyntheticOrg:
+    return SyntheticOrg(
+        seed=args.seed, orgs=args.orgs, repos_per_org=args.repos, user_repos=args.user_repos,
+        commits_per_repo=args.commits, pulls_per_repo=args.pulls, issues_per_repo=args.issues,
+        events_per_issue=args.events, members_per_org=args.members, mutate=args.mutate,
+        forks=args.forks, start=args.start
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_synthetic_arguments(parser)
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(synthetic_org(args), args.latency_ms, args.jitter_ms, args.rate_limit, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+if __name__ == "__main__":
+    main()
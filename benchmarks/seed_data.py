@@ -0,0 +1,307 @@
+"""Seed a MongoDB database with generated ``github_*`` documents at scale.
+
+Documents have the shape the sync stores (see ``src/models/github_models.py``)
+and are spread across repositories with a Zipf-like skew, so a few
+repositories are huge and most are small, as in real organizations. The same
+``--seed`` and counts always produce the same documents.
+
+    python -m benchmarks.seed_data --commits 10000000 --database github_integration_load
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List
+import argparse
+import asyncio
+import itertools
+import random
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from src.config import settings
+from src.helpers.indexes import ensure_indexes
+
+EPOCH = datetime(2021, 1, 1)
+SPAN_MINUTES = 3 * 365 * 24 * 60
+WORDS = [
+    "fix", "bug", "add", "update", "refactor", "docs", "test", "remove", "cache", "login",
+    "sync", "api", "build", "deps", "release", "perf", "query", "index", "auth", "webhook",
+    "timeout", "retry", "parser", "schema", "migration", "config", "logging", "metrics"
+]
+LANGUAGES = ["Python", "Go", "TypeScript", "Rust", "Java", "Ruby", None]
+EVENTS = ["labeled", "assigned", "referenced", "closed", "reopened", "renamed", "mentioned"]
+LABELS = ["bug", "enhancement", "documentation", "question", "good first issue"]
+STATES = ["open", "closed"]
+
+def add_scale_arguments(parser: argparse.ArgumentParser):
+    """Options describing the seeded data set, shared with the load test"""
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tenants", type=int, default=1, help="integrations the data is split between")
+    parser.add_argument("--orgs", type=int, default=5)
+    parser.add_argument("--repos", type=int, default=500)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--commits", type=int, default=1_000_000)
+    parser.add_argument("--pulls", type=int, default=100_000)
+    parser.add_argument("--issues", type=int, default=100_000)
+    parser.add_argument("--events", type=int, default=300_000)
+
+def scale_config(args: argparse.Namespace) -> Dict[str, int]:
+    return {
+        name: getattr(args, name)
+        for name in ("seed", "tenants", "orgs", "repos", "users", "commits", "pulls", "issues", "events")
+    }
+
+class Seeder:
+    def __init__(self, config: Dict[str, int]):
+        self.config = config
+        self.rng = random.Random(config["seed"])
+        # Repository weights follow a Zipf distribution (s=1.1)
+        weights = [1 / (rank + 1) ** 1.1 for rank in range(config["repos"])]
+        self.repo_cumulative = list(itertools.accumulate(weights))
+        self.repos = [self._repository(index) for index in range(config["repos"])]
+        self.users = [self._user(index) for index in range(config["users"])]
+
+    def _when(self) -> datetime:
+        return EPOCH + timedelta(minutes=self.rng.randrange(SPAN_MINUTES))
+
+    def _text(self, words: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words))
+
+    def _hash(self) -> str:
+        return "%032x" % self.rng.getrandbits(128)
+
+    def _tenant(self, index: int) -> int:
+        return index % self.config["tenants"] + 1
+
+    def _repository(self, index: int) -> Dict[str, Any]:
+        org = index % max(self.config["orgs"], 1)
+        name = f"repo-{index}"
+        owner = f"org-{org}"
+        created = self._when()
+        return {
+            "github_id": 100_000 + index,
+            "name": name,
+            "full_name": f"{owner}/{name}",
+            "description": self._text(6),
+            "private": self.rng.random() < 0.3,
+            "owner_login": owner,
+            "owner_id": 1000 + org,
+            "html_url": f"https://github.com/{owner}/{name}",
+            "clone_url": f"https://github.com/{owner}/{name}.git",
+            "language": self.rng.choice(LANGUAGES),
+            "stargazers_count": self.rng.randrange(5000),
+            "watchers_count": self.rng.randrange(500),
+            "forks_count": self.rng.randrange(300),
+            "open_issues_count": self.rng.randrange(100),
+            "default_branch": "main",
+            "created_at": created,
+            "updated_at": created + timedelta(days=self.rng.randrange(365)),
+            "pushed_at": created + timedelta(days=self.rng.randrange(365)),
+            "user_id": self._tenant(index),
+            "tenant_id": self._tenant(index)
+        }
+
+    def _user(self, index: int) -> Dict[str, Any]:
+        login = f"dev-{index}"
+        return {
+            "github_id": 10_000 + index,
+            "login": login,
+            "name": f"Developer {index}",
+            "email": None,
+            "bio": None,
+            "avatar_url": f"https://avatars.example.com/u/{10_000 + index}",
+            "html_url": f"https://github.com/{login}",
+            "company": None,
+            "location": None,
+            "created_at": None,
+            "updated_at": self._when(),
+            "public_repos": 0,
+            "public_gists": 0,
+            "followers": 0,
+            "following": 0,
+            "integration_user_id": self._tenant(index),
+            "tenant_id": self._tenant(index)
+        }
+
+    def _pick_repo(self) -> Dict[str, Any]:
+        return self.rng.choices(self.repos, cum_weights=self.repo_cumulative)[0]
+
+    def _pick_user(self) -> Dict[str, Any]:
+        return self.users[self.rng.randrange(len(self.users))]
+
+    def integrations(self) -> Iterator[Dict[str, Any]]:
+        # The data API only serves tenants with an active integration
+        for tenant in range(1, self.config["tenants"] + 1):
+            yield {
+                "github_user_id": tenant,
+                "username": f"tenant-{tenant}",
+                "integration_status": "active",
+                "last_sync": None
+            }
+
+    def organizations(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.config["orgs"]):
+            created = self._when()
+            yield {
+                "github_id": 1000 + index,
+                "login": f"org-{index}",
+                "name": f"Organization {index}",
+                "description": self._text(5),
+                "url": f"https://api.github.com/orgs/org-{index}",
+                "avatar_url": None,
+                "created_at": created,
+                "updated_at": created,
+                "user_id": self._tenant(index),
+                "tenant_id": self._tenant(index)
+            }
+
+    def repositories(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.repos)
+
+    def members(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.users)
+
+    def commits(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.config["commits"]):
+            repo = self._pick_repo()
+            author = self._pick_user()
+            when = self._when()
+            sha = "%040x" % (self.config["seed"] << 64 | index)
+            yield {
+                "sha": sha,
+                "message": self._text(self.rng.randrange(3, 12)),
+                "author_name": author["name"],
+                "author_email": f"{author['login']}@example.com",
+                "author_date": when,
+                "committer_name": "GitHub",
+                "committer_email": "noreply@github.com",
+                "committer_date": when,
+                "html_url": f"{repo['html_url']}/commit/{sha}",
+                "repository_id": repo["github_id"],
+                "repository_name": repo["full_name"],
+                "additions": None,
+                "deletions": None,
+                "total_changes": None,
+                "user_id": repo["user_id"],
+                "tenant_id": repo["tenant_id"],
+                "content_hash": self._hash()
+            }
+
+    def _ticket(self, index: int, base_id: int) -> Dict[str, Any]:
+        repo = self._pick_repo()
+        author = self._pick_user()
+        assignee = self._pick_user() if self.rng.random() < 0.4 else None
+        created = self._when()
+        state = self.rng.choice(STATES)
+        return {
+            "github_id": base_id + index,
+            "number": index + 1,
+            "title": self._text(self.rng.randrange(3, 10)),
+            "body": self._text(self.rng.randrange(10, 80)),
+            "state": state,
+            "user_login": author["login"],
+            "user_id": author["github_id"],
+            "assignee_login": assignee["login"] if assignee else None,
+            "assignee_id": assignee["github_id"] if assignee else None,
+            "html_url": f"{repo['html_url']}/issues/{index + 1}",
+            "created_at": created,
+            "updated_at": created + timedelta(hours=self.rng.randrange(2000)),
+            "closed_at": created + timedelta(hours=self.rng.randrange(2000)) if state == "closed" else None,
+            "repository_id": repo["github_id"],
+            "repository_name": repo["full_name"],
+            "integration_user_id": repo["user_id"],
+            "tenant_id": repo["tenant_id"],
+            "content_hash": self._hash()
+        }
+
+    def pulls(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.config["pulls"]):
+            doc = self._ticket(index, 10_000_000)
+            doc["merged_at"] = doc["closed_at"] if doc["closed_at"] and self.rng.random() < 0.8 else None
+            doc["head_ref"] = f"feature-{index}"
+            doc["base_ref"] = "main"
+            yield doc
+
+    def issues(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.config["issues"]):
+            doc = self._ticket(index, 20_000_000)
+            doc["labels"] = self.rng.sample(LABELS, self.rng.randrange(3))
+            yield doc
+
+    def changelogs(self) -> Iterator[Dict[str, Any]]:
+        issues = max(self.config["issues"], 1)
+        for index in range(self.config["events"]):
+            actor = self._pick_user()
+            repo = self._pick_repo()
+            number = self.rng.randrange(issues) + 1
+            yield {
+                "github_id": 30_000_000 + index,
+                "event": self.rng.choice(EVENTS),
+                "actor_login": actor["login"],
+                "actor_id": actor["github_id"],
+                "created_at": self._when(),
+                "issue_id": 20_000_000 + number - 1,
+                "issue_number": number,
+                "repository_id": repo["github_id"],
+                "repository_name": repo["full_name"],
+                "integration_user_id": repo["user_id"],
+                "tenant_id": repo["tenant_id"],
+                "content_hash": self._hash()
+            }
+
+    def collections(self) -> List[tuple]:
+        return [
+            ("github_integration", self.integrations),
+            ("github_organizations", self.organizations),
+            ("github_repos", self.repositories),
+            ("github_users", self.members),
+            ("github_commits", self.commits),
+            ("github_pulls", self.pulls),
+            ("github_issues", self.issues),
+            ("github_changelogs", self.changelogs)
+        ]
+
+async def seed(database, config: Dict[str, int], batch_size: int = 10_000, log=print) -> Dict[str, int]:
+    """Drop and refill every ``github_*`` collection; returns documents inserted per collection"""
+    seeder = Seeder(config)
+    counts = {}
+    for collection, documents in seeder.collections():
+        await database[collection].drop()
+        started = time.perf_counter()
+        inserted = 0
+        pending = None
+        batch = []
+        for doc in documents():
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                # Build the next batch while the previous one is being written
+                if pending is not None:
+                    await pending
+                pending = asyncio.ensure_future(database[collection].insert_many(batch, ordered=False))
+                inserted += len(batch)
+                batch = []
+        if pending is not None:
+            await pending
+        if batch:
+            await database[collection].insert_many(batch, ordered=False)
+            inserted += len(batch)
+        counts[collection] = inserted
+        log(f"{collection}: {inserted:,} documents in {time.perf_counter() - started:.1f}s")
+    await ensure_indexes(database)
+    return counts
+
+async def run(args: argparse.Namespace):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        await seed(client[args.database], scale_config(args), args.batch_size)
+    finally:
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_scale_arguments(parser)
+    parser.add_argument("--database", default="github_integration_load")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
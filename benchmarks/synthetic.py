@@ -0,0 +1,421 @@
+"""Deterministic synthetic GitHub organizations for benchmarks.
+
+Every item is derived from ``(seed, kind, repository, index)`` alone, so pages
+can be generated on demand in any order and two runs with the same settings
+see byte-identical API responses. Bumping ``generation`` rewrites a stable
+``mutate`` fraction of pull requests and issues and appends new commits,
+which models the delta a resync has to pick up.
+
+The user can also own ``forks`` of the first organization's repositories.
+A fork shares the first half of its parent's initial history and then
+diverges, so comparisons across the fork network have commits on both sides.
+Timestamps count from ``start``; move it close to today to exercise listings
+bounded by ``since``.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import hashlib
+import random
+
+EPOCH = datetime(2022, 1, 1)
+LANGUAGES = ["Python", "Go", "TypeScript", "Rust", "Java", None]
+EVENT_TYPES = ["labeled", "assigned", "referenced", "closed", "reopened", "renamed", "mentioned"]
+LABELS = ["bug", "enhancement", "documentation", "question", "good first issue"]
+USER_ID = 1
+USER_LOGIN = "bench-user"
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+class SyntheticOrg:
+    """API-shaped data for one authenticated user, their organizations and repositories"""
+
+    def __init__(
+        self,
+        seed: int = 42,
+        orgs: int = 1,
+        repos_per_org: int = 5,
+        user_repos: int = 2,
+        commits_per_repo: int = 500,
+        pulls_per_repo: int = 50,
+        issues_per_repo: int = 50,
+        events_per_issue: int = 5,
+        members_per_org: int = 20,
+        mutate: float = 0.05,
+        forks: int = 0,
+        start: datetime = EPOCH,
+        generation: int = 0
+    ):
+        self.seed = seed
+        self.orgs = orgs
+        self.repos_per_org = repos_per_org
+        self.user_repos = user_repos
+        self.commits_per_repo = commits_per_repo
+        self.pulls_per_repo = pulls_per_repo
+        self.issues_per_repo = issues_per_repo
+        self.events_per_issue = events_per_issue
+        self.members_per_org = members_per_org
+        self.mutate = mutate
+        # One fork per parent, as GitHub allows
+        self.forks = min(forks, repos_per_org) if orgs else 0
+        self.start = start
+        self.generation = generation
+        self._repos: Dict[str, Dict[str, Any]] = {}
+        for repo in self._all_repositories():
+            self._repos[repo["full_name"]] = repo
+
+    def config(self) -> Dict[str, Any]:
+        return {
+            "seed": self.seed,
+            "orgs": self.orgs,
+            "repos_per_org": self.repos_per_org,
+            "user_repos": self.user_repos,
+            "commits_per_repo": self.commits_per_repo,
+            "pulls_per_repo": self.pulls_per_repo,
+            "issues_per_repo": self.issues_per_repo,
+            "events_per_issue": self.events_per_issue,
+            "members_per_org": self.members_per_org,
+            "mutate": self.mutate,
+            "forks": self.forks,
+            "start": self.start.strftime(TIMESTAMP_FORMAT)
+        }
+
+    def _timestamp(self, offset_minutes: int) -> str:
+        return (self.start + timedelta(minutes=offset_minutes)).strftime(TIMESTAMP_FORMAT)
+
+    def _rng(self, *key: Any) -> random.Random:
+        return random.Random(":".join(str(part) for part in (self.seed,) + key))
+
+    def _mutated(self, *key: Any) -> bool:
+        """Whether an item changes in the current generation (stable per item)"""
+        if not self.generation:
+            return False
+        return self._rng("mutate", self.generation, *key).random() < self.mutate
+
+    # Users and organizations
+
+    def user(self) -> Dict[str, Any]:
+        return {
+            "id": USER_ID,
+            "login": USER_LOGIN,
+            "name": "Benchmark User",
+            "email": "bench@example.com",
+            "avatar_url": f"https://avatars.example.com/u/{USER_ID}",
+            "html_url": f"https://github.com/{USER_LOGIN}"
+        }
+
+    def member(self, org_index: int, index: int) -> Dict[str, Any]:
+        user_id = 10_000 + org_index * 10_000 + index
+        login = f"dev-{org_index}-{index}"
+        return {
+            "id": user_id,
+            "login": login,
+            "avatar_url": f"https://avatars.example.com/u/{user_id}",
+            "html_url": f"https://github.com/{login}",
+            "type": "User"
+        }
+
+    def organization(self, org_index: int) -> Dict[str, Any]:
+        login = f"bench-org-{org_index}"
+        return {
+            "id": 1000 + org_index,
+            "login": login,
+            "name": f"Benchmark Org {org_index}",
+            "description": "Synthetic organization",
+            "url": f"https://api.github.com/orgs/{login}",
+            "avatar_url": f"https://avatars.example.com/o/{1000 + org_index}",
+            "created_at": self._timestamp(org_index),
+            "updated_at": self._timestamp(org_index + 1)
+        }
+
+    def organizations(self) -> List[Dict[str, Any]]:
+        return [self.organization(index) for index in range(self.orgs)]
+
+    def members(self, org_login: str) -> List[Dict[str, Any]]:
+        org_index = self._org_index(org_login)
+        if org_index is None:
+            return []
+        return [self.member(org_index, index) for index in range(self.members_per_org)]
+
+    def _org_index(self, org_login: str) -> Optional[int]:
+        prefix = "bench-org-"
+        if not org_login.startswith(prefix) or not org_login[len(prefix):].isdigit():
+            return None
+        index = int(org_login[len(prefix):])
+        return index if index < self.orgs else None
+
+    # Repositories
+
+    def _repository(self, owner: Dict[str, Any], org_index: Optional[int], index: int, repo_id: int) -> Dict[str, Any]:
+        rng = self._rng("repo", repo_id)
+        name = f"repo-{index}"
+        return {
+            "id": repo_id,
+            "name": name,
+            "full_name": f"{owner['login']}/{name}",
+            "description": f"Synthetic repository {index}",
+            "private": rng.random() < 0.3,
+            "owner": {"login": owner["login"], "id": owner["id"]},
+            "html_url": f"https://github.com/{owner['login']}/{name}",
+            "clone_url": f"https://github.com/{owner['login']}/{name}.git",
+            "language": rng.choice(LANGUAGES),
+            "stargazers_count": rng.randrange(5000),
+            "watchers_count": rng.randrange(500),
+            "forks_count": rng.randrange(300),
+            "open_issues_count": rng.randrange(100),
+            "default_branch": "main",
+            "created_at": self._timestamp(rng.randrange(100_000)),
+            "updated_at": self._timestamp(200_000 + rng.randrange(100_000)),
+            "pushed_at": self._timestamp(300_000 + rng.randrange(100_000)),
+            "fork": False,
+            "_org_index": org_index,
+            "_parent": None
+        }
+
+    def _all_repositories(self) -> List[Dict[str, Any]]:
+        repos = []
+        for index in range(self.user_repos):
+            repos.append(self._repository(self.user(), None, index, 100_000 + index))
+        for org_index in range(self.orgs):
+            org = self.organization(org_index)
+            for index in range(self.repos_per_org):
+                repo_id = 100_000 + (org_index + 1) * 1000 + index
+                repos.append(self._repository(org, org_index, index, repo_id))
+        for index in range(self.forks):
+            parent = repos[self.user_repos + index]
+            fork = self._repository(self.user(), None, self.user_repos + index, 900_000 + index)
+            fork.update(fork=True, description=parent["description"], _parent=parent["full_name"])
+            repos.append(fork)
+        return repos
+
+    @staticmethod
+    def _public(repo: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in repo.items() if not key.startswith("_")}
+
+    def user_repositories(self) -> List[Dict[str, Any]]:
+        """``/user/repos`` lists personal repositories and those of the user's organizations"""
+        return [self._public(repo) for repo in self._repos.values()]
+
+    def organization_repositories(self, org_login: str) -> List[Dict[str, Any]]:
+        org_index = self._org_index(org_login)
+        return [self._public(repo) for repo in self._repos.values() if repo["_org_index"] == org_index and org_index is not None]
+
+    def repository(self, full_name: str) -> Optional[Dict[str, Any]]:
+        return self._repos.get(full_name)
+
+    def repository_detail(self, repo: Dict[str, Any]) -> Dict[str, Any]:
+        """``GET /repos/{owner}/{repo}``: forks also name their ``parent``"""
+        detail = self._public(repo)
+        if repo["_parent"] is not None:
+            detail["parent"] = self._public(self._repos[repo["_parent"]])
+        return detail
+
+    def network_repository(self, repo: Dict[str, Any], owner: str) -> Optional[Dict[str, Any]]:
+        """The repository of ``owner`` in ``repo``'s fork network"""
+        root = repo["_parent"] or repo["full_name"]
+        for candidate in self._repos.values():
+            if candidate["owner"]["login"] == owner and root in (candidate["full_name"], candidate["_parent"]):
+                return candidate
+        return None
+
+    def _author(self, repo: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+        if repo["_org_index"] is None or not self.members_per_org:
+            return {"login": USER_LOGIN, "id": USER_ID}
+        member = self.member(repo["_org_index"], rng.randrange(self.members_per_org))
+        return {"login": member["login"], "id": member["id"]}
+
+    # Repository content, newest first like the GitHub listings
+
+    def commit_count(self, repo: Dict[str, Any]) -> int:
+        # Each generation lands a few new commits on every repository
+        return self.commits_per_repo + self.generation * max(int(self.commits_per_repo * self.mutate), 1)
+
+    def fork_point(self, repo: Dict[str, Any]) -> int:
+        """Commits a fork shares with its parent (0 for other repositories)"""
+        return self.commits_per_repo // 2 if repo["_parent"] is not None else 0
+
+    def commit(self, repo: Dict[str, Any], index: int) -> Dict[str, Any]:
+        if index < self.fork_point(repo):
+            return self.commit(self._repos[repo["_parent"]], index)
+        rng = self._rng("commit", repo["id"], index)
+        sha = hashlib.sha1(f"{self.seed}:{repo['id']}:{index}".encode()).hexdigest()
+        author = self._author(repo, rng)
+        when = self._timestamp(index * 7 + rng.randrange(5))
+        return {
+            "sha": sha,
+            "commit": {
+                "message": f"Change {index}: {rng.choice(['fix', 'feat', 'refactor', 'docs', 'test'])} {rng.randrange(10_000)}",
+                "author": {"name": author["login"], "email": f"{author['login']}@example.com", "date": when},
+                "committer": {"name": "GitHub", "email": "noreply@github.com", "date": when}
+            },
+            "author": author,
+            "html_url": f"{repo['html_url']}/commit/{sha}"
+        }
+
+    def first_commit_since(self, repo: Dict[str, Any], since: Optional[str]) -> int:
+        """Index of the oldest commit made at or after ``since`` (commit times grow with the index)"""
+        low, high = 0, self.commit_count(repo)
+        if since is None:
+            return low
+        while low < high:
+            middle = (low + high) // 2
+            if self.commit(repo, middle)["commit"]["committer"]["date"] < since:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def commits(self, repo: Dict[str, Any], start: int, stop: int, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        total = self.commit_count(repo)
+        listed = total - self.first_commit_since(repo, since)
+        return [self.commit(repo, total - 1 - position) for position in range(start, min(stop, listed))]
+
+    def merge_base(self, base: Dict[str, Any], head: Dict[str, Any]) -> int:
+        """Commits two default branches of a fork network have in common"""
+        if base is head:
+            return self.commit_count(base)
+        if base["full_name"] == head["_parent"]:
+            return self.fork_point(head)
+        if head["full_name"] == base["_parent"]:
+            return self.fork_point(base)
+        return 0
+
+    def compare(self, base: Dict[str, Any], head: Dict[str, Any]) -> Dict[str, Any]:
+        """``GET /repos/{owner}/{repo}/compare/{base}...{head}`` of two default branches, without ``commits``"""
+        shared = self.merge_base(base, head)
+        ahead, behind = self.commit_count(head) - shared, self.commit_count(base) - shared
+        if ahead and behind:
+            status = "diverged"
+        elif ahead:
+            status = "ahead"
+        elif behind:
+            status = "behind"
+        else:
+            status = "identical"
+        return {
+            "status": status,
+            "ahead_by": ahead,
+            "behind_by": behind,
+            "total_commits": ahead,
+            "merge_base_commit": self.commit(base, shared - 1) if shared else None,
+            "files": []
+        }
+
+    def compare_commits(self, base: Dict[str, Any], head: Dict[str, Any], start: int, stop: int) -> List[Dict[str, Any]]:
+        """Commits on ``head`` that ``base`` lacks, oldest first like the compare API"""
+        shared = self.merge_base(base, head)
+        ahead = self.commit_count(head) - shared
+        return [self.commit(head, shared + position) for position in range(start, min(stop, ahead))]
+
+    def pull(self, repo: Dict[str, Any], number: int) -> Dict[str, Any]:
+        rng = self._rng("pull", repo["id"], number)
+        created = number * 60 + rng.randrange(60)
+        merged = rng.random() < 0.6
+        closed_at = self._timestamp(created + rng.randrange(1, 5000)) if merged or rng.random() < 0.2 else None
+        title = f"Pull request {number}"
+        updated = created + 5000
+        if self._mutated("pull", repo["id"], number):
+            title += f" (rev {self.generation})"
+            updated += self.generation * 10_000
+        assignee = self._author(repo, rng) if rng.random() < 0.4 else None
+        return {
+            "id": repo["id"] * 1_000_000 + number,
+            "number": number,
+            "title": title,
+            "body": f"Synthetic pull request body {number}. " * rng.randrange(1, 10),
+            "state": "closed" if closed_at else "open",
+            "user": self._author(repo, rng),
+            "assignee": assignee,
+            "html_url": f"{repo['html_url']}/pull/{number}",
+            "created_at": self._timestamp(created),
+            "updated_at": self._timestamp(updated),
+            "closed_at": closed_at,
+            "merged_at": closed_at if merged else None,
+            "head": {"ref": f"feature-{number}"},
+            "base": {"ref": repo["default_branch"]}
+        }
+
+    def pulls(self, repo: Dict[str, Any], start: int, stop: int) -> List[Dict[str, Any]]:
+        total = self.pulls_per_repo
+        return [self.pull(repo, total - position) for position in range(start, min(stop, total))]
+
+    def issue(self, repo: Dict[str, Any], number: int) -> Dict[str, Any]:
+        """Issues are numbered after pull requests, which the issues API also lists"""
+        if number <= self.pulls_per_repo:
+            pull = self.pull(repo, number)
+            return {
+                "id": repo["id"] * 1_000_000 + 500_000 + number,
+                "number": number,
+                "title": pull["title"],
+                "state": pull["state"],
+                "user": pull["user"],
+                "html_url": pull["html_url"],
+                "created_at": pull["created_at"],
+                "updated_at": pull["updated_at"],
+                "pull_request": {"url": pull["html_url"]}
+            }
+        rng = self._rng("issue", repo["id"], number)
+        created = number * 60 + rng.randrange(60)
+        closed_at = self._timestamp(created + rng.randrange(1, 5000)) if rng.random() < 0.5 else None
+        title = f"Issue {number}"
+        updated = created + 5000
+        if self._mutated("issue", repo["id"], number):
+            title += f" (rev {self.generation})"
+            updated += self.generation * 10_000
+        return {
+            "id": repo["id"] * 1_000_000 + 500_000 + number,
+            "number": number,
+            "title": title,
+            "body": f"Synthetic issue body {number}. " * rng.randrange(1, 10),
+            "state": "closed" if closed_at else "open",
+            "user": self._author(repo, rng),
+            "assignee": self._author(repo, rng) if rng.random() < 0.3 else None,
+            "labels": [{"name": label} for label in rng.sample(LABELS, rng.randrange(3))],
+            "html_url": f"{repo['html_url']}/issues/{number}",
+            "created_at": self._timestamp(created),
+            "updated_at": self._timestamp(updated),
+            "closed_at": closed_at
+        }
+
+    def issue_count(self) -> int:
+        return self.pulls_per_repo + self.issues_per_repo
+
+    def issues(self, repo: Dict[str, Any], start: int, stop: int) -> List[Dict[str, Any]]:
+        total = self.issue_count()
+        return [self.issue(repo, total - position) for position in range(start, min(stop, total))]
+
+    def issues_since(self, repo: Dict[str, Any], since: str) -> List[Dict[str, Any]]:
+        """Issues updated at or after ``since``, newest first"""
+        return [issue for issue in self.issues(repo, 0, self.issue_count()) if issue["updated_at"] >= since]
+
+    def events(self, repo: Dict[str, Any], number: int, start: int, stop: int) -> List[Dict[str, Any]]:
+        if number <= self.pulls_per_repo or number > self.issue_count():
+            return []
+        issue = self.issue(repo, number)
+        events = []
+        for index in range(start, min(stop, self.events_per_issue)):
+            rng = self._rng("event", repo["id"], number, index)
+            events.append({
+                "id": (repo["id"] * 1_000_000 + number) * 100 + index,
+                "event": rng.choice(EVENT_TYPES),
+                "actor": self._author(repo, rng),
+                "created_at": self._timestamp(number * 60 + 100 + index * 10),
+                "issue": {"id": issue["id"], "number": number}
+            })
+        return events
+
+    def expected_documents(self, shared_commits: bool = False) -> Dict[str, int]:
+        """Documents a complete sync of the current generation should store.
+
+        With ``shared_commits`` a commit a fork shares with its parent is stored once.
+        """
+        repos = list(self._repos.values())
+        shared = sum(self.fork_point(repo) for repo in repos) if shared_commits else 0
+        return {
+            "github_organizations": self.orgs,
+            "github_repos": len(repos),
+            "github_commits": sum(self.commit_count(repo) for repo in repos) - shared,
+            "github_pulls": self.pulls_per_repo * len(repos),
+            "github_issues": self.issues_per_repo * len(repos),
+            "github_changelogs": self.issues_per_repo * self.events_per_issue * len(repos),
+            "github_users": self.orgs * self.members_per_org
+        }
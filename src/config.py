@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -12,14 +13,133 @@ class Settings:
     # MongoDB
     MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     DATABASE_NAME = os.getenv("DATABASE_NAME", "github_integration")
-    
+
+    # MongoDB connection pools (the API and syncs use separate clients)
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+    # primary, primaryPreferred, secondary, secondaryPreferred or nearest; -1 lifts the staleness bound (minimum 90)
+    MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "secondaryPreferred")
+    MONGO_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", 90))
+    MONGO_SYNC_MAX_POOL_SIZE = int(os.getenv("MONGO_SYNC_MAX_POOL_SIZE", 20))
+    MONGO_SYNC_WRITE_CONCERN = os.getenv("MONGO_SYNC_WRITE_CONCERN", "1")  # a node count or "majority"
+    MONGO_SYNC_JOURNAL = os.getenv("MONGO_SYNC_JOURNAL", "True").lower() == "true"
+    # Wire compression, in order of preference; zstd and snappy need the zstandard and python-snappy packages
+    MONGO_COMPRESSORS = [name.strip() for name in os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib").split(",") if name.strip()]
+    MONGO_ZLIB_COMPRESSION_LEVEL = int(os.getenv("MONGO_ZLIB_COMPRESSION_LEVEL", 6))
+
     # Security
     SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this")
     ALGORITHM = os.getenv("ALGORITHM", "HS256")
     
     # GitHub API
-    GITHUB_API_BASE = "https://api.github.com"
+    GITHUB_API_BASE = os.getenv("GITHUB_API_BASE", "https://api.github.com")
     GITHUB_OAUTH_BASE = "https://github.com/login/oauth"
+
+    # Token pool (spreads rate-limit budget across connected integrations)
+    TOKEN_POOL_ENABLED = os.getenv("TOKEN_POOL_ENABLED", "True").lower() == "true"
+    TOKEN_POOL_MAX_SHARE = float(os.getenv("TOKEN_POOL_MAX_SHARE", 0.5))
+    TOKEN_POOL_MIN_REMAINING = int(os.getenv("TOKEN_POOL_MIN_REMAINING", 100))
+    TOKEN_POOL_MAX_WAIT = float(os.getenv("TOKEN_POOL_MAX_WAIT", 60))
+    TOKEN_POOL_SHARE_PUBLIC = os.getenv("TOKEN_POOL_SHARE_PUBLIC", "True").lower() == "true"
+
+    # Sync pipeline
+    SYNC_FETCH_WORKERS = int(os.getenv("SYNC_FETCH_WORKERS", 8))
+    SYNC_DETAIL_WORKERS = int(os.getenv("SYNC_DETAIL_WORKERS", 8))
+    SYNC_TRANSFORM_WORKERS = int(os.getenv("SYNC_TRANSFORM_WORKERS", 2))
+    SYNC_WRITE_WORKERS = int(os.getenv("SYNC_WRITE_WORKERS", 2))
+    SYNC_QUEUE_SIZE = int(os.getenv("SYNC_QUEUE_SIZE", 64))
+    SYNC_WRITE_BATCH_SIZE = int(os.getenv("SYNC_WRITE_BATCH_SIZE", 500))
+    SYNC_VALIDATE_DOCUMENTS = os.getenv("SYNC_VALIDATE_DOCUMENTS", "False").lower() == "true"
+    SYNC_CHANGE_DETECTION = os.getenv("SYNC_CHANGE_DETECTION", "True").lower() == "true"
+    SYNC_DELETE_STALE = os.getenv("SYNC_DELETE_STALE", "False").lower() == "true"
+    SYNC_PROFILE_CPU_INTERVAL = float(os.getenv("SYNC_PROFILE_CPU_INTERVAL", 0.005))
+    SYNC_PROFILE_MAX_REPOSITORIES = int(os.getenv("SYNC_PROFILE_MAX_REPOSITORIES", 200))
+    USER_DIRECTORY_ENABLED = os.getenv("USER_DIRECTORY_ENABLED", "True").lower() == "true"
+    USER_LOOKUP_MAX_KEYS = int(os.getenv("USER_LOOKUP_MAX_KEYS", 500))
+    # Comma-separated; github_commits and github_changelogs can be stored as monthly buckets
+    BUCKETED_COLLECTIONS = [name.strip() for name in os.getenv("BUCKETED_COLLECTIONS", "").split(",") if name.strip()]
+    BUCKET_MAX_ITEMS = int(os.getenv("BUCKET_MAX_ITEMS", 1000))
+    BUCKET_MAX_BYTES = int(os.getenv("BUCKET_MAX_BYTES", 8 * 1024 * 1024))
+    # Long PR/issue bodies and commit messages go to github_content, with a preview inline
+    CONTENT_SPLIT_ENABLED = os.getenv("CONTENT_SPLIT_ENABLED", "False").lower() == "true"
+    CONTENT_PREVIEW_CHARS = int(os.getenv("CONTENT_PREVIEW_CHARS", 280))
+    CONTENT_COMPRESSION = os.getenv("CONTENT_COMPRESSION", "zlib").lower()  # zlib or none
+    CONTENT_MIN_COMPRESS_BYTES = int(os.getenv("CONTENT_MIN_COMPRESS_BYTES", 512))
+    CONTENT_SEARCH_MAX_MATCHES = int(os.getenv("CONTENT_SEARCH_MAX_MATCHES", 1000))
+    # Commits come from the REST API ("api") or from local bare mirrors ("git")
+    COMMIT_SOURCE = os.getenv("COMMIT_SOURCE", "api").lower()
+    GIT_MIRROR_PATH = os.getenv("GIT_MIRROR_PATH", "mirrors")
+    GIT_CONCURRENCY = int(os.getenv("GIT_CONCURRENCY", 2))
+    GIT_FETCH_TIMEOUT = float(os.getenv("GIT_FETCH_TIMEOUT", 1800))
+    GIT_PAGE_SIZE = int(os.getenv("GIT_PAGE_SIZE", 500))
+    # Commits stored per repository ("repository") or once per SHA with the repositories containing them ("shared")
+    COMMIT_STORAGE = os.getenv("COMMIT_STORAGE", "repository").lower()
+    # With shared storage, forks of a stored parent fetch only the commits they diverge by, up to this many
+    FORK_COMPARE_MAX_COMMITS = int(os.getenv("FORK_COMPARE_MAX_COMMITS", 250))
+
+    # Scheduled sync
+    SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "False").lower() == "true"
+    SCHEDULER_INTERVAL = float(os.getenv("SCHEDULER_INTERVAL", 300))
+    SCHEDULER_MIN_INTERVAL = float(os.getenv("SCHEDULER_MIN_INTERVAL", 300))
+    SCHEDULER_MAX_INTERVAL = float(os.getenv("SCHEDULER_MAX_INTERVAL", 86400))
+    SCHEDULER_RATE_SHARE = float(os.getenv("SCHEDULER_RATE_SHARE", 0.5))
+    SCHEDULER_DEFAULT_REPO_COST = int(os.getenv("SCHEDULER_DEFAULT_REPO_COST", 10))
+
+    # Sync progress events and change subscriptions
+    EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", 256))
+    EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", 200))
+    EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", 15))
+    CHANGE_STREAM_REPLAY_SIZE = int(os.getenv("CHANGE_STREAM_REPLAY_SIZE", 1000))
+
+    # Integration removal
+    REMOVAL_BATCH_SIZE = int(os.getenv("REMOVAL_BATCH_SIZE", 1000))
+    REMOVAL_MAX_BATCH_SECONDS = float(os.getenv("REMOVAL_MAX_BATCH_SECONDS", 0.5))
+    REMOVAL_MAX_REPLICATION_LAG = float(os.getenv("REMOVAL_MAX_REPLICATION_LAG", 10))
+    REMOVAL_PROGRESS_INTERVAL = float(os.getenv("REMOVAL_PROGRESS_INTERVAL", 5))
+
+    # Retention and archival, e.g. {"github_changelogs": {"max_age_days": 365},
+    # "github_issues": {"max_age_days": 730, "states": ["closed"]}}
+    RETENTION_POLICIES = json.loads(os.getenv("RETENTION_POLICIES", "{}"))
+    ARCHIVE_PATH = os.getenv("ARCHIVE_PATH", "archive")
+    ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", 3600))
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 10000))
+    ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "zstd")
+    ARCHIVE_QUERY_MAX_ROWS = int(os.getenv("ARCHIVE_QUERY_MAX_ROWS", 1000))
+
+    # Columnar snapshots for analytics consumers
+    SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "snapshots")
+    SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", 5000))
+    SNAPSHOT_COMPRESSION = os.getenv("SNAPSHOT_COMPRESSION", "zstd")
+    SNAPSHOT_CONCURRENCY = int(os.getenv("SNAPSHOT_CONCURRENCY", 2))
+
+    # Data API
+    FILTER_GUARD_MODE = os.getenv("FILTER_GUARD_MODE", "reject").lower()  # reject, warn or off
+    # Per-client quotas: each user_id and address pair gets a token bucket, and
+    # each address another one shared by every user_id it names
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", 10))
+    RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 60))
+    RATE_LIMIT_ADDRESS_RATE = float(os.getenv("RATE_LIMIT_ADDRESS_RATE", 40))
+    RATE_LIMIT_ADDRESS_BURST = float(os.getenv("RATE_LIMIT_ADDRESS_BURST", 240))
+    RATE_LIMIT_SEARCH_COST = float(os.getenv("RATE_LIMIT_SEARCH_COST", 10))
+    RATE_LIMIT_SKIP_PER_TOKEN = int(os.getenv("RATE_LIMIT_SKIP_PER_TOKEN", 1000))
+    RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory").lower()  # memory or mongo
+    # Concurrent requests per route and process
+    RATE_LIMIT_CONCURRENCY = json.loads(os.getenv("RATE_LIMIT_CONCURRENCY", '{"search": 4, "list": 32, "document": 64}'))
+    # Response compression, negotiated from Accept-Encoding (br needs the brotli package)
+    RESPONSE_COMPRESSION_ENABLED = os.getenv("RESPONSE_COMPRESSION_ENABLED", "True").lower() == "true"
+    RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", 1024))
+    RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 6))
+    RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", 4))
+
+    # Observability
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    OTEL_TRACING_ENABLED = os.getenv("OTEL_TRACING_ENABLED", "False").lower() == "true"
     
     # App Config
     HOST = os.getenv("HOST", "localhost")
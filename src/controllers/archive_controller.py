@@ -0,0 +1,159 @@
+from fastapi import HTTPException, status
+from typing import Any, Dict, Optional
+import asyncio
+import json
+import operator
+import os
+from src.config import settings
+from src.helpers.archiver import ARCHIVE_TIME_FIELDS, MANIFEST_COLLECTION, collection_root, file_schema, partitioning
+from src.helpers.database import get_database
+from src.helpers.query_filter import FIELD_TYPES, FilterError, compile_filter
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:  # Archive queries are optional
+    pa = None
+
+COMPARISONS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+def _expression(query: Dict[str, Any]):
+    """Translate a compiled filter into a pyarrow expression, pushed down to the Parquet scan"""
+    expression = None
+    for name, condition in query.items():
+        field = pc.field(name)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, value in condition.items():
+            if op == "$in":
+                part = field.isin(value)
+            elif op == "$eq":
+                part = field.is_null() if value is None else field == value
+            else:
+                part = COMPARISONS[op](field, value)
+            expression = part if expression is None else expression & part
+    return expression
+
+def _may_match(entry: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """Skip files whose time span cannot satisfy a range on the field they were archived by"""
+    condition = query.get(entry["time_field"])
+    if condition is None or entry.get("min_time") is None:
+        return True
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+    # Stored times are naive UTC, filter values are aware
+    low, high = entry["min_time"], entry["max_time"]
+    for op, value in condition.items():
+        if op == "$in" or value is None:
+            continue
+        value = value.replace(tzinfo=None)
+        if op in ("$gt", "$gte") and high < value:
+            return False
+        if op in ("$lt", "$lte") and low > value:
+            return False
+        if op == "$eq" and not low <= value <= high:
+            return False
+    return True
+
+class ArchiveController:
+    @staticmethod
+    async def query_archive(
+        collection: str,
+        user_id: int,
+        filter_params: Optional[str] = None,
+        columns: Optional[str] = None,
+        limit: int = 100
+    ):
+        """Scan one integration's archived documents"""
+        try:
+            if pa is None:
+                raise HTTPException(
+                    status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                    detail="Archive queries need pyarrow installed"
+                )
+            if collection not in ARCHIVE_TIME_FIELDS:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid collection. Must be one of: {', '.join(ARCHIVE_TIME_FIELDS)}"
+                )
+
+            query = {}
+            if filter_params:
+                try:
+                    query = compile_filter(collection, json.loads(filter_params))
+                except json.JSONDecodeError:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Invalid filter JSON format"
+                    )
+                except FilterError as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=str(e)
+                    )
+            list_fields = [name for name in query if FIELD_TYPES[collection][name].is_list]
+            if list_fields:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Archive queries cannot filter on list fields: {', '.join(list_fields)}"
+                )
+
+            schema = file_schema(collection)
+            selected = None
+            if columns:
+                selected = [name.strip() for name in columns.split(",") if name.strip()]
+                unknown = [name for name in selected if name not in schema.names and name not in ("tenant_id", "month")]
+                if unknown:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Unknown columns: {', '.join(unknown)}"
+                    )
+
+            db = get_database()
+            integration = await db.github_integration.find_one(
+                {"github_user_id": user_id, "integration_status": "active"},
+                {"_id": 1}
+            )
+            if not integration:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Integration not found"
+                )
+            
+            # The manifest lists this tenant's files, so no directory is crawled
+            entries = await db[MANIFEST_COLLECTION].find({"tenant_id": user_id, "collection": collection}).to_list(length=None)
+            paths = [
+                os.path.join(collection_root(collection), entry["path"])
+                for entry in entries if _may_match(entry, query)
+            ]
+            if not paths:
+                return {"data": [], "files_scanned": 0, "returned": 0}
+
+            query["tenant_id"] = user_id
+            limit = min(limit, settings.ARCHIVE_QUERY_MAX_ROWS)
+
+            def scan():
+                dataset = ds.dataset(
+                    paths,
+                    schema=pa.schema(list(schema) + [pa.field("tenant_id", pa.int64()), pa.field("month", pa.string())]),
+                    format="parquet",
+                    partitioning=partitioning(),
+                    partition_base_dir=collection_root(collection)
+                )
+                return dataset.scanner(columns=selected, filter=_expression(query)).head(limit).to_pylist()
+
+            rows = await asyncio.to_thread(scan)
+            return {"data": rows, "files_scanned": len(paths), "returned": len(rows)}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error querying archive: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to query archive"
+            )
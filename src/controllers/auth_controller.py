@@ -3,6 +3,7 @@ from fastapi.responses import RedirectResponse
 from datetime import datetime
 from src.helpers.github_client import GitHubClient, exchange_code_for_token
 from src.helpers.database import get_database
+from src.helpers.token_pool import token_pool
 from src.config import settings
 import logging
 
@@ -33,6 +34,12 @@ class AuthController:
             
             # Store integration data
             db = get_database()
+            existing = await db.github_integration.find_one({"github_user_id": user_data["id"]}, {"integration_status": 1})
+            if existing and existing["integration_status"] == "removing":
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="The previous integration is still being removed; try again shortly"
+                )
             integration_data = {
                 "github_user_id": user_data["id"],
                 "username": user_data["login"],
@@ -49,6 +56,9 @@ class AuthController:
                 {"$set": integration_data},
                 upsert=True
             )
+            if settings.TOKEN_POOL_ENABLED:
+                # A re-authorized user's previous token may already be revoked
+                token_pool.add_token(user_data["id"], access_token)
             
             return {
                 "message": "GitHub integration successful",
@@ -59,6 +69,8 @@ class AuthController:
                 }
             }
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"GitHub OAuth callback error: {e}")
             raise HTTPException(
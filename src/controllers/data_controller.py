@@ -1,100 +1,93 @@
 from fastapi import HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from typing import Optional, Dict, Any, List
 import json
-import re
-from src.helpers.database import get_database
+from src.helpers.bucket_storage import BUCKETS
+from src.helpers.change_streams import ChangeStreamsUnsupported, ResumeTokenExpired, change_hub
+from src.helpers.change_detector import HASH_KEYS
+from src.helpers.content_store import ContentStore, content_store
+from src.helpers.database import get_database, get_read_database
+from src.helpers.event_bus import SSE_HEADERS, sse_stream
+from src.helpers.indexes import CASE_INSENSITIVE
+from src.helpers.metrics import MONGO_OPERATION_SECONDS, timed
+from src.helpers.query_filter import FilterError, check_sort_field, compile_filter, guard_query
+from src.helpers.responses import BSONJSONResponse
+from src.helpers.user_directory import USERS_COLLECTION
+from src.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+VALID_COLLECTIONS = [
+    "github_organizations", "github_repos", "github_commits",
+    "github_pulls", "github_issues", "github_changelogs", "github_users"
+]
+
 class DataController:
     @staticmethod
     async def get_collection_data(
         collection: str,
+        user_id: int,
         page: int = 1,
         limit: int = 20,
         sort_by: Optional[str] = None,
         sort_order: str = "desc",
         filter_params: Optional[str] = None,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        include_content: bool = False
     ):
-        """Get paginated data from any GitHub collection"""
+        """Get a page of one integration's data from any GitHub collection"""
         try:
-            db = get_database()
+            db = get_read_database()
             
-            # Validate collection name
-            valid_collections = [
-                "github_organizations", "github_repos", "github_commits",
-                "github_pulls", "github_issues", "github_changelogs", "github_users"
-            ]
+            DataController._check_collection(collection)
+            await DataController._check_integration(user_id)
+            query = DataController._build_query(collection, user_id, filter_params, search)
+            if search:
+                await DataController._search_content(db, collection, user_id, search, query)
+            sort_criteria = DataController._build_sort(collection, sort_by, sort_order)
             
-            if collection not in valid_collections:
+            # Refuse (or log) shapes that would scan the whole collection
+            try:
+                guard_query(collection, query, sort_criteria)
+            except FilterError as e:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Invalid collection. Must be one of: {', '.join(valid_collections)}"
+                    detail=str(e)
                 )
             
-            # Build query
-            query = {}
-            
-            # Apply filters
-            if filter_params:
-                try:
-                    filters = json.loads(filter_params)
-                    query.update(filters)
-                except json.JSONDecodeError:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Invalid filter JSON format"
-                    )
-            
-            # Apply search
-            if search:
-                search_fields = DataController._get_search_fields(collection)
-                search_conditions = []
-                for field in search_fields:
-                    search_conditions.append({
-                        field: {"$regex": search, "$options": "i"}
-                    })
-                if search_conditions:
-                    query["$or"] = search_conditions
-            
             # Get collection
             coll = db[collection]
+            buckets = BUCKETS.get(collection)
             
             # Count total documents
-            total = await coll.count_documents(query)
-            
-            # Build sort
-            sort_criteria = []
-            if sort_by:
-                sort_direction = 1 if sort_order == "asc" else -1
-                sort_criteria.append((sort_by, sort_direction))
-            else:
-                # Default sort by creation date or _id
-                if collection in ["github_commits", "github_pulls", "github_issues"]:
-                    sort_criteria.append(("created_at", -1))
+            with timed(MONGO_OPERATION_SECONDS, "mongo.count_documents", collection=collection, operation="count_documents"):
+                if buckets is not None:
+                    total = await buckets.count(db, query)
                 else:
-                    sort_criteria.append(("_id", -1))
+                    total = await coll.count_documents(query)
             
             # Calculate pagination
             skip = (page - 1) * limit
             
             # Execute query
-            cursor = coll.find(query).sort(sort_criteria).skip(skip).limit(limit)
-            documents = await cursor.to_list(length=limit)
+            with timed(MONGO_OPERATION_SECONDS, "mongo.find", collection=collection, operation="find"):
+                if buckets is not None:
+                    documents = await buckets.find(db, query, sort_criteria, skip, limit)
+                else:
+                    cursor = coll.find(query).sort(sort_criteria).skip(skip).limit(limit)
+                    documents = await cursor.to_list(length=limit)
             
-            # Convert ObjectId to string
-            for doc in documents:
-                if "_id" in doc:
-                    doc["_id"] = str(doc["_id"])
+            if include_content:
+                await ContentStore.hydrate(db, collection, documents)
             
             # Calculate pagination info
             total_pages = (total + limit - 1) // limit
             has_next = page < total_pages
             has_prev = page > 1
             
-            return {
+            # ObjectIds and datetimes are encoded by the response itself
+            return BSONJSONResponse({
                 "data": documents,
                 "pagination": {
                     "current_page": page,
@@ -104,7 +97,7 @@ class DataController:
                     "has_next": has_next,
                     "has_prev": has_prev
                 }
-            }
+            })
             
         except HTTPException:
             raise
@@ -116,10 +109,163 @@ class DataController:
             )
     
     @staticmethod
-    async def global_search(query: str, limit: int = 50):
-        """Search across all GitHub collections"""
+    async def subscribe_changes(
+        collection: str,
+        user_id: int,
+        filter_params: Optional[str] = None,
+        search: Optional[str] = None,
+        last_event_id: Optional[str] = None
+    ):
+        """Stream inserts and updates matching a listing's filter as Server-Sent Events"""
+        try:
+            db = get_read_database()
+            
+            DataController._check_collection(collection)
+            if collection in BUCKETS:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{collection} is not stored one document per item, so it cannot be subscribed to"
+                )
+            await DataController._check_integration(user_id)
+            query = DataController._build_query(collection, user_id, filter_params, search)
+            
+            try:
+                subscription = await change_hub.subscribe(db, collection, query, after=last_event_id)
+            except ChangeStreamsUnsupported:
+                raise HTTPException(
+                    status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                    detail="Subscriptions need MongoDB running as a replica set"
+                )
+            except ResumeTokenExpired:
+                raise HTTPException(
+                    status_code=status.HTTP_410_GONE,
+                    detail="Resume token is too old; reload the listing and subscribe again"
+                )
+            
+            return StreamingResponse(
+                sse_stream(subscription, change_hub.unsubscribe),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error subscribing to changes: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to subscribe to changes"
+            )
+    
+    @staticmethod
+    async def get_document(collection: str, key: str, user_id: int):
+        """Get one document by its GitHub key (sha for commits), with long text fields in full"""
+        try:
+            db = get_read_database()
+            DataController._check_collection(collection)
+            await DataController._check_integration(user_id)
+            
+            key_field = HASH_KEYS.get(collection, "github_id")
+            if key_field == "github_id":
+                if not key.isdigit():
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"{collection} documents are identified by a numeric github_id"
+                    )
+                key = int(key)
+            query = {"tenant_id": user_id, key_field: key}
+            
+            with timed(MONGO_OPERATION_SECONDS, "mongo.find", collection=collection, operation="find_one"):
+                if collection in BUCKETS:
+                    found = await BUCKETS[collection].find(db, query, [], 0, 1)
+                    document = found[0] if found else None
+                else:
+                    document = await db[collection].find_one(query)
+            if not document:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Document not found"
+                )
+            
+            await ContentStore.hydrate(db, collection, [document])
+            return BSONJSONResponse(document)
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting document: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to retrieve document"
+            )
+    
+    @staticmethod
+    async def lookup_users(user_id: int, logins: Optional[str] = None, ids: Optional[str] = None, emails: Optional[str] = None):
+        """Resolve comma-separated logins, GitHub ids and commit emails to users in one query"""
         try:
-            db = get_database()
+            db = get_read_database()
+            keys = {
+                "logins": [login.strip() for login in (logins or "").split(",") if login.strip()],
+                "ids": [github_id.strip() for github_id in (ids or "").split(",") if github_id.strip()],
+                "emails": [email.strip().lower() for email in (emails or "").split(",") if email.strip()]
+            }
+            if not any(keys.values()):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Pass at least one of logins, ids or emails"
+                )
+            if sum(len(values) for values in keys.values()) > settings.USER_LOOKUP_MAX_KEYS:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"At most {settings.USER_LOOKUP_MAX_KEYS} users can be looked up at once"
+                )
+            if not all(github_id.isdigit() for github_id in keys["ids"]):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="ids must be numeric GitHub ids"
+                )
+            keys["ids"] = [int(github_id) for github_id in keys["ids"]]
+            await DataController._check_integration(user_id)
+            
+            clauses = [
+                {field: {"$in": keys[name]}}
+                for name, field in (("logins", "login"), ("ids", "github_id"), ("emails", "emails"))
+                if keys[name]
+            ]
+            with timed(MONGO_OPERATION_SECONDS, "mongo.find", collection=USERS_COLLECTION, operation="find"):
+                users = await db[USERS_COLLECTION].find(
+                    {"tenant_id": user_id, "$or": clauses}, collation=CASE_INSENSITIVE
+                ).to_list(length=None)
+            
+            # Logins match whatever their case, so they are compared lowercased
+            found = {
+                "logins": {user["login"].lower() for user in users},
+                "ids": {user["github_id"] for user in users},
+                "emails": {email for user in users for email in user.get("emails", ())}
+            }
+            return BSONJSONResponse({
+                "data": users,
+                "missing": {
+                    name: [key for key in values if (key.lower() if name == "logins" else key) not in found[name]]
+                    for name, values in keys.items()
+                }
+            })
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error looking up users: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to look up users"
+            )
+    
+    @staticmethod
+    async def global_search(user_id: int, query: str, limit: int = 50):
+        """Search one integration's data across all GitHub collections"""
+        try:
+            db = get_read_database()
+            await DataController._check_integration(user_id)
             results = {}
             
             collections = {
@@ -132,33 +278,29 @@ class DataController:
             }
             
             for result_key, collection_name in collections.items():
-                search_fields = DataController._get_search_fields(collection_name)
-                search_conditions = []
-                
-                for field in search_fields:
-                    search_conditions.append({
-                        field: {"$regex": query, "$options": "i"}
-                    })
+                search_query = DataController._search_query(collection_name, query)
                 
-                if search_conditions:
-                    coll = db[collection_name]
-                    cursor = coll.find({"$or": search_conditions}).limit(limit)
-                    documents = await cursor.to_list(length=limit)
-                    
-                    # Convert ObjectId to string
-                    for doc in documents:
-                        if "_id" in doc:
-                            doc["_id"] = str(doc["_id"])
+                if search_query:
+                    await DataController._search_content(db, collection_name, user_id, query, search_query)
+                    search_query["tenant_id"] = user_id
+                    with timed(MONGO_OPERATION_SECONDS, "mongo.find", collection=collection_name, operation="search"):
+                        if collection_name in BUCKETS:
+                            documents = await BUCKETS[collection_name].find(db, search_query, [], 0, limit)
+                        else:
+                            cursor = db[collection_name].find(search_query).limit(limit)
+                            documents = await cursor.to_list(length=limit)
                     
                     results[result_key] = documents
                 else:
                     results[result_key] = []
             
-            return {
+            return BSONJSONResponse({
                 "query": query,
                 "results": results
-            }
+            })
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error in global search: {e}")
             raise HTTPException(
@@ -166,6 +308,103 @@ class DataController:
                 detail="Search failed"
             )
     
+    @staticmethod
+    def _check_collection(collection: str):
+        if collection not in VALID_COLLECTIONS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid collection. Must be one of: {', '.join(VALID_COLLECTIONS)}"
+            )
+    
+    @staticmethod
+    async def _check_integration(user_id: int):
+        """Only active integrations are readable; one being removed is hidden at once.
+
+        Read from the primary, since a lagging secondary would still show a
+        removed integration as active.
+        """
+        integration = await get_database().github_integration.find_one(
+            {"github_user_id": user_id, "integration_status": "active"},
+            {"_id": 1}
+        )
+        if not integration:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Integration not found"
+            )
+    
+    @staticmethod
+    def _build_query(collection: str, user_id: int, filter_params: Optional[str], search: Optional[str]) -> Dict[str, Any]:
+        """Build the MongoDB filter for a collection data request, scoped to the integration's tenant"""
+        query = {}
+        
+        # Apply filters
+        if filter_params:
+            try:
+                filters = json.loads(filter_params)
+            except json.JSONDecodeError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid filter JSON format"
+                )
+            try:
+                query.update(compile_filter(collection, filters))
+            except FilterError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+        
+        # Apply search
+        if search:
+            query.update(DataController._search_query(collection, search))
+        
+        # Set last so a client filter can never widen the scope
+        query["tenant_id"] = user_id
+        return query
+    
+    @staticmethod
+    def _search_query(collection: str, search: str) -> Dict[str, Any]:
+        """Case-insensitive regex match across a collection's searchable fields"""
+        search_conditions = []
+        for field in DataController._get_search_fields(collection):
+            search_conditions.append({
+                field: {"$regex": search, "$options": "i"}
+            })
+        return {"$or": search_conditions} if search_conditions else {}
+    
+    @staticmethod
+    async def _search_content(db, collection: str, user_id: int, search: str, query: Dict[str, Any]):
+        """Widen a keyword search to split documents whose full text matches past the preview"""
+        if content_store is None or "$or" not in query:
+            return
+        query["$or"] = query["$or"] + await ContentStore.search(db, user_id, collection, search)
+    
+    @staticmethod
+    def _build_sort(collection: str, sort_by: Optional[str], sort_order: str) -> List[tuple]:
+        """Sort criteria for a collection data request"""
+        sort_criteria = []
+        if sort_by:
+            try:
+                check_sort_field(collection, sort_by)
+            except FilterError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+            sort_direction = 1 if sort_order == "asc" else -1
+            sort_criteria.append((sort_by, sort_direction))
+        else:
+            # Default sort by creation date or _id
+            if collection in ["github_pulls", "github_issues"]:
+                sort_criteria.append(("created_at", -1))
+            elif collection == "github_commits":
+                # Commits have no created_at
+                sort_criteria.append(("author_date", -1))
+            else:
+                sort_criteria.append(("_id", -1))
+        return sort_criteria
+    
     @staticmethod
     def _get_search_fields(collection: str) -> List[str]:
         """Get searchable fields for each collection"""
@@ -1,8 +1,16 @@
 from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
 from datetime import datetime
+from bson import ObjectId
+from typing import Optional
 from src.helpers.database import get_database
 from src.helpers.github_client import GitHubClient
+from src.helpers.bucket_storage import BUCKETS
+from src.helpers.event_bus import SSE_HEADERS, event_bus, sse_stream, sync_topic
+from src.helpers.tenant_removal import start_removal
+from src.helpers.token_pool import token_pool
 from src.controllers.sync_controller import SyncController
+from src.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,12 +29,15 @@ class IntegrationController:
                     detail="Integration not found"
                 )
             
-            return {
+            response = {
                 "status": integration["integration_status"],
                 "username": integration["username"],
                 "connected_at": integration["connection_timestamp"],
                 "last_sync": integration.get("last_sync")
             }
+            if integration["integration_status"] == "removing":
+                response["removal"] = integration.get("removal")
+            return response
             
         except HTTPException:
             raise
@@ -39,7 +50,7 @@ class IntegrationController:
     
     @staticmethod
     async def remove_integration(user_id: int):
-        """Remove integration and all associated data"""
+        """Remove integration and all associated data in the background"""
         try:
             db = get_database()
             
@@ -51,26 +62,22 @@ class IntegrationController:
                     detail="Integration not found"
                 )
             
-            # Delete all associated data
-            collections = [
-                "github_integration",
-                "github_organizations",
-                "github_repos",
-                "github_commits",
-                "github_pulls",
-                "github_issues",
-                "github_changelogs",
-                "github_users"
-            ]
-            
-            for collection_name in collections:
-                collection = db[collection_name]
-                if collection_name == "github_integration":
-                    await collection.delete_one({"github_user_id": user_id})
-                else:
-                    await collection.delete_many({"integration_user_id": user_id})
-            
-            return {"message": "Integration removed successfully"}
+            # Reads and syncs only use active integrations, so the data is
+            # hidden before any of it is deleted
+            await db.github_integration.update_one(
+                {"github_user_id": user_id},
+                {"$set": {"integration_status": "removing", "removal_requested_at": datetime.utcnow()}}
+            )
+            # The pool is per process and already holds the token; other
+            # processes drop it when their next sync refreshes the pool
+            token_pool.remove(user_id)
+            start_removal(db, user_id)
+            
+            return {
+                "message": "Integration removal started",
+                "status": "removing",
+                "progress": f"/integration/status?user_id={user_id}"
+            }
             
         except HTTPException:
             raise
@@ -82,7 +89,7 @@ class IntegrationController:
             )
     
     @staticmethod
-    async def resync_data(user_id: int):
+    async def resync_data(user_id: int, profile: bool = False, cpu_profile: bool = False):
         """Re-fetch and re-store all GitHub data"""
         try:
             db = get_database()
@@ -94,25 +101,37 @@ class IntegrationController:
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Integration not found"
                 )
+            if integration["integration_status"] == "removing":
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Integration is being removed"
+                )
             
-            # Clear existing data (except integration)
-            collections = [
-                "github_organizations",
-                "github_repos", 
-                "github_commits",
-                "github_pulls",
-                "github_issues",
-                "github_changelogs",
-                "github_users"
-            ]
-            
-            for collection_name in collections:
-                collection = db[collection_name]
-                await collection.delete_many({"integration_user_id": user_id})
+            if not settings.SYNC_CHANGE_DETECTION:
+                # Clear existing data (except integration)
+                collections = [
+                    "github_organizations",
+                    "github_repos",
+                    "github_commits",
+                    "github_pulls",
+                    "github_issues",
+                    "github_changelogs",
+                    "github_users",
+                    "github_content"
+                ] + [storage.name for storage in BUCKETS.values() if storage.name != storage.collection]
+                
+                for collection_name in collections:
+                    collection = db[collection_name]
+                    await collection.delete_many({"tenant_id": user_id})
+            # Otherwise existing documents are kept: the sync only rewrites
+            # changed ones, and deletes those GitHub no longer returns even
+            # when SYNC_DELETE_STALE leaves that to explicit resyncs
             
             # Re-sync all data
             sync_controller = SyncController()
-            await sync_controller.sync_all_data(user_id, integration["access_token"])
+            sync_stats = await sync_controller.sync_all_data(
+                user_id, integration["access_token"], profile=profile, cpu_profile=cpu_profile, delete_stale=True
+            )
             
             # Update last sync timestamp
             await db.github_integration.update_one(
@@ -120,7 +139,7 @@ class IntegrationController:
                 {"$set": {"last_sync": datetime.utcnow()}}
             )
             
-            return {"message": "Data resync completed successfully"}
+            return {"message": "Data resync completed successfully", "sync_stats": sync_stats}
             
         except HTTPException:
             raise
@@ -129,4 +148,77 @@ class IntegrationController:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to resync data"
-            )
\ No newline at end of file
+            )
+    
+    @staticmethod
+    async def stream_sync_events(user_id: int, sync_id: Optional[str] = None, last_event_id: Optional[int] = None):
+        """Stream an integration's sync progress as Server-Sent Events.
+
+        With ``sync_id`` the retained events of that sync are replayed first
+        and the stream ends when the sync does. ``last_event_id`` resumes a
+        dropped connection.
+        """
+        try:
+            db = get_database()
+            integration = await db.github_integration.find_one({"github_user_id": user_id}, {"_id": 1})
+            if not integration:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Integration not found"
+                )
+
+            after = last_event_id if last_event_id is not None else (0 if sync_id else None)
+            subscription = event_bus.subscribe(sync_topic(user_id), after=after)
+
+            wanted = last = None
+            if sync_id:
+                wanted = lambda event: event["data"].get("sync_id", sync_id) == sync_id
+                last = lambda event: event["event"] in ("sync_finished", "sync_failed")
+            return StreamingResponse(
+                sse_stream(subscription, event_bus.unsubscribe, wanted, last),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming sync events: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to stream sync events"
+            )
+
+    @staticmethod
+    async def get_sync_report(user_id: int, report_id: Optional[str] = None):
+        """Get a stored sync profiling report (the latest one by default)"""
+        try:
+            db = get_database()
+            
+            query = {"tenant_id": user_id}
+            if report_id:
+                if not ObjectId.is_valid(report_id):
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Invalid report id"
+                    )
+                query["_id"] = ObjectId(report_id)
+            
+            report = await db.github_sync_reports.find_one(query, sort=[("started_at", -1)])
+            if not report:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Sync report not found"
+                )
+            
+            report["_id"] = str(report["_id"])
+            return report
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting sync report: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to get sync report"
+            )
@@ -0,0 +1,188 @@
+from bson import ObjectId
+from datetime import datetime
+from fastapi import HTTPException, status
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import Any, Dict, Optional
+import json
+import os
+from src.config import settings
+from src.helpers.database import get_database
+from src.helpers.query_filter import FilterError, compile_filter
+from src.helpers.snapshots import (
+    SNAPSHOT_COLLECTION, SNAPSHOT_CURSOR_FIELDS, arrow_stream, pa, previous_watermark, start_snapshot
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _serialize(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    snapshot["_id"] = str(snapshot["_id"])
+    snapshot.pop("query", None)
+    return snapshot
+
+class SnapshotController:
+    @staticmethod
+    async def create_snapshots(
+        user_id: int,
+        collections: Optional[str] = None,
+        filter_params: Optional[str] = None,
+        incremental: bool = False
+    ):
+        """Queue one snapshot per collection; files are written in the background"""
+        try:
+            if pa is None:
+                raise HTTPException(
+                    status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                    detail="Snapshots need pyarrow installed"
+                )
+            names = [name.strip() for name in collections.split(",") if name.strip()] if collections else list(SNAPSHOT_CURSOR_FIELDS)
+            invalid = [name for name in names if name not in SNAPSHOT_CURSOR_FIELDS]
+            if invalid:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid collection. Must be one of: {', '.join(SNAPSHOT_CURSOR_FIELDS)}"
+                )
+            if filter_params and len(names) != 1:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="A filter applies to a single collection"
+                )
+
+            query = {}
+            if filter_params:
+                try:
+                    query = compile_filter(names[0], json.loads(filter_params))
+                except json.JSONDecodeError:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Invalid filter JSON format"
+                    )
+                except FilterError as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=str(e)
+                    )
+
+            db = get_database()
+            integration = await db.github_integration.find_one(
+                {"github_user_id": user_id, "integration_status": "active"},
+                {"_id": 1}
+            )
+            if not integration:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Integration not found"
+                )
+
+            snapshots = []
+            for collection in names:
+                since = await previous_watermark(db, user_id, collection, filter_params) if incremental else None
+                snapshot = {
+                    "_id": ObjectId(),
+                    "tenant_id": user_id,
+                    "collection": collection,
+                    "status": "pending",
+                    "filter": filter_params,
+                    "query": query,
+                    "incremental": since is not None,
+                    "cursor_field": SNAPSHOT_CURSOR_FIELDS[collection],
+                    "since": since,
+                    "started_at": datetime.utcnow()
+                }
+                await db[SNAPSHOT_COLLECTION].insert_one(snapshot)
+                start_snapshot(db, snapshot)
+                snapshots.append(_serialize(dict(snapshot)))
+
+            return {"snapshots": snapshots}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error creating snapshots: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to create snapshots"
+            )
+
+    @staticmethod
+    async def list_snapshots(user_id: int, collection: Optional[str] = None, limit: int = 50):
+        """Most recent snapshots of an integration"""
+        try:
+            db = get_database()
+            query = {"tenant_id": user_id}
+            if collection:
+                query["collection"] = collection
+            cursor = db[SNAPSHOT_COLLECTION].find(query).sort("started_at", -1).limit(limit)
+            return {"snapshots": [_serialize(snapshot) async for snapshot in cursor]}
+
+        except Exception as e:
+            logger.error(f"Error listing snapshots: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to list snapshots"
+            )
+
+    @staticmethod
+    async def get_snapshot(snapshot_id: str, user_id: int):
+        try:
+            return _serialize(await SnapshotController._find(snapshot_id, user_id))
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching snapshot: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to fetch snapshot"
+            )
+
+    @staticmethod
+    async def download_snapshot(snapshot_id: str, user_id: int, format: str = "parquet"):
+        """Serve a completed snapshot as the Parquet file or as an Arrow IPC stream"""
+        try:
+            snapshot = await SnapshotController._find(snapshot_id, user_id)
+            if snapshot["status"] != "complete":
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Snapshot is {snapshot['status']}"
+                )
+            path = os.path.join(settings.SNAPSHOT_PATH, snapshot["path"])
+            if not os.path.exists(path):
+                raise HTTPException(
+                    status_code=status.HTTP_410_GONE,
+                    detail="Snapshot file no longer exists"
+                )
+
+            name = f"{snapshot['collection']}-{snapshot_id}"
+            if format == "arrow":
+                return StreamingResponse(
+                    arrow_stream(path),
+                    media_type="application/vnd.apache.arrow.stream",
+                    headers={"Content-Disposition": f'attachment; filename="{name}.arrows"'}
+                )
+            return FileResponse(path, media_type="application/vnd.apache.parquet", filename=f"{name}.parquet")
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error downloading snapshot: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to download snapshot"
+            )
+
+    @staticmethod
+    async def _find(snapshot_id: str, user_id: int) -> Dict[str, Any]:
+        if not ObjectId.is_valid(snapshot_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Snapshot not found"
+            )
+        db = get_database()
+        snapshot = await db[SNAPSHOT_COLLECTION].find_one({"_id": ObjectId(snapshot_id), "tenant_id": user_id})
+        if not snapshot:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Snapshot not found"
+            )
+        return snapshot
@@ -1,351 +1,536 @@
 from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from src.helpers.github_client import GitHubClient
-from src.helpers.database import get_database
+from src.helpers.bucket_storage import BUCKETS
+from src.helpers.commit_storage import SharedCommitStorage
+from src.helpers.database import get_sync_database
+from src.helpers.sync_pipeline import SyncPipeline, RawPage
+from src.helpers.sync_profiler import SyncProfiler
+from src.helpers.change_detector import ChangeDetector
+from src.helpers.event_bus import SyncProgress
+from src.helpers.git_commits import GitMirror
+from src.helpers.transformers import TRANSFORMERS
+from src.helpers.token_pool import token_pool
+from src.helpers.user_directory import IdentityCache
+from src.helpers.metrics import SYNC_DOCUMENTS_PER_SECOND, SYNC_PHASE_SECONDS, span, timed
+from src.config import settings
+from bson import ObjectId
 import logging
-import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
+PER_PAGE = 100
+
+# Key of a raw GitHub item, matching change_detector.HASH_KEYS on the document
+RAW_KEYS = {"github_commits": "sha"}
+
+def _iso(when: Optional[datetime]) -> Optional[str]:
+    """A naive UTC time as the ISO-8601 form GitHub's ``since`` parameters take"""
+    return f"{when:%Y-%m-%dT%H:%M:%S}Z" if when is not None else None
+
 class SyncController:
-    async def sync_all_data(self, user_id: int, access_token: str):
-        """Sync all GitHub data for a user"""
-        github_client = GitHubClient(access_token)
-        db = get_database()
-        
-        try:
+    async def sync_all_data(
+        self,
+        user_id: int,
+        access_token: str,
+        profile: bool = False,
+        cpu_profile: bool = False,
+        delete_stale: bool = settings.SYNC_DELETE_STALE
+    ) -> Dict[str, Any]:
+        """Sync all GitHub data for a user.
+
+        With ``profile`` a per-repository breakdown of the sync is stored in
+        ``github_sync_reports`` and its id returned as ``report_id``;
+        ``cpu_profile`` adds sampled Python stacks to it. With
+        ``delete_stale`` stored data GitHub no longer returns is deleted,
+        down to whole repositories and organizations.
+        """
+        async def phases(github_client: GitHubClient, db, pipeline: SyncPipeline):
+            seen_repos: Set[int] = set()
+
             # Sync organizations
-            await self._sync_organizations(github_client, db, user_id)
-            
+            with timed(SYNC_PHASE_SECONDS, "sync.organizations", phase="organizations"):
+                org_logins = await self._sync_organizations(github_client, pipeline, user_id)
+
             # Sync user repositories
-            await self._sync_user_repositories(github_client, db, user_id)
-            
+            with timed(SYNC_PHASE_SECONDS, "sync.user_repositories", phase="user_repositories"):
+                await self._sync_user_repositories(github_client, db, pipeline, user_id, seen_repos)
+
             # Sync organization repositories
-            await self._sync_organization_repositories(github_client, db, user_id)
-            
-            logger.info(f"Data sync completed for user {user_id}")
-            
+            with timed(SYNC_PHASE_SECONDS, "sync.organization_repositories", phase="organization_repositories"):
+                await self._sync_organization_repositories(github_client, db, pipeline, user_id, org_logins, seen_repos)
+
+            # Both listings completed, so anything else stored is gone from GitHub
+            pipeline.delete_unlisted(user_id, seen_repos, org_logins)
+
+        profiler = SyncProfiler(user_id, cpu_profile) if profile or cpu_profile else None
+        return await self._run_sync(user_id, access_token, phases, profiler, delete_stale)
+
+    async def sync_repositories(
+        self,
+        user_id: int,
+        access_token: str,
+        select: Callable[[List[dict], GitHubClient], Awaitable[List[dict]]],
+        refresh_members: bool = True
+    ) -> Dict[str, Any]:
+        """Sync only the repositories ``select`` picks from the current listings.
+
+        Organizations and the repository listings are always stored. ``select``
+        receives every listed repository and the client, and returns those
+        whose commits, pulls and issues are fetched. Organization members are
+        only fetched with ``refresh_members``. The returned stats include the
+        GitHub requests made per repository under ``requests``.
+        """
+        requests: Dict[Optional[str], int] = {}
+
+        async def phases(github_client: GitHubClient, db, pipeline: SyncPipeline):
+            nonlocal requests
+            requests = github_client.requests
+
+            with timed(SYNC_PHASE_SECONDS, "sync.organizations", phase="organizations"):
+                org_logins = await self._sync_organizations(github_client, pipeline, user_id, members=refresh_members)
+
+            with timed(SYNC_PHASE_SECONDS, "sync.listing", phase="listing"):
+                repos = await self._list_repositories(github_client, org_logins)
+                await pipeline.emit(RawPage("github_repos", repos, TRANSFORMERS["github_repos"], {"user_id": user_id}))
+                pipeline.delete_unlisted(user_id, {repo_data["id"] for repo_data in repos}, org_logins)
+
+            for repo_data in await select(repos, github_client):
+                await self._queue_repository(github_client, db, pipeline, repo_data, user_id)
+
+        stats = await self._run_sync(user_id, access_token, phases)
+        stats["requests"] = dict(requests)
+        return stats
+
+    async def _run_sync(
+        self,
+        user_id: int,
+        access_token: str,
+        phases: Callable[[GitHubClient, Any, SyncPipeline], Awaitable[None]],
+        profiler: Optional[SyncProfiler] = None,
+        delete_stale: bool = settings.SYNC_DELETE_STALE
+    ) -> Dict[str, Any]:
+        """Run ``phases`` with a client and pipeline, then drain the pipeline.
+
+        Progress is published on the integration's event bus topic under a
+        fresh ``sync_id``, which the stats also carry.
+        """
+        db = get_sync_database()
+        progress = SyncProgress(user_id, str(ObjectId()))
+
+        try:
+            pool = None
+            if settings.TOKEN_POOL_ENABLED:
+                # Repository requests may borrow budget from other integrations
+                await token_pool.refresh(db)
+                token_pool.add_token(user_id, access_token)
+                pool = token_pool
+
+            identities = None
+            if settings.USER_DIRECTORY_ENABLED:
+                identities = IdentityCache(user_id)
+                await identities.load(db)
+
+            pipeline = SyncPipeline(
+                db, delete_stale=delete_stale, profiler=profiler, progress=progress, identities=identities, tenant_id=user_id
+            )
+            started = time.monotonic()
+            progress.emit("sync_started")
+            if profiler is not None:
+                profiler.start()
+            with span("sync", user_id=user_id):
+                async with GitHubClient(access_token, pool, profiler, progress) as github_client:
+                    pipeline.start()
+                    try:
+                        await phases(github_client, db, pipeline)
+                    finally:
+                        # Wait for queued fetch, transform and write work to finish
+                        with timed(SYNC_PHASE_SECONDS, "sync.drain", phase="drain"):
+                            await pipeline.close()
+                        if profiler is not None:
+                            profiler.stop()
+
+            elapsed = time.monotonic() - started
+            SYNC_PHASE_SECONDS.observe(elapsed, phase="total")
+            stats = pipeline.stats()
+            skipped = stats["change_detection"]["skipped"] if stats["change_detection"] else 0
+            if elapsed > 0:
+                SYNC_DOCUMENTS_PER_SECOND.set(round((stats["documents_written"] + skipped) / elapsed, 2))
+            logger.info(f"Data sync completed for user {user_id}: {stats['documents_written']} documents written, {skipped} unchanged")
+            stats["sync_id"] = progress.sync_id
+            progress.emit(
+                "sync_finished", documents_written=stats["documents_written"],
+                documents_deleted=stats["documents_deleted"], unchanged=skipped, seconds=round(elapsed, 2)
+            )
+
+            if profiler is not None:
+                result = await db.github_sync_reports.insert_one(profiler.report(stats))
+                stats["report_id"] = str(result.inserted_id)
+            return stats
+
         except Exception as e:
             logger.error(f"Error syncing data for user {user_id}: {e}")
+            progress.emit("sync_failed", error=str(e))
             raise
-    
-    async def _sync_organizations(self, github_client: GitHubClient, db, user_id: int):
-        """Sync user organizations"""
+
+    async def _sync_organizations(self, github_client: GitHubClient, pipeline: SyncPipeline, user_id: int, members: bool = True) -> List[str]:
+        """Sync user organizations and queue their members"""
         try:
             orgs = await github_client.get_organizations()
-            
-            for org_data in orgs:
-                org_doc = {
-                    "github_id": org_data["id"],
-                    "login": org_data["login"],
-                    "name": org_data.get("name"),
-                    "description": org_data.get("description"),
-                    "url": org_data["url"],
-                    "avatar_url": org_data.get("avatar_url"),
-                    "created_at": datetime.fromisoformat(org_data["created_at"].replace("Z", "+00:00")),
-                    "updated_at": datetime.fromisoformat(org_data["updated_at"].replace("Z", "+00:00")),
-                    "user_id": user_id
-                }
-                
-                await db.github_organizations.update_one(
-                    {"github_id": org_data["id"]},
-                    {"$set": org_doc},
-                    upsert=True
-                )
-                
+            await pipeline.emit(RawPage("github_organizations", orgs, TRANSFORMERS["github_organizations"], {"user_id": user_id}))
+
+            for org_data in orgs if members else []:
                 # Sync organization members
-                await self._sync_organization_members(github_client, db, org_data["login"], user_id)
-                
+                await pipeline.submit(self._paginate(
+                    pipeline,
+                    lambda page, org=org_data["login"]: github_client.get_organization_members(org, page=page, per_page=PER_PAGE),
+                    "github_users", {"user_id": user_id},
+                    f"organization members for {org_data['login']}"
+                ))
+
+            return [org_data["login"] for org_data in orgs]
+
         except Exception as e:
             logger.error(f"Error syncing organizations: {e}")
             raise
-    
-    async def _sync_user_repositories(self, github_client: GitHubClient, db, user_id: int):
+
+    async def _sync_user_repositories(self, github_client: GitHubClient, db, pipeline: SyncPipeline, user_id: int, seen_repos: Set[int]):
         """Sync user repositories"""
         try:
             page = 1
             while True:
-                repos = await github_client.get_user_repos(page=page, per_page=100)
+                repos = await github_client.get_user_repos(page=page, per_page=PER_PAGE)
                 if not repos:
                     break
-                
-                for repo_data in repos:
-                    await self._process_repository(github_client, db, repo_data, user_id)
-                
-                if len(repos) < 100:
+
+                await self._process_repositories(github_client, db, pipeline, repos, user_id, seen_repos)
+
+                if len(repos) < PER_PAGE:
                     break
                 page += 1
-                
+
         except Exception as e:
             logger.error(f"Error syncing user repositories: {e}")
             raise
-    
-    async def _sync_organization_repositories(self, github_client: GitHubClient, db, user_id: int):
+
+    async def _sync_organization_repositories(self, github_client: GitHubClient, db, pipeline: SyncPipeline, user_id: int, org_logins: List[str], seen_repos: Set[int]):
         """Sync repositories for all organizations"""
         try:
-            orgs = await db.github_organizations.find({"user_id": user_id}).to_list(None)
-            
-            for org in orgs:
+            for org in org_logins:
                 page = 1
                 while True:
-                    repos = await github_client.get_organization_repos(org["login"], page=page, per_page=100)
+                    repos = await github_client.get_organization_repos(org, page=page, per_page=PER_PAGE)
                     if not repos:
                         break
-                    
-                    for repo_data in repos:
-                        await self._process_repository(github_client, db, repo_data, user_id)
-                    
-                    if len(repos) < 100:
+
+                    await self._process_repositories(github_client, db, pipeline, repos, user_id, seen_repos)
+
+                    if len(repos) < PER_PAGE:
                         break
                     page += 1
-                    
+
         except Exception as e:
             logger.error(f"Error syncing organization repositories: {e}")
             raise
-    
-    async def _process_repository(self, github_client: GitHubClient, db, repo_data: dict, user_id: int):
-        """Process a single repository and sync its data"""
-        try:
-            # Store repository
-            repo_doc = {
-                "github_id": repo_data["id"],
-                "name": repo_data["name"],
-                "full_name": repo_data["full_name"],
-                "description": repo_data.get("description"),
-                "private": repo_data["private"],
-                "owner_login": repo_data["owner"]["login"],
-                "owner_id": repo_data["owner"]["id"],
-                "html_url": repo_data["html_url"],
-                "clone_url": repo_data["clone_url"],
-                "language": repo_data.get("language"),
-                "stargazers_count": repo_data["stargazers_count"],
-                "watchers_count": repo_data["watchers_count"],
-                "forks_count": repo_data["forks_count"],
-                "open_issues_count": repo_data["open_issues_count"],
-                "default_branch": repo_data["default_branch"],
-                "created_at": datetime.fromisoformat(repo_data["created_at"].replace("Z", "+00:00")),
-                "updated_at": datetime.fromisoformat(repo_data["updated_at"].replace("Z", "+00:00")),
-                "pushed_at": datetime.fromisoformat(repo_data["pushed_at"].replace("Z", "+00:00")) if repo_data.get("pushed_at") else None,
-                "user_id": user_id
-            }
-            
-            await db.github_repos.update_one(
-                {"github_id": repo_data["id"]},
-                {"$set": repo_doc},
-                upsert=True
-            )
-            
-            # Sync repository data concurrently
-            await asyncio.gather(
-                self._sync_repository_commits(github_client, db, repo_data["owner"]["login"], repo_data["name"], repo_data["id"], user_id),
-                self._sync_repository_pulls(github_client, db, repo_data["owner"]["login"], repo_data["name"], repo_data["id"], user_id),
-                self._sync_repository_issues(github_client, db, repo_data["owner"]["login"], repo_data["name"], repo_data["id"], user_id)
-            )
-            
-        except Exception as e:
-            logger.error(f"Error processing repository {repo_data['full_name']}: {e}")
-    
-    async def _sync_repository_commits(self, github_client: GitHubClient, db, owner: str, repo: str, repo_id: int, user_id: int):
-        """Sync commits for a repository"""
-        try:
+
+    async def _process_repositories(self, github_client: GitHubClient, db, pipeline: SyncPipeline, repos: List[dict], user_id: int, seen_repos: Set[int]):
+        """Store a page of repositories and queue fetch jobs for their data"""
+        # Organization repos also appear in the user listing; sync each once
+        repos = [repo_data for repo_data in repos if repo_data["id"] not in seen_repos]
+        seen_repos.update(repo_data["id"] for repo_data in repos)
+
+        await pipeline.emit(RawPage("github_repos", repos, TRANSFORMERS["github_repos"], {"user_id": user_id}))
+
+        for repo_data in repos:
+            await self._queue_repository(github_client, db, pipeline, repo_data, user_id)
+
+    async def _list_repositories(self, github_client: GitHubClient, org_logins: List[str]) -> List[dict]:
+        """Every repository of the user and their organizations, each listed once"""
+        listing: Dict[int, dict] = {}
+        for fetch_page in [github_client.get_user_repos] + [
+            lambda page, per_page, org=org: github_client.get_organization_repos(org, page=page, per_page=per_page)
+            for org in org_logins
+        ]:
             page = 1
             while True:
-                commits = await github_client.get_repository_commits(owner, repo, page=page, per_page=100)
-                if not commits:
-                    break
-                
-                for commit_data in commits:
-                    commit_doc = {
-                        "sha": commit_data["sha"],
-                        "message": commit_data["commit"]["message"],
-                        "author_name": commit_data["commit"]["author"].get("name"),
-                        "author_email": commit_data["commit"]["author"].get("email"),
-                        "author_date": datetime.fromisoformat(commit_data["commit"]["author"]["date"].replace("Z", "+00:00")),
-                        "committer_name": commit_data["commit"]["committer"].get("name"),
-                        "committer_email": commit_data["commit"]["committer"].get("email"),
-                        "committer_date": datetime.fromisoformat(commit_data["commit"]["committer"]["date"].replace("Z", "+00:00")),
-                        "html_url": commit_data["html_url"],
-                        "repository_id": repo_id,
-                        "repository_name": f"{owner}/{repo}",
-                        "additions": commit_data.get("stats", {}).get("additions"),
-                        "deletions": commit_data.get("stats", {}).get("deletions"),
-                        "total_changes": commit_data.get("stats", {}).get("total"),
-                        "user_id": user_id
-                    }
-                    
-                    await db.github_commits.update_one(
-                        {"sha": commit_data["sha"], "repository_id": repo_id},
-                        {"$set": commit_doc},
-                        upsert=True
-                    )
-                
-                if len(commits) < 100:
+                repos = await fetch_page(page=page, per_page=PER_PAGE)
+                for repo_data in repos:
+                    listing.setdefault(repo_data["id"], repo_data)
+                if len(repos) < PER_PAGE:
                     break
                 page += 1
-                
-        except Exception as e:
-            logger.error(f"Error syncing commits for {owner}/{repo}: {e}")
-    
-    async def _sync_repository_pulls(self, github_client: GitHubClient, db, owner: str, repo: str, repo_id: int, user_id: int):
-        """Sync pull requests for a repository"""
+        return list(listing.values())
+
+    async def _queue_repository(self, github_client: GitHubClient, db, pipeline: SyncPipeline, repo_data: dict, user_id: int):
+        """Queue fetch jobs for a repository's commits, pulls and issues"""
         try:
-            page = 1
-            while True:
-                pulls = await github_client.get_repository_pulls(owner, repo, page=page, per_page=100)
-                if not pulls:
-                    break
-                
-                for pull_data in pulls:
-                    pull_doc = {
-                        "github_id": pull_data["id"],
-                        "number": pull_data["number"],
-                        "title": pull_data["title"],
-                        "body": pull_data.get("body"),
-                        "state": pull_data["state"],
-                        "user_login": pull_data["user"]["login"],
-                        "user_id": pull_data["user"]["id"],
-                        "assignee_login": pull_data["assignee"]["login"] if pull_data.get("assignee") else None,
-                        "assignee_id": pull_data["assignee"]["id"] if pull_data.get("assignee") else None,
-                        "html_url": pull_data["html_url"],
-                        "created_at": datetime.fromisoformat(pull_data["created_at"].replace("Z", "+00:00")),
-                        "updated_at": datetime.fromisoformat(pull_data["updated_at"].replace("Z", "+00:00")),
-                        "closed_at": datetime.fromisoformat(pull_data["closed_at"].replace("Z", "+00:00")) if pull_data.get("closed_at") else None,
-                        "merged_at": datetime.fromisoformat(pull_data["merged_at"].replace("Z", "+00:00")) if pull_data.get("merged_at") else None,
-                        "head_ref": pull_data["head"]["ref"],
-                        "base_ref": pull_data["base"]["ref"],
-                        "repository_id": repo_id,
-                        "repository_name": f"{owner}/{repo}",
-                        "integration_user_id": user_id
-                    }
-                    
-                    await db.github_pulls.update_one(
-                        {"github_id": pull_data["id"]},
-                        {"$set": pull_doc},
-                        upsert=True
-                    )
-                
-                if len(pulls) < 100:
-                    break
-                page += 1
-                
+            owner = repo_data["owner"]["login"]
+            repo = repo_data["name"]
+            context = {
+                "user_id": user_id,
+                "repository_id": repo_data["id"],
+                "repository_name": f"{owner}/{repo}"
+            }
+
+            if github_client.token_pool is not None:
+                github_client.token_pool.grant(repo_data["full_name"], [user_id], repo_data["private"])
+                await github_client.token_pool.load_grants(db, repo_data["id"], repo_data["full_name"])
+
+            commits = BUCKETS.get("github_commits")
+            shared = isinstance(commits, SharedCommitStorage)
+            if shared:
+                await pipeline.queue_writes("github_commits", [commits.rename(user_id, repo_data["id"], context["repository_name"])])
+
+            # Commits, pulls and issues are fetched concurrently by the pipeline workers
+            if settings.COMMIT_SOURCE == "git":
+                await pipeline.submit(self._git_commits_job(github_client, pipeline, repo_data, context))
+            elif shared and repo_data.get("fork"):
+                await pipeline.submit(self._fork_commits_job(github_client, db, pipeline, repo_data, context))
+            else:
+                since = _iso(pipeline.since("github_commits"))
+                await pipeline.submit(self._paginate(
+                    pipeline,
+                    lambda page, owner=owner, repo=repo: github_client.get_repository_commits(owner, repo, page=page, per_page=PER_PAGE, since=since),
+                    "github_commits", context, f"commits for {owner}/{repo}",
+                    complete=since is None
+                ))
+            await pipeline.submit(self._paginate(
+                pipeline,
+                lambda page, owner=owner, repo=repo: github_client.get_repository_pulls(owner, repo, page=page, per_page=PER_PAGE),
+                "github_pulls", context, f"pulls for {owner}/{repo}"
+            ))
+            await pipeline.submit(self._issues_job(github_client, pipeline, owner, repo, context))
+
         except Exception as e:
-            logger.error(f"Error syncing pulls for {owner}/{repo}: {e}")
-    
-    async def _sync_repository_issues(self, github_client: GitHubClient, db, owner: str, repo: str, repo_id: int, user_id: int):
-        """Sync issues for a repository"""
-        try:
-            page = 1
-            while True:
-                issues = await github_client.get_repository_issues(owner, repo, page=page, per_page=100)
-                if not issues:
-                    break
-                
-                for issue_data in issues:
-                    # Skip pull requests (they appear in issues API)
-                    if issue_data.get("pull_request"):
-                        continue
-                    
-                    issue_doc = {
-                        "github_id": issue_data["id"],
-                        "number": issue_data["number"],
-                        "title": issue_data["title"],
-                        "body": issue_data.get("body"),
-                        "state": issue_data["state"],
-                        "user_login": issue_data["user"]["login"],
-                        "user_id": issue_data["user"]["id"],
-                        "assignee_login": issue_data["assignee"]["login"] if issue_data.get("assignee") else None,
-                        "assignee_id": issue_data["assignee"]["id"] if issue_data.get("assignee") else None,
-                        "labels": [label["name"] for label in issue_data.get("labels", [])],
-                        "html_url": issue_data["html_url"],
-                        "created_at": datetime.fromisoformat(issue_data["created_at"].replace("Z", "+00:00")),
-                        "updated_at": datetime.fromisoformat(issue_data["updated_at"].replace("Z", "+00:00")),
-                        "closed_at": datetime.fromisoformat(issue_data["closed_at"].replace("Z", "+00:00")) if issue_data.get("closed_at") else None,
-                        "repository_id": repo_id,
-                        "repository_name": f"{owner}/{repo}",
-                        "integration_user_id": user_id
-                    }
-                    
-                    await db.github_issues.update_one(
-                        {"github_id": issue_data["id"]},
-                        {"$set": issue_doc},
-                        upsert=True
+            logger.error(f"Error processing repository {repo_data['full_name']}: {e}")
+
+    def _paginate(self, pipeline: SyncPipeline, fetch_page: Callable, collection: str, context: Dict[str, Any], label: str, complete: bool = True):
+        """Build a fetch job that streams every page of a paginated endpoint.
+
+        ``complete`` is False for listings cut off at a retention boundary,
+        which cannot show what was removed upstream.
+        """
+        repository = context.get("repository_name")
+        pipeline.progress.job_started(repository)
+
+        async def job():
+            try:
+                known = await self._preload_hashes(pipeline, collection, context)
+                seen = []
+                page = 1
+                while True:
+                    items = await fetch_page(page)
+                    if not items:
+                        break
+
+                    pipeline.progress.emit("page_fetched", collection=collection, repository=repository, page=page, items=len(items))
+                    yield RawPage(collection, items, TRANSFORMERS[collection], context, known_hashes=known)
+                    if known is not None:
+                        seen.extend(item[RAW_KEYS.get(collection, "id")] for item in items)
+
+                    if len(items) < PER_PAGE:
+                        break
+                    page += 1
+
+                if known is not None and complete:
+                    # Only a complete listing proves that the rest were removed upstream
+                    await pipeline.delete_stale(
+                        collection, context["user_id"], context["repository_id"],
+                        ChangeDetector.stale(known, seen), context["repository_name"]
                     )
-                    
-                    # Sync issue events (changelog)
-                    await self._sync_issue_events(github_client, db, owner, repo, issue_data["number"], repo_id, user_id)
-                
-                if len(issues) < 100:
-                    break
-                page += 1
-                
-        except Exception as e:
-            logger.error(f"Error syncing issues for {owner}/{repo}: {e}")
-    
-    async def _sync_issue_events(self, github_client: GitHubClient, db, owner: str, repo: str, issue_number: int, repo_id: int, user_id: int):
-        """Sync events (changelog) for an issue"""
-        try:
-            events = await github_client.get_issue_events(owner, repo, issue_number)
-            
-            for event_data in events:
-                event_doc = {
-                    "github_id": event_data["id"],
-                    "event": event_data["event"],
-                    "actor_login": event_data["actor"]["login"],
-                    "actor_id": event_data["actor"]["id"],
-                    "created_at": datetime.fromisoformat(event_data["created_at"].replace("Z", "+00:00")),
-                    "issue_id": event_data.get("issue", {}).get("id"),
-                    "issue_number": issue_number,
-                    "repository_id": repo_id,
-                    "repository_name": f"{owner}/{repo}",
-                    "integration_user_id": user_id
-                }
-                
-                await db.github_changelogs.update_one(
-                    {"github_id": event_data["id"]},
-                    {"$set": event_doc},
-                    upsert=True
-                )
-                
-        except Exception as e:
-            logger.error(f"Error syncing events for issue {issue_number} in {owner}/{repo}: {e}")
-    
-    async def _sync_organization_members(self, github_client: GitHubClient, db, org: str, user_id: int):
-        """Sync members of an organization"""
-        try:
-            page = 1
-            while True:
-                members = await github_client.get_organization_members(org, page=page, per_page=100)
-                if not members:
-                    break
-                
-                for member_data in members:
-                    member_doc = {
-                        "github_id": member_data["id"],
-                        "login": member_data["login"],
-                        "name": None,  # Basic member info doesn't include name
-                        "email": None,
-                        "bio": None,
-                        "avatar_url": member_data.get("avatar_url"),
-                        "html_url": member_data["html_url"],
-                        "company": None,
-                        "location": None,
-                        "created_at": None,
-                        "updated_at": datetime.utcnow(),
-                        "public_repos": 0,
-                        "public_gists": 0,
-                        "followers": 0,
-                        "following": 0,
-                        "integration_user_id": user_id
-                    }
-                    
-                    await db.github_users.update_one(
-                        {"github_id": member_data["id"]},
-                        {"$set": member_doc},
-                        upsert=True
+
+            except Exception as e:
+                logger.error(f"Error syncing {label}: {e}")
+                pipeline.progress.emit("error", repository=repository, message=f"Error syncing {label}: {e}")
+            finally:
+                pipeline.progress.job_finished(repository)
+        return job
+
+    def _git_commits_job(self, github_client: GitHubClient, pipeline: SyncPipeline, repo_data: dict, context: Dict[str, Any]):
+        """Build a fetch job that reads commits from the repository's git mirror instead of the REST API"""
+        repository = context["repository_name"]
+        pipeline.progress.job_started(repository)
+
+        async def job():
+            try:
+                mirror = GitMirror(repo_data["id"], repo_data["clone_url"], repo_data["default_branch"])
+                await mirror.fetch(github_client.access_token)
+                known = await self._preload_hashes(pipeline, "github_commits", context)
+                exclude: List[str] = []
+                if known is not None:
+                    # Stored commits bound the walk; those no longer on the branch were force-pushed away
+                    reachable = await mirror.reachable()
+                    exclude = [sha for sha in known if sha in reachable]
+                page = 0
+                async for items in mirror.commits(exclude, repo_data["html_url"], settings.GIT_PAGE_SIZE, pipeline.since("github_commits")):
+                    page += 1
+                    pipeline.progress.emit("page_fetched", collection="github_commits", repository=repository, page=page, items=len(items))
+                    yield RawPage("github_commits", items, TRANSFORMERS["github_commits"], context, known_hashes=known)
+
+                if known is not None:
+                    await pipeline.delete_stale(
+                        "github_commits", context["user_id"], context["repository_id"],
+                        [sha for sha in known if sha not in reachable], repository
                     )
-                
-                if len(members) < 100:
-                    break
-                page += 1
-                    
-        except Exception as e:
-            logger.error(f"Error syncing organization members for {org}: {e}")
\ No newline at end of file
+
+            except Exception as e:
+                logger.error(f"Error syncing commits for {repository} from git: {e}")
+                pipeline.progress.emit("error", repository=repository, message=f"Error syncing commits for {repository} from git: {e}")
+            finally:
+                pipeline.progress.job_finished(repository)
+        return job
+
+    def _fork_commits_job(self, github_client: GitHubClient, db, pipeline: SyncPipeline, repo_data: dict, context: Dict[str, Any]):
+        """Build a fetch job for a fork's commits that reuses the history stored for its parent.
+
+        Only the commits the fork has and its parent lacks are fetched, from a
+        comparison of the default branches. Once the pipeline has drained, the
+        fork is added to the parent's other stored commits. Forks of parents
+        without stored commits, or that diverged by more than
+        FORK_COMPARE_MAX_COMMITS, are paged like any repository.
+        """
+        repository = context["repository_name"]
+        owner, repo = repo_data["owner"]["login"], repo_data["name"]
+        pipeline.progress.job_started(repository)
+
+        async def job():
+            try:
+                divergence = await self._fork_divergence(github_client, db, repo_data, context["user_id"])
+                if divergence is None:
+                    paginate = self._paginate(
+                        pipeline,
+                        lambda page: github_client.get_repository_commits(owner, repo, page=page, per_page=PER_PAGE),
+                        "github_commits", context, f"commits for {repository}"
+                    )
+                    async for page in paginate():
+                        yield page
+                    return
+
+                parent_id, ahead, behind = divergence
+                known = await self._preload_hashes(pipeline, "github_commits", context)
+                for start in range(0, len(ahead), PER_PAGE):
+                    yield RawPage("github_commits", ahead[start:start + PER_PAGE], TRANSFORMERS["github_commits"], context, known_hashes=known)
+
+                async def link():
+                    updated = await BUCKETS["github_commits"].link_fork(
+                        db, context["user_id"], context["repository_id"], repository, parent_id,
+                        [item["sha"] for item in ahead], [item["sha"] for item in behind]
+                    )
+                    logger.info(f"Linked fork {repository} to its parent's commits: {updated} commits updated")
+                pipeline.defer(link)
+
+            except Exception as e:
+                logger.error(f"Error syncing commits for fork {repository}: {e}")
+                pipeline.progress.emit("error", repository=repository, message=f"Error syncing commits for fork {repository}: {e}")
+            finally:
+                pipeline.progress.job_finished(repository)
+        return job
+
+    async def _fork_divergence(self, github_client: GitHubClient, db, repo_data: dict, user_id: int) -> Optional[Tuple[int, List[dict], List[dict]]]:
+        """A fork's parent id, the commits only the fork has and those only the parent has.
+
+        None when the parent has no stored commits or either side is too far ahead.
+        """
+        owner, repo = repo_data["owner"]["login"], repo_data["name"]
+        parent = (await github_client.get_repository(owner, repo)).get("parent")
+        if parent is None:
+            return None
+        stored = await db.github_commits.find_one({"tenant_id": user_id, "repositories.id": parent["id"]}, {"_id": 1})
+        if stored is None:
+            return None
+        fork_ref = f"{owner}:{repo_data['default_branch']}"
+        parent_ref = f"{parent['owner']['login']}:{parent['default_branch']}"
+        ahead = await self._compare(github_client, owner, repo, parent_ref, fork_ref)
+        if ahead is None:
+            return None
+        behind = await self._compare(github_client, parent["owner"]["login"], parent["name"], fork_ref, parent_ref)
+        if behind is None:
+            return None
+        return parent["id"], ahead, behind
+
+    async def _compare(self, github_client: GitHubClient, owner: str, repo: str, base: str, head: str) -> Optional[List[dict]]:
+        """Commits on ``head`` that ``base`` lacks, or None past FORK_COMPARE_MAX_COMMITS"""
+        commits: List[dict] = []
+        page = 1
+        while True:
+            comparison = await github_client.compare_commits(owner, repo, base, head, page=page, per_page=PER_PAGE)
+            if comparison["ahead_by"] > settings.FORK_COMPARE_MAX_COMMITS:
+                return None
+            commits.extend(comparison["commits"])
+            if len(commits) >= comparison["ahead_by"] or not comparison["commits"]:
+                return commits
+            page += 1
+
+    def _issues_job(self, github_client: GitHubClient, pipeline: SyncPipeline, owner: str, repo: str, context: Dict[str, Any]):
+        """Build a fetch job for issues that queues each issue's events"""
+        repository = context["repository_name"]
+        pipeline.progress.job_started(repository)
+
+        async def job():
+            try:
+                known = await self._preload_hashes(pipeline, "github_issues", context)
+                known_events = await self._preload_hashes(pipeline, "github_changelogs", context)
+                since = _iso(pipeline.since("github_issues"))
+                seen = []
+                page = 1
+                while True:
+                    issues = await github_client.get_repository_issues(owner, repo, page=page, per_page=PER_PAGE, since=since)
+                    if not issues:
+                        break
+
+                    pipeline.progress.emit("page_fetched", collection="github_issues", repository=repository, page=page, items=len(issues))
+                    yield RawPage("github_issues", issues, TRANSFORMERS["github_issues"], context, known_hashes=known)
+                    seen.extend(issue_data["id"] for issue_data in issues)
+
+                    for issue_data in issues:
+                        # Skip pull requests (they appear in issues API)
+                        if issue_data.get("pull_request"):
+                            continue
+
+                        # Sync issue events (changelog)
+                        await pipeline.submit_detail(self._issue_events_job(
+                            github_client, pipeline, owner, repo, issue_data["number"], context, known_events
+                        ))
+
+                    if len(issues) < PER_PAGE:
+                        break
+                    page += 1
+
+                if known is not None and since is None:
+                    await pipeline.delete_stale(
+                        "github_issues", context["user_id"], context["repository_id"],
+                        ChangeDetector.stale(known, seen), context["repository_name"]
+                    )
+
+            except Exception as e:
+                logger.error(f"Error syncing issues for {owner}/{repo}: {e}")
+                pipeline.progress.emit("error", repository=repository, message=f"Error syncing issues: {e}")
+            finally:
+                pipeline.progress.job_finished(repository)
+        return job
+
+    def _issue_events_job(self, github_client: GitHubClient, pipeline: SyncPipeline, owner: str, repo: str, issue_number: int, context: Dict[str, Any], known: Optional[Dict[Any, Optional[str]]]):
+        """Build a fetch job for the events (changelog) of an issue"""
+        repository = context["repository_name"]
+        pipeline.progress.job_started(repository)
+
+        async def job():
+            try:
+                events = await github_client.get_issue_events(owner, repo, issue_number)
+                yield RawPage(
+                    "github_changelogs", events, TRANSFORMERS["github_changelogs"],
+                    {**context, "issue_number": issue_number}, known_hashes=known
+                )
+            except Exception as e:
+                logger.error(f"Error syncing events for issue {issue_number} in {owner}/{repo}: {e}")
+                pipeline.progress.emit("error", repository=repository, message=f"Error syncing events for issue {issue_number}: {e}")
+            finally:
+                pipeline.progress.job_finished(repository)
+        return job
+
+    async def _preload_hashes(self, pipeline: SyncPipeline, collection: str, context: Dict[str, Any]) -> Optional[Dict[Any, Optional[str]]]:
+        """Stored content hashes for a repository, or None when change detection is off"""
+        if pipeline.changes is None or "repository_id" not in context:
+            return None
+        return await pipeline.changes.preload(collection, context["user_id"], context["repository_id"])
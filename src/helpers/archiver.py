@@ -0,0 +1,279 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+from src.config import settings
+from src.helpers.bucket_storage import BUCKET_FIELDS, BUCKETS
+from src.helpers.commit_storage import SharedCommitStorage
+from src.helpers.content_store import CONTENT_COLLECTION, CONTENT_FIELDS, ContentStore
+from src.helpers.change_detector import HASH_KEYS
+from src.helpers.query_filter import FieldType
+from src.helpers.transformers import MAPPINGS
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # Archival is optional
+    pa = None
+
+MANIFEST_COLLECTION = "github_archive_manifest"
+
+# Collections that can be archived, with the time field their age is measured on
+ARCHIVE_TIME_FIELDS = {
+    "github_commits": "author_date",
+    "github_pulls": "created_at",
+    "github_issues": "created_at",
+    "github_changelogs": "created_at"
+}
+
+# Columns that identify an archived row within its tenant partition
+ARCHIVE_KEYS = {
+    "github_commits": ("repository_id", "sha"),
+    "github_pulls": ("github_id",),
+    "github_issues": ("github_id",),
+    "github_changelogs": ("github_id",)
+}
+
+class RetentionPolicy:
+    """How long one collection's documents stay in MongoDB"""
+
+    def __init__(self, collection: str, max_age_days: float, states: Optional[List[str]] = None, time_field: Optional[str] = None):
+        if collection not in ARCHIVE_TIME_FIELDS:
+            raise ValueError(f"{collection} cannot be archived. Archivable: {', '.join(ARCHIVE_TIME_FIELDS)}")
+        if isinstance(BUCKETS.get(collection), SharedCommitStorage):
+            raise ValueError(f"{collection} is stored once per SHA across repositories and cannot be archived")
+        if states and collection in BUCKETS:
+            raise ValueError(f"{collection} is stored in buckets, which are archived by month only")
+        self.collection = collection
+        self.max_age = timedelta(days=max_age_days)
+        self.states = states
+        self.time_field = time_field or ARCHIVE_TIME_FIELDS[collection]
+
+    def cutoff(self) -> datetime:
+        return datetime.utcnow() - self.max_age
+
+    def boundary(self) -> datetime:
+        """Documents older than this are archived; buckets go a whole month at a time"""
+        cutoff = self.cutoff()
+        if self.collection in BUCKETS:
+            return cutoff.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        return cutoff
+
+    def expired(self, doc: Dict[str, Any], boundary: datetime) -> bool:
+        """Whether a synced document falls under the policy, so it belongs in the archive"""
+        when = doc.get(self.time_field)
+        if when is None:
+            return False
+        if when.tzinfo is not None:
+            # Synced timestamps carry GitHub's UTC offset; MongoDB stores naive UTC
+            when = when.astimezone(timezone.utc).replace(tzinfo=None)
+        if when >= boundary:
+            return False
+        return not self.states or doc.get("state") in self.states
+
+    def query(self, tenant_id: int) -> Dict[str, Any]:
+        query = {"tenant_id": tenant_id, self.time_field: {"$lt": self.cutoff()}}
+        if self.states:
+            query["state"] = {"$in": self.states}
+        return query
+
+def load_policies() -> Dict[str, RetentionPolicy]:
+    return {collection: RetentionPolicy(collection, **options) for collection, options in settings.RETENTION_POLICIES.items()}
+
+def active_policies() -> Dict[str, RetentionPolicy]:
+    """The policies the archiver enforces; empty when archival is off"""
+    if not settings.RETENTION_POLICIES or pa is None:
+        return {}
+    return load_policies()
+
+def _arrow_type(field: FieldType):
+    base = {
+        int: pa.int64(),
+        float: pa.float64(),
+        bool: pa.bool_(),
+        str: pa.string(),
+        datetime: pa.timestamp("ms", tz="UTC")
+    }[field.type]
+    return pa.list_(base) if field.is_list else base
+
+def file_schema(collection: str):
+    """Columns of an archive file: the model's fields, less the tenant partition"""
+    model = MAPPINGS[collection].model
+    return pa.schema([
+        pa.field(name, _arrow_type(FieldType(name, field.annotation)))
+        for name, field in model.model_fields.items()
+        if name not in ("id", "tenant_id")
+    ])
+
+def partitioning():
+    return ds.partitioning(pa.schema([("tenant_id", pa.int64()), ("month", pa.string())]), flavor="hive")
+
+def collection_root(collection: str) -> str:
+    return os.path.join(settings.ARCHIVE_PATH, collection)
+
+def archived_keys(collection: str, directory: str) -> Set[Tuple[Any, ...]]:
+    """Keys of the rows already in a partition's files"""
+    if not os.path.isdir(directory):
+        return set()
+    columns = list(ARCHIVE_KEYS[collection])
+    keys = set()
+    for name in os.listdir(directory):
+        if name.endswith(".parquet"):
+            table = pq.read_table(os.path.join(directory, name), columns=columns)
+            keys.update(zip(*(table.column(column).to_pylist() for column in columns)))
+    return keys
+
+def write_partition(collection: str, tenant_id: int, month: str, docs: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Write one Parquet file under ``<collection>/tenant_id=<id>/month=<YYYY-MM>/``.
+
+    Rows already in the partition are left out, so archiving a batch again
+    after a crash adds nothing. Returns None when every row was archived before.
+    """
+    directory = os.path.join(collection_root(collection), f"tenant_id={tenant_id}", f"month={month}")
+    archived = archived_keys(collection, directory)
+    if archived:
+        columns = ARCHIVE_KEYS[collection]
+        docs = [doc for doc in docs if tuple(doc.get(column) for column in columns) not in archived]
+        if not docs:
+            return None
+    schema = file_schema(collection)
+    table = pa.Table.from_pylist([{name: doc.get(name) for name in schema.names} for doc in docs], schema=schema)
+    os.makedirs(directory, exist_ok=True)
+    name = f"part-{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+    path = os.path.join(directory, name)
+    # Written under a temporary name, so readers never see a partial file
+    pq.write_table(table, path + ".tmp", compression=settings.ARCHIVE_COMPRESSION)
+    os.replace(path + ".tmp", path)
+    return {"path": os.path.relpath(path, collection_root(collection)), "rows": table.num_rows, "bytes": os.path.getsize(path)}
+
+def delete_tenant_files(tenant_id: int):
+    for collection in ARCHIVE_TIME_FIELDS:
+        shutil.rmtree(os.path.join(collection_root(collection), f"tenant_id={tenant_id}"), ignore_errors=True)
+
+class Archiver:
+    """Moves documents past their retention age into Parquet files.
+
+    Each batch is written and recorded in ``github_archive_manifest`` before
+    it is deleted from MongoDB. A crash in between leaves the batch in both
+    places; the next run finds its rows already in the partition and only
+    deletes them. Syncs skip expired items (see ``SyncPipeline``), so archived
+    documents are not fetched back into MongoDB.
+    """
+
+    def __init__(self, db, policies: Dict[str, RetentionPolicy]):
+        self.db = db
+        self.policies = policies
+
+    async def run_once(self) -> Dict[str, int]:
+        archived = {}
+        tenants = [
+            integration["github_user_id"]
+            async for integration in self.db.github_integration.find({"integration_status": "active"}, {"github_user_id": 1})
+        ]
+        for collection, policy in self.policies.items():
+            started = time.perf_counter()
+            archived[collection] = 0
+            for tenant_id in tenants:
+                archived[collection] += await self._archive_tenant(policy, tenant_id)
+            if archived[collection]:
+                logger.info(f"Archived {archived[collection]} {collection} documents in {time.perf_counter() - started:.1f}s")
+        return archived
+
+    async def _archive_tenant(self, policy: RetentionPolicy, tenant_id: int) -> int:
+        total = 0
+        while True:
+            if policy.collection in BUCKETS:
+                docs, bucket_ids = await self._expired_buckets(policy, tenant_id)
+            else:
+                docs = await self.db[policy.collection].find(policy.query(tenant_id)).limit(settings.ARCHIVE_BATCH_SIZE).to_list(length=None)
+                bucket_ids = None
+            if not docs:
+                return total
+            await ContentStore.hydrate(self.db, policy.collection, docs)
+            await self._write(policy, tenant_id, docs)
+            await self._delete(policy.collection, tenant_id, docs, bucket_ids)
+            total += len(docs)
+
+    async def _expired_buckets(self, policy: RetentionPolicy, tenant_id: int):
+        """Whole months older than the cutoff, flattened back into documents"""
+        storage = BUCKETS[policy.collection]
+        cutoff = policy.cutoff().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        docs, bucket_ids, size = [], [], 0
+        cursor = self.db[storage.name].find({"tenant_id": tenant_id, "month": {"$lt": cutoff}})
+        async for bucket in cursor:
+            bucket_ids.append(bucket["_id"])
+            for item in bucket.get("items", []):
+                docs.append({**item, **{field: bucket[field] for field in BUCKET_FIELDS}})
+            size += len(bucket.get("items", []))
+            if size >= settings.ARCHIVE_BATCH_SIZE:
+                break
+        return docs, bucket_ids
+
+    async def _write(self, policy: RetentionPolicy, tenant_id: int, docs: List[Dict[str, Any]]):
+        months: Dict[str, List[Dict[str, Any]]] = {}
+        for doc in docs:
+            when = doc.get(policy.time_field)
+            months.setdefault(f"{when:%Y-%m}" if when else "unknown", []).append(doc)
+        for month, group in months.items():
+            written = await asyncio.to_thread(write_partition, policy.collection, tenant_id, month, group)
+            if written is None:
+                continue
+            times = [doc[policy.time_field] for doc in group if doc.get(policy.time_field)]
+            await self.db[MANIFEST_COLLECTION].insert_one({
+                "tenant_id": tenant_id,
+                "collection": policy.collection,
+                "month": month,
+                "time_field": policy.time_field,
+                "min_time": min(times) if times else None,
+                "max_time": max(times) if times else None,
+                "archived_at": datetime.utcnow(),
+                **written
+            })
+
+    async def _delete(self, collection: str, tenant_id: int, docs: List[Dict[str, Any]], bucket_ids: Optional[List[Any]]):
+        if bucket_ids is not None:
+            await self.db[BUCKETS[collection].name].delete_many({"tenant_id": tenant_id, "_id": {"$in": bucket_ids}})
+        else:
+            await self.db[collection].delete_many({"tenant_id": tenant_id, "_id": {"$in": [doc["_id"] for doc in docs]}})
+        if collection in CONTENT_FIELDS:
+            key = HASH_KEYS[collection]
+            await self.db[CONTENT_COLLECTION].delete_many({
+                "tenant_id": tenant_id, "collection": collection,
+                "repository_id": {"$in": list({doc["repository_id"] for doc in docs})},
+                "key": {"$in": [doc[key] for doc in docs]}
+            })
+
+_task: Optional[asyncio.Task] = None
+
+async def _run_forever(db, policies: Dict[str, RetentionPolicy]):
+    archiver = Archiver(db, policies)
+    while True:
+        try:
+            await archiver.run_once()
+        except Exception as e:
+            logger.error(f"Error archiving expired documents: {e}")
+        await asyncio.sleep(settings.ARCHIVE_INTERVAL)
+
+def start_archiver(db):
+    """Run the archiver in the background when retention policies are configured"""
+    global _task
+    if not settings.RETENTION_POLICIES:
+        return
+    if pa is None:
+        logger.warning("RETENTION_POLICIES is set but pyarrow is not installed; archival is disabled")
+        return
+    _task = asyncio.create_task(_run_forever(db, load_policies()))
+
+async def stop_archiver():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
@@ -0,0 +1,252 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import DeleteMany, UpdateMany, UpdateOne
+import bson
+from src.config import settings
+from src.helpers.commit_storage import SharedCommitStorage
+from src.helpers.metrics import MONGO_OPERATION_SECONDS, timed
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Event-like collections that can be stored as monthly buckets, by time field
+BUCKET_TIME_FIELDS = {
+    "github_commits": "author_date",
+    "github_changelogs": "created_at"
+}
+
+# Key of a document within its repository
+BUCKET_KEYS = {
+    "github_commits": "sha",
+    "github_changelogs": "github_id"
+}
+
+# Stored once on the bucket instead of on every item
+BUCKET_FIELDS = ("tenant_id", "repository_id", "repository_name")
+
+RANGE_BOUNDS = {"$gt": "$gte", "$gte": "$gte", "$lt": "$lte", "$lte": "$lte"}
+
+# Recomputed after every change to a bucket's items
+BUCKET_SIZE = {"$set": {"count": {"$size": "$items"}, "bytes": {"$bsonSize": "$$ROOT"}}}
+
+def bucket_month(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+class BucketUpdate(UpdateOne):
+    """Upsert of one bucket that carries several documents"""
+
+    def __init__(self, filter: Dict[str, Any], update: List[Dict[str, Any]], documents: int):
+        super().__init__(filter, update, upsert=True)
+        self.documents = documents
+
+class BucketStorage:
+    """Stores a collection's documents grouped by tenant, repository and month.
+
+    Each bucket is ``{tenant_id, repository_id, repository_name, month, items,
+    count, bytes}`` in ``<collection>_buckets``. Items keep every other field
+    of the document, keyed by ``sha`` or ``github_id``. A month holding more
+    than ``BUCKET_MAX_ITEMS`` items or ``BUCKET_MAX_BYTES`` bytes continues in
+    overflow buckets with the same key, so no bucket nears MongoDB's 16 MB
+    document limit. Reads unwind the buckets that can match back into the
+    flat document shape, so callers pass the same queries and sorts as for
+    the flat collection.
+    """
+
+    # A page's items are taken out of their old buckets before they are added
+    # to one with room, so its writes must run in order
+    ordered = True
+
+    def __init__(self, collection: str):
+        self.collection = collection
+        self.name = f"{collection}_buckets"
+        self.time_field = BUCKET_TIME_FIELDS[collection]
+        self.key = BUCKET_KEYS[collection]
+
+    def _without(self, filter: Dict[str, Any], keys: List[Any]) -> UpdateMany:
+        """Take items out of the buckets matching ``filter`` that hold them"""
+        return UpdateMany(
+            {**filter, f"items.{self.key}": {"$in": keys}},
+            [{"$set": {"items": {"$filter": {
+                "input": "$items",
+                "cond": {"$not": [{"$in": [f"$$this.{self.key}", {"$literal": keys}]}]}
+            }}}}, BUCKET_SIZE]
+        )
+
+    @staticmethod
+    def _chunks(items: List[Dict[str, Any]]) -> List[Tuple[List[Dict[str, Any]], int]]:
+        """Items split into runs that fit an empty bucket, with their encoded size"""
+        chunks = []
+        chunk: List[Dict[str, Any]] = []
+        size = 0
+        for item in items:
+            item_size = len(bson.encode(item))
+            if chunk and (len(chunk) >= settings.BUCKET_MAX_ITEMS or size + item_size > settings.BUCKET_MAX_BYTES):
+                chunks.append((chunk, size))
+                chunk, size = [], 0
+            chunk.append(item)
+            size += item_size
+        if chunk:
+            chunks.append((chunk, size))
+        return chunks
+
+    def upserts(self, docs: List[Dict[str, Any]]) -> List[UpdateOne]:
+        """Per bucket month touched by a page: drop the page's keys, then add its items where there is room"""
+        buckets: Dict[Tuple[Any, ...], List[Dict[str, Any]]] = {}
+        for doc in docs:
+            bucket = (doc["tenant_id"], doc["repository_id"], bucket_month(doc.get(self.time_field)))
+            buckets.setdefault(bucket, []).append(doc)
+
+        ops = []
+        for (tenant_id, repository_id, month), group in buckets.items():
+            items = [{field: value for field, value in doc.items() if field not in BUCKET_FIELDS} for doc in group]
+            bucket = {"tenant_id": tenant_id, "repository_id": repository_id, "month": month}
+            ops.append(self._without(bucket, [item[self.key] for item in items]))
+            for chunk, size in self._chunks(items):
+                # Upserts a new overflow bucket when every bucket of the month is full
+                ops.append(BucketUpdate(
+                    {
+                        **bucket,
+                        "count": {"$lte": settings.BUCKET_MAX_ITEMS - len(chunk)},
+                        "bytes": {"$lte": settings.BUCKET_MAX_BYTES - size}
+                    },
+                    [{"$set": {
+                        "repository_name": {"$literal": group[0]["repository_name"]},
+                        # Commit messages may start with "$", so items are never parsed as expressions
+                        "items": {"$concatArrays": [{"$ifNull": ["$items", []]}, {"$literal": chunk}]}
+                    }}, BUCKET_SIZE],
+                    len(chunk)
+                ))
+        return ops
+
+    def delete(self, tenant_id: int, repository_id: int, keys: List[Any]) -> List[UpdateMany]:
+        """Remove items from every bucket of a repository that holds them"""
+        return [self._without({"tenant_id": tenant_id, "repository_id": repository_id}, keys)]
+
+    @staticmethod
+    def delete_repositories(tenant_id: int, repository_ids: List[int]) -> List[DeleteMany]:
+        """Remove every bucket of the given repositories"""
+        return [DeleteMany({"tenant_id": tenant_id, "repository_id": {"$in": repository_ids}})]
+
+    async def preload(self, db, tenant_id: int, repository_id: int) -> Dict[Any, Optional[str]]:
+        """Key -> content hash of every item of a repository, for change detection"""
+        cursor = db[self.name].find(
+            {"tenant_id": tenant_id, "repository_id": repository_id},
+            {"_id": 0, f"items.{self.key}": 1, "items.content_hash": 1}
+        )
+        known = {}
+        with timed(MONGO_OPERATION_SECONDS, "mongo.find", collection=self.name, operation="find"):
+            async for bucket in cursor:
+                for item in bucket.get("items", []):
+                    known[item[self.key]] = item.get("content_hash")
+        return known
+
+    def _bucket_match(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        """The part of a document query that selects buckets, so only those are unwound"""
+        match = {field: query[field] for field in BUCKET_FIELDS if field in query}
+        condition = query.get(self.time_field)
+        if condition is None:
+            return match
+        if not isinstance(condition, dict):
+            match["month"] = bucket_month(condition)
+            return match
+        months = {}
+        for operator, value in condition.items():
+            if operator == "$eq":
+                match["month"] = bucket_month(value)
+            elif operator == "$in":
+                match["month"] = {"$in": sorted({bucket_month(item) for item in value if item is not None})}
+            elif operator in RANGE_BOUNDS and value is not None:
+                months[RANGE_BOUNDS[operator]] = bucket_month(value)
+        if months and "month" not in match:
+            match["month"] = months
+        return match
+
+    def _sort(self, sort: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        # Items have no insertion order of their own; _id sorts follow time instead
+        return [(self.time_field if field == "_id" else field, direction) for field, direction in sort]
+
+    def _unwind(self, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        restored = {field: f"${field}" for field in BUCKET_FIELDS}
+        return [
+            {"$match": self._bucket_match(query)},
+            {"$unwind": "$items"},
+            {"$replaceRoot": {"newRoot": {"$mergeObjects": [{"_id": f"$items.{self.key}"}, restored, "$items"]}}},
+            {"$match": query}
+        ]
+
+    @staticmethod
+    def _bucket_level(query: Dict[str, Any]) -> bool:
+        """Whether every clause of a query is decided by bucket fields alone"""
+        return all(field in BUCKET_FIELDS for field in query)
+
+    async def _months(self, db, query: Dict[str, Any], direction: int) -> List[Tuple[Optional[datetime], int]]:
+        """Item count per month of the buckets matching a bucket-level query"""
+        cursor = db[self.name].aggregate([
+            {"$match": query},
+            {"$group": {"_id": "$month", "count": {"$sum": "$count"}}},
+            {"$sort": {"_id": direction}}
+        ])
+        return [(month["_id"], month["count"]) async for month in cursor]
+
+    async def count(self, db, query: Dict[str, Any]) -> int:
+        if self._bucket_level(query):
+            # Sums the bucket counts instead of unwinding every item
+            return sum(count for _, count in await self._months(db, query, 1))
+        pipeline = self._unwind(query) + [{"$count": "total"}]
+        result = await db[self.name].aggregate(pipeline).to_list(length=1)
+        return result[0]["total"] if result else 0
+
+    def stream(self, db, query: Dict[str, Any], batch_size: int):
+        """Cursor over every matching item, for exports that read a whole tenant"""
+        return db[self.name].aggregate(self._unwind(query), allowDiskUse=True, batchSize=batch_size)
+
+    async def _page_months(self, db, query: Dict[str, Any], direction: int, skip: int, limit: int) -> Tuple[List[Optional[datetime]], int]:
+        """The months holding one page of a time-sorted listing, and the items to skip within them"""
+        months: List[Optional[datetime]] = []
+        covered = 0
+        for month, count in await self._months(db, query, direction):
+            if not months and skip >= count:
+                skip -= count
+                continue
+            months.append(month)
+            covered += count
+            if covered >= skip + limit:
+                break
+        return months, skip
+
+    async def find(self, db, query: Dict[str, Any], sort: List[Tuple[str, int]], skip: int, limit: int) -> List[Dict[str, Any]]:
+        sort = self._sort(sort)
+        if self._bucket_level(query) and (not sort or (len(sort) == 1 and sort[0][0] == self.time_field)):
+            # Months sort like their items, so whole months before the page are skipped per bucket
+            direction = sort[0][1] if sort else -1
+            months, skip = await self._page_months(db, query, direction, skip, limit)
+            if not months:
+                return []
+            pipeline = [{"$match": {**query, "month": {"$in": months}}}] + self._unwind(query)[1:]
+            sort = sort or [(self.time_field, direction)]
+        else:
+            pipeline = self._unwind(query)
+        if sort:
+            pipeline.append({"$sort": dict(sort)})
+        pipeline += [{"$skip": skip}, {"$limit": limit}]
+        return await db[self.name].aggregate(pipeline, allowDiskUse=True).to_list(length=limit)
+
+def _configured() -> Dict[str, Any]:
+    storage = {}
+    for collection in settings.BUCKETED_COLLECTIONS:
+        if collection not in BUCKET_TIME_FIELDS:
+            logger.warning(f"{collection} cannot be stored in buckets; keeping it flat")
+            continue
+        storage[collection] = BucketStorage(collection)
+    if settings.COMMIT_STORAGE == "shared":
+        if "github_commits" in storage:
+            logger.warning("github_commits is stored once per SHA; ignoring BUCKETED_COLLECTIONS for it")
+        storage["github_commits"] = SharedCommitStorage()
+    return storage
+
+# Collections not stored as one document per item in this deployment: monthly
+# buckets, or commits shared across repositories. Both read and write through
+# the same interface.
+BUCKETS = _configured()
@@ -0,0 +1,90 @@
+from typing import Any, Dict, Iterable, List, Optional
+from src.helpers.bucket_storage import BUCKETS
+from src.helpers.commit_storage import MEMBERSHIP_FIELDS, SharedCommitStorage
+from src.helpers.metrics import MONGO_OPERATION_SECONDS, timed
+import bson
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Field identifying a document within one repository
+HASH_KEYS = {
+    "github_commits": "sha",
+    "github_pulls": "github_id",
+    "github_issues": "github_id",
+    "github_changelogs": "github_id"
+}
+
+def content_hash(doc: Dict[str, Any]) -> str:
+    """Digest of a document's content.
+
+    Transformers always emit fields in the same order, so the BSON encoding is
+    canonical without sorting keys.
+    """
+    return hashlib.blake2b(bson.encode(doc), digest_size=16).hexdigest()
+
+class ChangeDetector:
+    """Skips upserts for documents whose content hash has not changed.
+
+    Hashes for one repository are preloaded in a single covered query and
+    handed to every page fetched for that repository.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.checked: Dict[str, int] = {}
+        self.skipped: Dict[str, int] = {}
+
+    async def preload(self, collection: str, tenant_id: int, repository_id: int) -> Dict[Any, Optional[str]]:
+        """Map each stored document key in a tenant's repository to its content hash"""
+        if collection in BUCKETS:
+            return await BUCKETS[collection].preload(self.db, tenant_id, repository_id)
+        key = HASH_KEYS[collection]
+        cursor = self.db[collection].find(
+            {"tenant_id": tenant_id, "repository_id": repository_id},
+            {"_id": 0, key: 1, "content_hash": 1}
+        )
+        with timed(MONGO_OPERATION_SECONDS, "mongo.find", collection=collection, operation="find"):
+            return {doc[key]: doc.get("content_hash") async for doc in cursor}
+
+    def filter(self, collection: str, docs: List[Dict[str, Any]], known: Dict[Any, Optional[str]]) -> List[Dict[str, Any]]:
+        """Drop unchanged documents and stamp the rest with their hash"""
+        key = HASH_KEYS[collection]
+        # A shared commit hashes the same from every repository that contains it
+        shared = isinstance(BUCKETS.get(collection), SharedCommitStorage)
+        changed = []
+        for doc in docs:
+            if shared:
+                digest = content_hash({field: value for field, value in doc.items() if field not in MEMBERSHIP_FIELDS})
+            else:
+                digest = content_hash(doc)
+            if known.get(doc[key]) == digest:
+                continue
+            doc["content_hash"] = digest
+            changed.append(doc)
+        self.checked[collection] = self.checked.get(collection, 0) + len(docs)
+        self.skipped[collection] = self.skipped.get(collection, 0) + len(docs) - len(changed)
+        return changed
+
+    @staticmethod
+    def stale(known: Dict[Any, Optional[str]], seen: Iterable[Any]) -> List[Any]:
+        """Keys stored for a repository that GitHub no longer returns"""
+        return list(known.keys() - set(seen))
+
+    def stats(self) -> Dict[str, Any]:
+        checked = sum(self.checked.values())
+        skipped = sum(self.skipped.values())
+        return {
+            "checked": checked,
+            "skipped": skipped,
+            "skip_ratio": round(skipped / checked, 4) if checked else 0.0,
+            "collections": {
+                collection: {
+                    "checked": count,
+                    "skipped": self.skipped.get(collection, 0),
+                    "skip_ratio": round(self.skipped.get(collection, 0) / count, 4) if count else 0.0
+                }
+                for collection, count in self.checked.items()
+            }
+        }
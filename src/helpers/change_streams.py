@@ -0,0 +1,152 @@
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Set
+from pymongo.errors import OperationFailure, PyMongoError
+from src.config import settings
+from src.helpers.event_bus import Subscription
+from src.helpers.query_filter import matches
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+RETRY_SECONDS = 1.0
+
+class ChangeStreamsUnsupported(Exception):
+    """The server is a standalone mongod; change streams need a replica set or sharded cluster"""
+
+class ResumeTokenExpired(Exception):
+    """The resume token is older than the changes the hub still holds"""
+
+class ChangeSubscription(Subscription):
+    """A subscriber's query over one collection; only matching documents are delivered"""
+
+    def __init__(self, collection: str, query: Dict[str, Any], size: int):
+        super().__init__(collection, size)
+        self.query = query
+
+    def offer(self, change: Dict[str, Any]):
+        if matches(self.query, change["document"]):
+            self.deliver(change["event"])
+
+class CollectionStream:
+    """One change stream on a collection, fanned out to every subscriber.
+
+    Recent changes are kept with their resume tokens, so a client that
+    reconnects with the last token it saw gets what it missed. When the last
+    subscriber leaves the stream is closed and its history dropped; the next
+    subscriber opens it at the current time, or at the token it passes.
+    """
+
+    def __init__(self, db, collection: str):
+        self.db = db
+        self.collection = collection
+        self.subscribers: Set[ChangeSubscription] = set()
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=settings.CHANGE_STREAM_REPLAY_SIZE)
+        self.resume_token: Optional[Dict[str, Any]] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def subscribe(self, query: Dict[str, Any], after: Optional[str] = None) -> ChangeSubscription:
+        subscription = ChangeSubscription(self.collection, query, settings.EVENT_BUFFER_SIZE)
+        if after is not None:
+            if self.task is None and not self.recent:
+                # Nothing held yet (e.g. after a restart): let the server replay from the token
+                self.resume_token = {"_data": after}
+            else:
+                tokens = [change["event"]["id"] for change in self.recent]
+                if after not in tokens:
+                    raise ResumeTokenExpired()
+                for change in list(self.recent)[tokens.index(after) + 1:]:
+                    subscription.offer(change)
+        self.subscribers.add(subscription)
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription: ChangeSubscription):
+        self.subscribers.discard(subscription)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+            # Changes made while nobody listens were never delivered; a fresh
+            # subscriber must not be handed them from a stale token
+            self.resume_token = None
+            self.recent.clear()
+
+    async def _run(self):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        while True:
+            try:
+                async with self.db[self.collection].watch(
+                    pipeline, full_document="updateLookup", resume_after=self.resume_token
+                ) as stream:
+                    async for change in stream:
+                        self._publish(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                logger.error(f"Change stream on {self.collection} failed: {e}")
+                if self.resume_token is not None:
+                    # The resume point left the oplog or was not a valid token. Held
+                    # tokens can no longer be honoured, so clients must reload.
+                    self.resume_token = None
+                    self.recent.clear()
+            except PyMongoError as e:
+                logger.error(f"Change stream on {self.collection} interrupted: {e}")
+            await asyncio.sleep(RETRY_SECONDS)
+
+    def _publish(self, change: Dict[str, Any]):
+        self.resume_token = change["_id"]
+        document = change.get("fullDocument")
+        if document is None:
+            # Deleted again before the update lookup ran
+            return
+        document["_id"] = str(document["_id"])
+        operation = change["operationType"]
+        published = {
+            "document": document,
+            "event": {
+                "id": change["_id"]["_data"],
+                "event": operation,
+                "time": datetime.utcnow().isoformat(),
+                "data": {"operation": operation, "document": document}
+            }
+        }
+        self.recent.append(published)
+        for subscription in self.subscribers:
+            subscription.offer(published)
+
+class ChangeStreamHub:
+    """Shares one change stream per collection between all subscribers in the process"""
+
+    def __init__(self):
+        self.streams: Dict[str, CollectionStream] = {}
+        self._supported: Optional[bool] = None
+
+    async def _check_supported(self, db):
+        if self._supported is None:
+            hello = await db.command("hello")
+            self._supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+        if not self._supported:
+            raise ChangeStreamsUnsupported()
+
+    async def subscribe(self, db, collection: str, query: Dict[str, Any], after: Optional[str] = None) -> ChangeSubscription:
+        await self._check_supported(db)
+        stream = self.streams.get(collection)
+        if stream is None:
+            stream = self.streams[collection] = CollectionStream(db, collection)
+        return stream.subscribe(query, after)
+
+    def unsubscribe(self, subscription: ChangeSubscription):
+        stream = self.streams.get(subscription.topic)
+        if stream is not None:
+            stream.unsubscribe(subscription)
+
+    async def close(self):
+        tasks = [stream.task for stream in self.streams.values() if stream.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.streams.clear()
+
+change_hub = ChangeStreamHub()
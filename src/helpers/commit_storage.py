@@ -0,0 +1,172 @@
+from typing import Any, Dict, List, Optional, Tuple, Union
+from pymongo import DeleteMany, UpdateMany, UpdateOne
+from src.helpers.metrics import MONGO_OPERATION_SECONDS, timed
+
+# Per-repository fields, kept in the commit's repository list instead
+MEMBERSHIP_FIELDS = ("repository_id", "repository_name")
+
+MEMBER_PATHS = {"repository_id": "repositories.id", "repository_name": "repositories.name"}
+
+def _mentions_member(condition: Any) -> bool:
+    """Whether a query clause refers to a per-repository field anywhere"""
+    if isinstance(condition, dict):
+        return any(field in MEMBERSHIP_FIELDS or _mentions_member(value) for field, value in condition.items())
+    if isinstance(condition, list):
+        return any(_mentions_member(value) for value in condition)
+    return False
+
+class SharedCommitStorage:
+    """Stores each commit once per tenant, with the repositories that contain it.
+
+    A commit is ``{tenant_id, sha, ..., repositories: [{id, name}]}`` in
+    ``github_commits``, so a fork and its parent share the history they have
+    in common. Reads return one document per repository a commit belongs to,
+    with ``repository_id`` and ``repository_name`` restored, so callers pass
+    the same queries and sorts as for per-repository storage.
+    """
+
+    def __init__(self, collection: str = "github_commits"):
+        self.collection = collection
+        self.name = collection
+        self.time_field = "author_date"
+        self.key = "sha"
+
+    @staticmethod
+    def _with_member(repository_id: int, repository_name: str) -> Dict[str, Any]:
+        """The repository list with one repository added, or renamed if present"""
+        return {"$concatArrays": [
+            {"$filter": {
+                "input": {"$ifNull": ["$repositories", []]},
+                "cond": {"$ne": ["$$this.id", repository_id]}
+            }},
+            {"$literal": [{"id": repository_id, "name": repository_name}]}
+        ]}
+
+    def upserts(self, docs: List[Dict[str, Any]]) -> List[UpdateOne]:
+        """One update per commit that refreshes its content and adds the repository"""
+        ops = []
+        for doc in docs:
+            # Commit messages may start with "$", so values are never parsed as expressions
+            commit = {field: {"$literal": value} for field, value in doc.items() if field not in MEMBERSHIP_FIELDS}
+            commit["repositories"] = self._with_member(doc["repository_id"], doc["repository_name"])
+            ops.append(UpdateOne({"tenant_id": doc["tenant_id"], self.key: doc[self.key]}, [{"$set": commit}], upsert=True))
+        return ops
+
+    @staticmethod
+    def _remove(match: Dict[str, Any], repository_id: int) -> List[Union[DeleteMany, UpdateMany]]:
+        # The two filters are disjoint, so the writes may run in any order
+        return [
+            DeleteMany({"$and": [match, {"repositories": {"$size": 1}, "repositories.id": repository_id}]}),
+            UpdateMany(
+                {"$and": [match, {"repositories.id": repository_id, "repositories.1": {"$exists": True}}]},
+                {"$pull": {"repositories": {"id": repository_id}}}
+            )
+        ]
+
+    def delete(self, tenant_id: int, repository_id: int, keys: List[Any]) -> List[Union[DeleteMany, UpdateMany]]:
+        """Take a repository off commits, deleting those no other repository contains"""
+        return self._remove({"tenant_id": tenant_id, self.key: {"$in": keys}}, repository_id)
+
+    def delete_repositories(self, tenant_id: int, repository_ids: List[int]) -> List[Union[DeleteMany, UpdateMany]]:
+        """Take whole repositories off their commits"""
+        return [op for repository_id in repository_ids for op in self._remove({"tenant_id": tenant_id}, repository_id)]
+
+    @staticmethod
+    def rename(tenant_id: int, repository_id: int, repository_name: str) -> UpdateMany:
+        """Refresh a repository's name on its commits; content hashes do not cover it"""
+        return UpdateMany(
+            {"tenant_id": tenant_id, "repositories": {"$elemMatch": {"id": repository_id, "name": {"$ne": repository_name}}}},
+            # "$" is the element $elemMatch selected; a repository is listed once per commit
+            {"$set": {"repositories.$.name": repository_name}}
+        )
+
+    async def preload(self, db, tenant_id: int, repository_id: int) -> Dict[Any, Optional[str]]:
+        """SHA -> content hash of every commit of a repository, for change detection"""
+        cursor = db[self.name].find(
+            {"tenant_id": tenant_id, "repositories.id": repository_id},
+            {"_id": 0, self.key: 1, "content_hash": 1}
+        )
+        with timed(MONGO_OPERATION_SECONDS, "mongo.find", collection=self.name, operation="find"):
+            return {doc[self.key]: doc.get("content_hash") async for doc in cursor}
+
+    async def link_fork(self, db, tenant_id: int, fork_id: int, fork_name: str, parent_id: int, ahead: List[str], behind: List[str]) -> int:
+        """Add a fork to the stored commits it shares with its parent.
+
+        ``ahead`` are the fork's commits its parent lacks and ``behind`` the
+        parent's commits the fork lacks. Every other commit of the parent is
+        also the fork's; the fork is taken off commits it no longer has.
+        Returns the number of commits updated or deleted.
+        """
+        shared = {"tenant_id": tenant_id, self.key: {"$nin": behind}, "repositories.id": parent_id}
+        ops = [UpdateMany(
+            {"$and": [shared, {"repositories.id": {"$ne": fork_id}}]},
+            [{"$set": {"repositories": self._with_member(fork_id, fork_name)}}]
+        )] + self._remove(
+            {"tenant_id": tenant_id, self.key: {"$nin": ahead}, "$or": [
+                {"repositories.id": {"$ne": parent_id}}, {self.key: {"$in": behind}}
+            ]},
+            fork_id
+        )
+        with timed(MONGO_OPERATION_SECONDS, "mongo.bulk_write", collection=self.name, operation="bulk_write"):
+            result = await db[self.name].bulk_write(ops, ordered=False)
+        return result.modified_count + result.deleted_count
+
+    def _match(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        """The part of a document query that selects commits, before they are split per repository"""
+        return {
+            MEMBER_PATHS.get(field, field): condition
+            for field, condition in query.items()
+            # Clauses such as $or over per-repository fields are applied after the split
+            if not (field.startswith("$") and _mentions_member(condition))
+        }
+
+    def _unwind(self, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            {"$match": self._match(query)},
+            {"$unwind": "$repositories"},
+            {"$addFields": {"repository_id": "$repositories.id", "repository_name": "$repositories.name"}},
+            {"$project": {"repositories": 0}},
+            {"$match": query}
+        ]
+
+    @staticmethod
+    def _single_repository(query: Dict[str, Any]) -> Optional[int]:
+        """The repository a query is limited to, when its commits can be read without unwinding"""
+        repository_id = query.get("repository_id")
+        if not isinstance(repository_id, int) or "repository_name" in query:
+            return None
+        if any(field.startswith("$") and _mentions_member(condition) for field, condition in query.items()):
+            return None
+        return repository_id
+
+    @staticmethod
+    def _restore(doc: Dict[str, Any], repository_id: int) -> Dict[str, Any]:
+        member = next(member for member in doc.pop("repositories") if member["id"] == repository_id)
+        doc["repository_id"] = member["id"]
+        doc["repository_name"] = member["name"]
+        return doc
+
+    async def count(self, db, query: Dict[str, Any]) -> int:
+        if self._single_repository(query) is not None:
+            return await db[self.name].count_documents(self._match(query))
+        result = await db[self.name].aggregate(self._unwind(query) + [{"$count": "total"}]).to_list(length=1)
+        return result[0]["total"] if result else 0
+
+    def stream(self, db, query: Dict[str, Any], batch_size: int):
+        """Cursor over every matching commit per repository, for exports that read a whole tenant"""
+        return db[self.name].aggregate(self._unwind(query), allowDiskUse=True, batchSize=batch_size)
+
+    async def find(self, db, query: Dict[str, Any], sort: List[Tuple[str, int]], skip: int, limit: int) -> List[Dict[str, Any]]:
+        repository_id = self._single_repository(query)
+        if repository_id is not None:
+            # Served by the (tenant_id, repositories.id, author_date) index
+            cursor = db[self.name].find(self._match(query))
+            if sort:
+                cursor = cursor.sort(sort)
+            docs = await cursor.skip(skip).limit(limit).to_list(length=limit)
+            return [self._restore(doc, repository_id) for doc in docs]
+        pipeline = self._unwind(query)
+        if sort:
+            pipeline.append({"$sort": dict(sort)})
+        pipeline += [{"$skip": skip}, {"$limit": limit}]
+        return await db[self.name].aggregate(pipeline, allowDiskUse=True).to_list(length=limit)
@@ -0,0 +1,162 @@
+from typing import Any, Dict, List, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from src.config import settings
+from src.helpers.metrics import HTTP_RESPONSE_BYTES
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always offered
+    brotli = None
+
+# Already compressed, or sent event by event to clients that must see each one
+UNCOMPRESSED_TYPES = (
+    "text/event-stream", "application/vnd.apache.parquet", "application/gzip",
+    "application/zip", "image/", "audio/", "video/"
+)
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        # wbits 31: a gzip header and trailer around the deflate stream
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        # A sync flush lets the client decode everything sent so far
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        return self.compressor.process(data) + (self.compressor.finish() if final else self.compressor.flush())
+
+def offered_encodings() -> List[str]:
+    """Encodings this process can produce, most preferred first"""
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The encoding to answer an Accept-Encoding header with, or None for identity.
+
+    The highest q-value wins; ties go to the server's preference, brotli first.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if name:
+            weights[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in offered_encodings():
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def _encoder(encoding: str):
+    if encoding == "br":
+        return BrotliEncoder(settings.RESPONSE_BROTLI_QUALITY)
+    return GzipEncoder(settings.RESPONSE_GZIP_LEVEL)
+
+class CompressionMiddleware:
+    """Compresses responses for clients that accept brotli or gzip.
+
+    Bodies shorter than ``minimum_size`` bytes are sent as they are.
+    Streamed bodies, such as Arrow snapshot downloads, are compressed chunk
+    by chunk and flushed after each, so clients can decode data as soon as
+    it is produced. Responses that already carry a Content-Encoding, event
+    streams and already-compressed formats pass through unchanged.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, CompressingSend(send, encoding, self.minimum_size))
+
+class CompressingSend:
+    """The ``send`` callable for one response, encoding its body on the way out.
+
+    Body chunks are held until ``minimum_size`` bytes have arrived, since
+    ``http`` middlewares re-stream even one-piece responses in chunks.
+    """
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Dict[str, Any]] = None
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+        self.encoder = None
+        self.passthrough = False
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return not content_type.startswith(UNCOMPRESSED_TYPES)
+
+    async def __call__(self, message: Dict[str, Any]):
+        if message["type"] == "http.response.start":
+            # Held back until the body shows whether to compress
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            if not self._compressible(headers):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.pending.append(body)
+            self.pending_size += len(body)
+            if self.pending_size < self.minimum_size:
+                if more_body:
+                    return
+                # Too small to be worth it; sent as it was
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": b"".join(self.pending), "more_body": False})
+                return
+
+            body, self.pending = b"".join(self.pending), []
+            self.encoder = _encoder(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                encoded = self.encoder.encode(body, final=True)
+                headers["Content-Length"] = str(len(encoded))
+                await self.send(self.start)
+                await self._send_body(body, encoded, False)
+                return
+            # The length is unknown until the stream ends
+            del headers["Content-Length"]
+            await self.send(self.start)
+
+        await self._send_body(body, self.encoder.encode(body, final=not more_body), more_body)
+
+    async def _send_body(self, body: bytes, encoded: bytes, more_body: bool):
+        HTTP_RESPONSE_BYTES.inc(len(body), encoding=self.encoding, stage="uncompressed")
+        HTTP_RESPONSE_BYTES.inc(len(encoded), encoding=self.encoding, stage="sent")
+        await self.send({"type": "http.response.body", "body": encoded, "more_body": more_body})
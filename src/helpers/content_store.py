@@ -0,0 +1,137 @@
+from typing import Any, Dict, List, Optional, Tuple
+from bson import Binary
+from pymongo import DeleteMany, UpdateOne
+from src.config import settings
+from src.helpers.change_detector import HASH_KEYS
+from src.helpers.metrics import MONGO_OPERATION_SECONDS, timed
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+CONTENT_COLLECTION = "github_content"
+
+# Large text fields kept out of the listed documents
+CONTENT_FIELDS = {
+    "github_pulls": ("body",),
+    "github_issues": ("body",),
+    "github_commits": ("message",)
+}
+if settings.COMMIT_STORAGE == "shared":
+    # Content is stored per repository; commits shared across repositories keep their messages inline
+    del CONTENT_FIELDS["github_commits"]
+
+class ContentStore:
+    """Moves long text fields into ``github_content`` and leaves a preview inline.
+
+    A split document keeps the first ``preview_chars`` characters of the
+    field and lists the field in ``truncated_fields``. The full text is
+    stored once per tenant, collection, repository, document key and field,
+    zlib-compressed when that saves space. Keyword search sees the preview
+    and, through ``search``, full text stored uncompressed; text past the
+    preview of compressed content cannot be searched.
+    """
+
+    def __init__(self, preview_chars: int, compression: str, min_compress_bytes: int):
+        self.preview_chars = preview_chars
+        self.compression = compression
+        self.min_compress_bytes = min_compress_bytes
+
+    def encode(self, text: str) -> Tuple[Any, Optional[str]]:
+        raw = text.encode("utf-8")
+        if self.compression == "zlib" and len(raw) >= self.min_compress_bytes:
+            packed = zlib.compress(raw, 6)
+            if len(packed) < len(raw):
+                return Binary(packed), "zlib"
+        return text, None
+
+    @staticmethod
+    def decode(content: Dict[str, Any]) -> str:
+        if content.get("encoding") == "zlib":
+            return zlib.decompress(content["text"]).decode("utf-8")
+        return content["text"]
+
+    def split(self, collection: str, docs: List[Dict[str, Any]]) -> List[UpdateOne]:
+        """Trim long fields of documents about to be written; returns the content upserts"""
+        fields = CONTENT_FIELDS.get(collection)
+        if not fields:
+            return []
+        key = HASH_KEYS[collection]
+        ops = []
+        for doc in docs:
+            truncated = []
+            for field in fields:
+                text = doc.get(field)
+                if not text or len(text) <= self.preview_chars:
+                    continue
+                value, encoding = self.encode(text)
+                ops.append(UpdateOne(
+                    {
+                        "tenant_id": doc["tenant_id"], "collection": collection,
+                        "repository_id": doc["repository_id"], "key": doc[key], "field": field
+                    },
+                    {"$set": {"text": value, "encoding": encoding, "length": len(text)}},
+                    upsert=True
+                ))
+                doc[field] = text[:self.preview_chars]
+                truncated.append(field)
+            # Always set, so a body that shrank below the preview size clears the flag
+            doc["truncated_fields"] = truncated
+        return ops
+
+    @staticmethod
+    def delete(collection: str, tenant_id: int, repository_id: int, keys: List[Any]) -> DeleteMany:
+        return DeleteMany({"tenant_id": tenant_id, "collection": collection, "repository_id": repository_id, "key": {"$in": keys}})
+
+    @staticmethod
+    async def search(db, tenant_id: int, collection: str, pattern: str) -> List[Dict[str, Any]]:
+        """Query clauses selecting the documents whose uncompressed full text matches a search"""
+        fields = CONTENT_FIELDS.get(collection)
+        if not fields:
+            return []
+        key = HASH_KEYS[collection]
+        cursor = db[CONTENT_COLLECTION].find(
+            {
+                "tenant_id": tenant_id, "collection": collection, "field": {"$in": list(fields)},
+                # Compressed text is stored as binary, which a regex cannot match
+                "encoding": None, "text": {"$regex": pattern, "$options": "i"}
+            },
+            {"_id": 0, "repository_id": 1, "key": 1}
+        ).limit(settings.CONTENT_SEARCH_MAX_MATCHES)
+        with timed(MONGO_OPERATION_SECONDS, "mongo.find", collection=CONTENT_COLLECTION, operation="search"):
+            return [{"repository_id": content["repository_id"], key: content["key"]} async for content in cursor]
+
+    @staticmethod
+    async def hydrate(db, collection: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Put the full text back into documents that were split, in one query"""
+        split = [doc for doc in docs if doc.get("truncated_fields")]
+        if not split:
+            return docs
+        key = HASH_KEYS[collection]
+        query = {
+            "tenant_id": split[0]["tenant_id"],
+            "collection": collection,
+            "repository_id": {"$in": list({doc["repository_id"] for doc in split})},
+            "key": {"$in": [doc[key] for doc in split]}
+        }
+        with timed(MONGO_OPERATION_SECONDS, "mongo.find", collection=CONTENT_COLLECTION, operation="find"):
+            contents = await db[CONTENT_COLLECTION].find(query).to_list(length=None)
+        texts = {
+            (content["repository_id"], content["key"], content["field"]): ContentStore.decode(content)
+            for content in contents
+        }
+        for doc in split:
+            remaining = []
+            for field in doc["truncated_fields"]:
+                text = texts.get((doc["repository_id"], doc[key], field))
+                if text is None:
+                    # Content is written after its document; keep the preview until it lands
+                    remaining.append(field)
+                else:
+                    doc[field] = text
+            doc["truncated_fields"] = remaining
+        return docs
+
+content_store = ContentStore(
+    settings.CONTENT_PREVIEW_CHARS, settings.CONTENT_COMPRESSION, settings.CONTENT_MIN_COMPRESS_BYTES
+) if settings.CONTENT_SPLIT_ENABLED else None
@@ -1,33 +1,191 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 from pymongo.errors import ConnectionFailure
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from typing import Any, Dict, List
 from src.config import settings
+from src.helpers.indexes import ensure_indexes
+from src.helpers.metrics import MONGO_POOL_CONNECTIONS
+from src.helpers.migrations import run_migrations
+import importlib.util
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest
+}
+
+# Packages wire compressors need besides pymongo; zlib is built in
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy"}
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection counts of one client's pools, summed over its servers.
+
+    Events arrive on the driver's threads, so counts are updated under a lock.
+    """
+
+    def __init__(self, name: str, max_size: int):
+        self.name = name
+        self.max_size = max_size
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self._lock = threading.Lock()
+
+    def _update(self, **deltas):
+        with self._lock:
+            for field, delta in deltas.items():
+                setattr(self, field, getattr(self, field) + delta)
+            MONGO_POOL_CONNECTIONS.set(self.open, pool=self.name, state="open")
+            MONGO_POOL_CONNECTIONS.set(self.in_use, pool=self.name, state="in_use")
+            MONGO_POOL_CONNECTIONS.set(self.waiting, pool=self.name, state="waiting")
+
+    def connection_created(self, event):
+        self._update(open=1)
+
+    def connection_closed(self, event):
+        self._update(open=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(waiting=1)
+
+    def connection_checked_out(self, event):
+        self._update(waiting=-1, in_use=1)
+
+    def connection_check_out_failed(self, event):
+        # Includes waits longer than MONGO_WAIT_QUEUE_TIMEOUT_MS
+        self._update(waiting=-1, checkout_failures=1)
+
+    def connection_checked_in(self, event):
+        self._update(in_use=-1)
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_size": self.max_size,
+            "open": self.open,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "checkout_failures": self.checkout_failures
+        }
+
 class Database:
     client: AsyncIOMotorClient = None
     database = None
+    # Reads of the data API, which may be served by secondaries
+    read_database = None
+    # Sync writes get their own client so bursts cannot take the API's connections
+    sync_client: AsyncIOMotorClient = None
+    sync_database = None
+    pools: Dict[str, PoolStats] = {}
 
 db = Database()
 
+def _read_preference():
+    mode = READ_PREFERENCES[settings.MONGO_READ_PREFERENCE]
+    if mode is Primary:
+        return Primary()
+    return mode(max_staleness=settings.MONGO_MAX_STALENESS_SECONDS)
+
+def _write_concern(value: str):
+    return int(value) if value.isdigit() else value
+
+def _compression() -> Dict[str, Any]:
+    """Client options for MONGO_COMPRESSORS, without compressors whose package is missing.
+
+    The server uses the first compressor in the list that it also supports.
+    """
+    available: List[str] = []
+    for name in settings.MONGO_COMPRESSORS:
+        module = COMPRESSOR_MODULES.get(name)
+        if module is not None and importlib.util.find_spec(module) is None:
+            logger.warning(f"MongoDB {name} compression needs the {module} package; skipping it")
+            continue
+        available.append(name)
+    if not available:
+        return {}
+    return {"compressors": ",".join(available), "zlibCompressionLevel": settings.MONGO_ZLIB_COMPRESSION_LEVEL}
+
+def _client(pool: PoolStats, **options) -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        maxPoolSize=pool.max_size,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        event_listeners=[pool],
+        **options
+    )
+
 async def connect_to_mongo():
-    """Create database connection"""
+    """Create database connections"""
     try:
-        db.client = AsyncIOMotorClient(settings.MONGODB_URL)
+        db.pools = {
+            "api": PoolStats("api", settings.MONGO_MAX_POOL_SIZE),
+            "sync": PoolStats("sync", settings.MONGO_SYNC_MAX_POOL_SIZE)
+        }
+        compression = _compression()
+        db.client = _client(db.pools["api"], **compression)
         db.database = db.client[settings.DATABASE_NAME]
+        db.read_database = db.client.get_database(settings.DATABASE_NAME, read_preference=_read_preference())
+        db.sync_client = _client(
+            db.pools["sync"],
+            **compression,
+            w=_write_concern(settings.MONGO_SYNC_WRITE_CONCERN),
+            journal=settings.MONGO_SYNC_JOURNAL
+        )
+        db.sync_database = db.sync_client[settings.DATABASE_NAME]
         # Test connection
         await db.client.admin.command('ping')
         logger.info("Connected to MongoDB successfully")
+        await run_migrations(db.database)
+        await ensure_indexes(db.database)
     except ConnectionFailure as e:
         logger.error(f"Failed to connect to MongoDB: {e}")
         raise
 
 async def close_mongo_connection():
-    """Close database connection"""
+    """Close database connections"""
+    if db.sync_client:
+        db.sync_client.close()
     if db.client:
         db.client.close()
         logger.info("Disconnected from MongoDB")
 
 def get_database():
-    return db.database
\ No newline at end of file
+    return db.database
+
+def get_read_database():
+    """The database for API reads, following MONGO_READ_PREFERENCE"""
+    return db.read_database
+
+def get_sync_database():
+    """The database for sync writes, on its own connection pool and write concern"""
+    return db.sync_database
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.stats() for name, pool in db.pools.items()}
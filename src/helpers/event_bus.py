@@ -0,0 +1,145 @@
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Set
+from src.config import settings
+import asyncio
+import itertools
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """One consumer's bounded buffer of events on a topic.
+
+    When the consumer falls behind and the buffer is full the oldest event is
+    dropped, so publishing never waits. The consumer is told how many events
+    it missed with an ``events_dropped`` event.
+    """
+
+    def __init__(self, topic: str, size: int):
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.dropped = 0
+
+    def deliver(self, event: Dict[str, Any]):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, or None when nothing arrived within ``timeout`` seconds"""
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            return {"id": None, "event": "events_dropped", "time": datetime.utcnow().isoformat(), "data": {"count": dropped}}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class EventBus:
+    """In-process publish/subscribe for progress events.
+
+    Each topic keeps its last ``history_size`` events, so a consumer that
+    connects late, or reconnects with the last id it saw, catches up first.
+    """
+
+    def __init__(self, buffer_size: int, history_size: int):
+        self.buffer_size = buffer_size
+        self.history_size = history_size
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+        self.history: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._ids = itertools.count(1)
+
+    def publish(self, topic: str, event_type: str, **data) -> Dict[str, Any]:
+        event = {"id": next(self._ids), "event": event_type, "time": datetime.utcnow().isoformat(), "data": data}
+        self.history.setdefault(topic, deque(maxlen=self.history_size)).append(event)
+        for subscription in self.subscribers.get(topic, ()):
+            subscription.deliver(event)
+        return event
+
+    def subscribe(self, topic: str, after: Optional[int] = None) -> Subscription:
+        """Subscribe to a topic, first replaying retained events newer than ``after``"""
+        subscription = Subscription(topic, self.buffer_size)
+        if after is not None:
+            for event in self.history.get(topic, ()):
+                if event["id"] > after:
+                    subscription.deliver(event)
+        self.subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self.subscribers.get(subscription.topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[subscription.topic]
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def sse_frame(event: Dict[str, Any]) -> str:
+    """Format an event as a Server-Sent Events message"""
+    frame = f"event: {event['event']}\ndata: {json.dumps({'time': event['time'], **event['data']}, default=_json_default)}\n\n"
+    return frame if event["id"] is None else f"id: {event['id']}\n{frame}"
+
+async def sse_stream(subscription: Subscription, unsubscribe, wanted=None, last=None):
+    """Yield a subscription's events as SSE messages, with keepalive comments while idle.
+
+    ``wanted`` filters events and the stream ends after an event ``last``
+    accepts. ``unsubscribe`` is called however the stream ends.
+    """
+    try:
+        while True:
+            event = await subscription.get(settings.EVENT_KEEPALIVE_SECONDS)
+            if event is None:
+                # Keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            if wanted is not None and not wanted(event):
+                continue
+            yield sse_frame(event)
+            if last is not None and last(event):
+                return
+    finally:
+        unsubscribe(subscription)
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+event_bus = EventBus(settings.EVENT_BUFFER_SIZE, settings.EVENT_HISTORY_SIZE)
+
+def sync_topic(user_id: int) -> str:
+    return f"sync:{user_id}"
+
+class SyncProgress:
+    """Publishes the progress of one sync on its integration's topic.
+
+    Also counts the fetch jobs still outstanding per repository, to announce
+    when a repository has been fetched completely.
+    """
+
+    def __init__(self, user_id: int, sync_id: str, bus: EventBus = event_bus):
+        self.user_id = user_id
+        self.sync_id = sync_id
+        self.bus = bus
+        self.topic = sync_topic(user_id)
+        self.outstanding: Dict[str, int] = {}
+
+    def emit(self, event_type: str, **data):
+        self.bus.publish(self.topic, event_type, sync_id=self.sync_id, **data)
+
+    def job_started(self, repository: Optional[str]):
+        if repository is None:
+            return
+        if repository not in self.outstanding:
+            self.emit("repository_started", repository=repository)
+        self.outstanding[repository] = self.outstanding.get(repository, 0) + 1
+
+    def job_finished(self, repository: Optional[str]):
+        if repository not in self.outstanding:
+            return
+        self.outstanding[repository] -= 1
+        if not self.outstanding[repository]:
+            del self.outstanding[repository]
+            self.emit("repository_finished", repository=repository)
@@ -2,115 +2,210 @@ import httpx
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 from src.config import settings
+from src.helpers.token_pool import TokenPool
+from src.helpers.metrics import GITHUB_REQUEST_SECONDS, GITHUB_RESPONSES, GITHUB_RATE_LIMIT_REMAINING, timed
+from src.helpers.sync_profiler import SyncProfiler
+from src.helpers.event_bus import SyncProgress
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+MAX_TOKEN_ATTEMPTS = 3
+
+# Token waits longer than this are reported as rate-limit waits
+RATE_LIMIT_WAIT_EVENT_SECONDS = 1.0
+
 class GitHubClient:
-    def __init__(self, access_token: str):
+    def __init__(
+        self,
+        access_token: str,
+        token_pool: Optional[TokenPool] = None,
+        profiler: Optional[SyncProfiler] = None,
+        progress: Optional[SyncProgress] = None
+    ):
         self.access_token = access_token
         self.base_url = settings.GITHUB_API_BASE
-        self.headers = {
+        self.token_pool = token_pool
+        self.profiler = profiler
+        self.progress = progress
+        self.retries = 0
+        self.requests: Dict[Optional[str], int] = {}  # Requests sent per resource, None for user-scoped ones
+        self.headers = self._headers_for(access_token)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self):
+        """Share one connection pool across requests for the client's lifetime"""
+        self._client = httpx.AsyncClient()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+
+    async def _send(self, url: str, headers: Dict[str, str], params: Optional[Dict[str, Any]]) -> httpx.Response:
+        if self._client is not None:
+            return await self._client.get(url, headers=headers, params=params)
+        async with httpx.AsyncClient() as client:
+            return await client.get(url, headers=headers, params=params)
+
+    def _headers_for(self, access_token: str) -> Dict[str, str]:
+        return {
             "Authorization": f"Bearer {access_token}",
             "Accept": "application/vnd.github.v3+json",
             "User-Agent": "GitHub-Integration-App"
         }
-    
-    async def get_user(self) -> Dict[str, Any]:
-        """Get authenticated user info"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/user",
-                headers=self.headers
+
+    async def _get(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, resource: Optional[str] = None) -> Any:
+        """GET a GitHub endpoint, borrowing a pooled token for shared resources.
+
+        Requests scoped to the authenticated user (``resource`` is None) always
+        use the client's own token; repository requests may be served by any
+        pooled token authorized for that repository.
+        """
+        pool = self.token_pool
+        for attempt in range(MAX_TOKEN_ATTEMPTS):
+            state = None
+            headers = self.headers
+            started = time.perf_counter()
+            if pool is not None and resource is not None:
+                state = await pool.acquire(resource, self.access_token)
+                headers = self._headers_for(state.token)
+            acquired = time.perf_counter()
+            if self.progress is not None and acquired - started > RATE_LIMIT_WAIT_EVENT_SECONDS:
+                self.progress.emit("rate_limit_wait", resource=resource, seconds=round(acquired - started, 2))
+            self.requests[resource] = self.requests.get(resource, 0) + 1
+
+            try:
+                with timed(GITHUB_REQUEST_SECONDS, "github.request", method=method):
+                    response = await self._send(f"{self.base_url}{path}", headers, params)
+            except Exception:
+                if state is not None:
+                    pool.release(state)
+                raise
+            elapsed = time.perf_counter() - acquired
+
+            GITHUB_RESPONSES.inc(method=method, status=response.status_code)
+            if "x-ratelimit-remaining" in response.headers:
+                GITHUB_RATE_LIMIT_REMAINING.set(
+                    int(response.headers["x-ratelimit-remaining"]),
+                    token_user_id=state.user_id if state is not None else "owner"
+                )
+
+            if state is not None:
+                pool.release(state, response.headers, response.status_code)
+            elif pool is not None and self.access_token in pool.tokens:
+                pool.update(pool.tokens[self.access_token], response.headers)
+
+            # Switch tokens when a borrowed one is revoked or any one runs dry
+            borrowed = state is not None and state.token != self.access_token
+            exhausted = response.status_code in (403, 429) and response.headers.get("x-ratelimit-remaining") == "0"
+            retry = (
+                state is not None and (exhausted or (borrowed and response.status_code == 401))
+                and attempt + 1 < MAX_TOKEN_ATTEMPTS
             )
+            if self.profiler is not None:
+                self.profiler.record_request(resource, method, elapsed, acquired - started, retry)
+            if retry:
+                self.retries += 1
+                if self.progress is not None:
+                    self.progress.emit("rate_limit_retry", resource=resource, status=response.status_code)
+                logger.info(f"Retrying {path} with another token (status {response.status_code})")
+                continue
+
             response.raise_for_status()
             return response.json()
-    
+
+    async def get_user(self) -> Dict[str, Any]:
+        """Get authenticated user info"""
+        return await self._get("get_user", "/user")
+
+    async def get_rate_limit(self) -> Dict[str, Any]:
+        """Core rate-limit budget of the client's own token; this call is not counted against it"""
+        response = await self._get("get_rate_limit", "/rate_limit")
+        return response["resources"]["core"]
+
     async def get_organizations(self) -> List[Dict[str, Any]]:
         """Get user organizations"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/user/orgs",
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return response.json()
-    
+        return await self._get("get_organizations", "/user/orgs")
+
     async def get_organization_repos(self, org: str, page: int = 1, per_page: int = 100) -> List[Dict[str, Any]]:
         """Get repositories for an organization"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/orgs/{org}/repos",
-                headers=self.headers,
-                params={"page": page, "per_page": per_page, "sort": "updated"}
-            )
-            response.raise_for_status()
-            return response.json()
-    
+        return await self._get(
+            "get_organization_repos",
+            f"/orgs/{org}/repos",
+            params={"page": page, "per_page": per_page, "sort": "updated"}
+        )
+
     async def get_user_repos(self, page: int = 1, per_page: int = 100) -> List[Dict[str, Any]]:
         """Get user repositories"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/user/repos",
-                headers=self.headers,
-                params={"page": page, "per_page": per_page, "sort": "updated"}
-            )
-            response.raise_for_status()
-            return response.json()
-    
-    async def get_repository_commits(self, owner: str, repo: str, page: int = 1, per_page: int = 100) -> List[Dict[str, Any]]:
-        """Get commits for a repository"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/repos/{owner}/{repo}/commits",
-                headers=self.headers,
-                params={"page": page, "per_page": per_page}
-            )
-            response.raise_for_status()
-            return response.json()
-    
+        return await self._get(
+            "get_user_repos",
+            "/user/repos",
+            params={"page": page, "per_page": per_page, "sort": "updated"}
+        )
+
+    async def get_repository_commits(self, owner: str, repo: str, page: int = 1, per_page: int = 100, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get commits for a repository, optionally only those committed since an ISO-8601 time"""
+        params = {"page": page, "per_page": per_page}
+        if since:
+            params["since"] = since
+        return await self._get(
+            "get_repository_commits",
+            f"/repos/{owner}/{repo}/commits",
+            params=params,
+            resource=f"{owner}/{repo}"
+        )
+
+    async def get_repository(self, owner: str, repo: str) -> Dict[str, Any]:
+        """Get a repository; forks include their ``parent``"""
+        return await self._get("get_repository", f"/repos/{owner}/{repo}", resource=f"{owner}/{repo}")
+
+    async def compare_commits(self, owner: str, repo: str, base: str, head: str, page: int = 1, per_page: int = 100) -> Dict[str, Any]:
+        """Compare two refs; refs in another repository of the fork network are written ``owner:branch``"""
+        return await self._get(
+            "compare_commits",
+            f"/repos/{owner}/{repo}/compare/{base}...{head}",
+            params={"page": page, "per_page": per_page},
+            resource=f"{owner}/{repo}"
+        )
+
     async def get_repository_pulls(self, owner: str, repo: str, state: str = "all", page: int = 1, per_page: int = 100) -> List[Dict[str, Any]]:
         """Get pull requests for a repository"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/repos/{owner}/{repo}/pulls",
-                headers=self.headers,
-                params={"state": state, "page": page, "per_page": per_page}
-            )
-            response.raise_for_status()
-            return response.json()
-    
-    async def get_repository_issues(self, owner: str, repo: str, state: str = "all", page: int = 1, per_page: int = 100) -> List[Dict[str, Any]]:
-        """Get issues for a repository"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/repos/{owner}/{repo}/issues",
-                headers=self.headers,
-                params={"state": state, "page": page, "per_page": per_page}
-            )
-            response.raise_for_status()
-            return response.json()
-    
+        return await self._get(
+            "get_repository_pulls",
+            f"/repos/{owner}/{repo}/pulls",
+            params={"state": state, "page": page, "per_page": per_page},
+            resource=f"{owner}/{repo}"
+        )
+
+    async def get_repository_issues(self, owner: str, repo: str, state: str = "all", page: int = 1, per_page: int = 100, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get issues for a repository, optionally only those updated since an ISO-8601 time"""
+        params = {"state": state, "page": page, "per_page": per_page}
+        if since:
+            params["since"] = since
+        return await self._get(
+            "get_repository_issues",
+            f"/repos/{owner}/{repo}/issues",
+            params=params,
+            resource=f"{owner}/{repo}"
+        )
+
     async def get_issue_events(self, owner: str, repo: str, issue_number: int) -> List[Dict[str, Any]]:
         """Get events (changelog) for an issue"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/repos/{owner}/{repo}/issues/{issue_number}/events",
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return response.json()
-    
+        return await self._get(
+            "get_issue_events",
+            f"/repos/{owner}/{repo}/issues/{issue_number}/events",
+            resource=f"{owner}/{repo}"
+        )
+
     async def get_organization_members(self, org: str, page: int = 1, per_page: int = 100) -> List[Dict[str, Any]]:
         """Get organization members"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/orgs/{org}/members",
-                headers=self.headers,
-                params={"page": page, "per_page": per_page}
-            )
-            response.raise_for_status()
-            return response.json()
+        return await self._get(
+            "get_organization_members",
+            f"/orgs/{org}/members",
+            params={"page": page, "per_page": per_page}
+        )
 
 async def exchange_code_for_token(code: str) -> str:
     """Exchange OAuth code for access token"""
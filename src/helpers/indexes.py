@@ -0,0 +1,132 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.collation import Collation, CollationStrength
+from src.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+TENANT = ("tenant_id", ASCENDING)
+
+# GitHub logins are case-insensitive; user lookups query with this collation
+CASE_INSENSITIVE = Collation(locale="en", strength=CollationStrength.SECONDARY)
+
+# Every data index leads with the tenant, so per-tenant queries only touch that
+# tenant's entries: upsert keys, per-repository indexes that cover the
+# change-detection preload, and the default sorts and common filters of the data API.
+# Upsert keys are unique, so concurrent syncs of one tenant cannot both insert a document.
+INDEXES = {
+    "github_organizations": [
+        IndexModel([TENANT, ("github_id", ASCENDING)], unique=True),
+        IndexModel([TENANT, ("_id", DESCENDING)])
+    ],
+    "github_repos": [
+        IndexModel([TENANT, ("github_id", ASCENDING)], unique=True),
+        # Token pool: which tenants can read a repository
+        IndexModel([("github_id", ASCENDING), TENANT]),
+        IndexModel([TENANT, ("_id", DESCENDING)])
+    ],
+    "github_commits": [
+        IndexModel([TENANT, ("repository_id", ASCENDING), ("sha", ASCENDING), ("content_hash", ASCENDING)]),
+        IndexModel([TENANT, ("author_date", DESCENDING)]),
+        # Upsert key, also serving single-commit lookups by sha
+        IndexModel([TENANT, ("sha", ASCENDING), ("repository_id", ASCENDING)], unique=True)
+    ],
+    "github_pulls": [
+        IndexModel([TENANT, ("github_id", ASCENDING)], unique=True),
+        IndexModel([TENANT, ("repository_id", ASCENDING), ("github_id", ASCENDING), ("content_hash", ASCENDING)]),
+        IndexModel([TENANT, ("created_at", DESCENDING)]),
+        # Recently updated pull requests
+        IndexModel([TENANT, ("updated_at", DESCENDING)]),
+        IndexModel([TENANT, ("state", ASCENDING), ("created_at", DESCENDING)])
+    ],
+    "github_issues": [
+        IndexModel([TENANT, ("github_id", ASCENDING)], unique=True),
+        IndexModel([TENANT, ("repository_id", ASCENDING), ("github_id", ASCENDING), ("content_hash", ASCENDING)]),
+        IndexModel([TENANT, ("created_at", DESCENDING)]),
+        IndexModel([TENANT, ("state", ASCENDING), ("created_at", DESCENDING)])
+    ],
+    "github_changelogs": [
+        IndexModel([TENANT, ("github_id", ASCENDING)], unique=True),
+        IndexModel([TENANT, ("repository_id", ASCENDING), ("github_id", ASCENDING), ("content_hash", ASCENDING)]),
+        IndexModel([TENANT, ("_id", DESCENDING)])
+    ],
+    "github_users": [
+        IndexModel([TENANT, ("github_id", ASCENDING)], unique=True),
+        IndexModel([TENANT, ("login", ASCENDING)]),
+        IndexModel([TENANT, ("emails", ASCENDING)]),
+        # Batch lookups by login and by commit email, in one case-insensitive query.
+        # Data API filters compare exactly and use the indexes above.
+        IndexModel([TENANT, ("login", ASCENDING)], collation=CASE_INSENSITIVE, name="tenant_id_1_login_1_ci"),
+        IndexModel([TENANT, ("emails", ASCENDING)], collation=CASE_INSENSITIVE, name="tenant_id_1_emails_1_ci"),
+        IndexModel([TENANT, ("_id", DESCENDING)])
+    ],
+    # Full text of long fields, looked up by document key
+    "github_content": [
+        IndexModel([TENANT, ("collection", ASCENDING), ("repository_id", ASCENDING), ("key", ASCENDING), ("field", ASCENDING)], unique=True)
+    ],
+    "github_archive_manifest": [
+        IndexModel([TENANT, ("collection", ASCENDING), ("month", ASCENDING)])
+    ],
+    "github_snapshots": [
+        IndexModel([TENANT, ("collection", ASCENDING), ("started_at", DESCENDING)])
+    ],
+    "github_sync_schedule": [
+        IndexModel([TENANT, ("repository_id", ASCENDING)], unique=True)
+    ],
+    "github_sync_reports": [
+        IndexModel([TENANT, ("started_at", DESCENDING)])
+    ]
+}
+
+# Monthly bucket collections (src/helpers/bucket_storage.py). A month may span
+# several overflow buckets, so the upsert key is not unique.
+BUCKET_INDEXES = [
+    IndexModel([TENANT, ("repository_id", ASCENDING), ("month", DESCENDING), ("count", ASCENDING)]),
+    IndexModel([TENANT, ("month", DESCENDING)])
+]
+BUCKET_COLLECTIONS = ["github_commits_buckets", "github_changelogs_buckets"]
+
+# Commits stored once per SHA (src/helpers/commit_storage.py) instead of the
+# github_commits indexes above. The unique index is the upsert key; the
+# membership indexes serve per-repository reads, preloads and renames.
+SHARED_COMMIT_INDEXES = [
+    IndexModel([TENANT, ("sha", ASCENDING)], unique=True),
+    IndexModel([TENANT, ("repositories.id", ASCENDING), ("author_date", DESCENDING)]),
+    IndexModel([TENANT, ("repositories.id", ASCENDING), ("repositories.name", ASCENDING)]),
+    IndexModel([TENANT, ("author_date", DESCENDING)])
+]
+
+# Collections holding tenant data, all keyed by tenant_id
+TENANT_COLLECTIONS = list(INDEXES) + BUCKET_COLLECTIONS
+
+# Collections not scoped to a tenant
+SHARED_INDEXES = {
+    # Buckets of clients idle for an hour have refilled and can go
+    "api_rate_limits": [
+        IndexModel([("updated_at", ASCENDING)], expireAfterSeconds=3600)
+    ]
+}
+
+async def ensure_indexes(db):
+    """Create the indexes the sync and data API rely on"""
+    shared_commits = settings.COMMIT_STORAGE == "shared"
+    for collection, indexes in {**INDEXES, **SHARED_INDEXES}.items():
+        if collection == "github_commits" and shared_commits:
+            indexes = SHARED_COMMIT_INDEXES
+        try:
+            await db[collection].create_indexes(indexes)
+        except Exception as e:
+            if collection == "github_commits" and shared_commits:
+                # Upserts would match any duplicate copy of a commit without the unique index
+                raise RuntimeError(f"COMMIT_STORAGE=shared needs a unique (tenant_id, sha) index on github_commits: {e}") from e
+            if any(index.document.get("unique") for index in indexes):
+                # Concurrent syncs could insert duplicates without the unique upsert key
+                raise RuntimeError(f"Failed to create the unique indexes of {collection}: {e}") from e
+            logger.error(f"Failed to create indexes for {collection}: {e}")
+    for collection in BUCKET_COLLECTIONS:
+        if collection.removesuffix("_buckets") not in settings.BUCKETED_COLLECTIONS:
+            continue
+        try:
+            await db[collection].create_indexes(BUCKET_INDEXES)
+        except Exception as e:
+            logger.error(f"Failed to create indexes for {collection}: {e}")
@@ -0,0 +1,203 @@
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from src.config import settings
+import bisect
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # Tracing is optional
+    otel_trace = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Per-bucket counts followed by the running sum and total count
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0.0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, series in sorted(self.series.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-2]}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# GitHub API
+GITHUB_REQUEST_SECONDS = registry.register(Histogram(
+    "github_request_duration_seconds", "Latency of GitHub API requests", ["method"]
+))
+GITHUB_RESPONSES = registry.register(Counter(
+    "github_responses", "GitHub API responses by status code", ["method", "status"]
+))
+GITHUB_RATE_LIMIT_REMAINING = registry.register(Gauge(
+    "github_rate_limit_remaining", "Remaining GitHub rate-limit budget per token owner", ["token_user_id"]
+))
+
+# MongoDB
+MONGO_OPERATION_SECONDS = registry.register(Histogram(
+    "mongo_operation_duration_seconds", "Latency of MongoDB operations", ["collection", "operation"]
+))
+MONGO_BATCH_SIZE = registry.register(Histogram(
+    "mongo_batch_size", "Operations per MongoDB bulk write", ["collection"], buckets=SIZE_BUCKETS
+))
+MONGO_POOL_CONNECTIONS = registry.register(Gauge(
+    "mongo_pool_connections", "MongoDB connections per client pool: open, in use, or waited for", ["pool", "state"]
+))
+
+# HTTP API
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "Latency of API requests per route", ["method", "route", "status"]
+))
+RATE_LIMITED = registry.register(Counter(
+    "http_rate_limited", "Data API requests refused with 429, by route and limit", ["route", "reason"]
+))
+HTTP_RESPONSE_BYTES = registry.register(Counter(
+    "http_response_bytes", "Bytes of compressed responses before and after encoding", ["encoding", "stage"]
+))
+
+# Sync
+SYNC_PHASE_SECONDS = registry.register(Histogram(
+    "sync_phase_duration_seconds", "Duration of each sync phase", ["phase"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+))
+SYNC_DOCUMENTS = registry.register(Counter(
+    "sync_documents", "Documents processed by syncs", ["collection", "outcome"]
+))
+SYNC_DOCUMENTS_PER_SECOND = registry.register(Gauge(
+    "sync_documents_per_second", "Document throughput of the most recent sync", []
+))
+SYNC_QUEUE_DEPTH = registry.register(Gauge(
+    "sync_queue_depth", "Items waiting in each sync pipeline stage", ["stage"]
+))
+REMOVAL_DOCUMENTS = registry.register(Counter(
+    "integration_removal_documents", "Documents deleted by integration removals", ["collection"]
+))
+SNAPSHOT_ROWS = registry.register(Counter(
+    "snapshot_rows", "Rows written to columnar snapshots", ["collection"]
+))
+
+def span(name: str, **attributes):
+    """An OpenTelemetry span when tracing is enabled and installed, else a no-op"""
+    if otel_trace is None or not settings.OTEL_TRACING_ENABLED:
+        return nullcontext()
+    return otel_trace.get_tracer("github-integration").start_as_current_span(name, attributes=attributes)
+
+@contextmanager
+def timed(histogram: Histogram, span_name: Optional[str] = None, **labels) -> Iterator[None]:
+    """Observe a duration and, optionally, trace it under the same labels"""
+    with span(span_name, **labels) if span_name else nullcontext():
+        with histogram.time(**labels):
+            yield
@@ -0,0 +1,254 @@
+"""One-off data migrations, applied in order and recorded in ``schema_migrations``.
+
+They run on startup before the indexes are built, and can be run by hand:
+
+    python -m src.helpers.migrations
+"""
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from pymongo import DeleteMany, UpdateOne
+from src.config import settings
+from src.helpers.bucket_storage import BUCKET_SIZE
+from src.helpers.content_store import ContentStore
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+# Field each collection used for its owning integration before tenant_id.
+# On pulls and issues user_id is the author's id, not the integration's.
+LEGACY_TENANT_FIELDS = {
+    "github_organizations": "user_id",
+    "github_repos": "user_id",
+    "github_commits": "user_id",
+    "github_pulls": "integration_user_id",
+    "github_issues": "integration_user_id",
+    "github_changelogs": "integration_user_id",
+    "github_users": "integration_user_id",
+    "github_sync_reports": "integration_user_id"
+}
+
+# Indexes replaced by their tenant-leading versions
+OBSOLETE_INDEXES = {
+    "github_organizations": ["github_id_1"],
+    "github_commits": ["repository_id_1_sha_1_content_hash_1", "author_date_-1"],
+    "github_pulls": ["github_id_1", "repository_id_1_github_id_1_content_hash_1", "created_at_-1", "state_1_created_at_-1"],
+    "github_issues": ["github_id_1", "repository_id_1_github_id_1_content_hash_1", "created_at_-1", "state_1_created_at_-1"],
+    "github_changelogs": ["github_id_1", "repository_id_1_github_id_1_content_hash_1"],
+    "github_users": ["github_id_1"],
+    "github_sync_reports": ["integration_user_id_1_started_at_-1"]
+}
+
+async def _backfill_tenant(db, collection: str, source: str):
+    """Copy the legacy owner field into tenant_id in _id-ordered batches"""
+    coll = db[collection]
+    pending = {"tenant_id": {"$exists": False}, source: {"$exists": True}}
+    updated = 0
+    while True:
+        batch = await coll.find(pending, {"_id": 1}).sort("_id", 1).limit(BATCH_SIZE).to_list(length=BATCH_SIZE)
+        if not batch:
+            break
+        result = await coll.update_many(
+            {"_id": {"$in": [doc["_id"] for doc in batch]}},
+            [{"$set": {"tenant_id": f"${source}"}}]
+        )
+        updated += result.modified_count
+    if updated:
+        logger.info(f"Backfilled tenant_id on {updated} {collection} documents")
+
+async def tenant_key(db):
+    """Give every document a tenant_id and drop the indexes that did not lead with it.
+
+    Repositories and commits used to be shared between integrations; the
+    existing copy goes to the integration that first synced it, and the
+    others get their own on their next sync.
+    """
+    for collection, source in LEGACY_TENANT_FIELDS.items():
+        await _backfill_tenant(db, collection, source)
+    await db.github_repos.update_many(
+        {"authorized_user_ids": {"$exists": True}},
+        {"$unset": {"authorized_user_ids": ""}}
+    )
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+                logger.info(f"Dropped index {collection}.{name}")
+
+# Per-repository commit indexes whose keys the shared layout reuses or drops.
+# tenant_id_1_sha_1 is rebuilt as a unique index.
+PER_REPOSITORY_COMMIT_INDEXES = [
+    "tenant_id_1_repository_id_1_sha_1_content_hash_1", "tenant_id_1_sha_1", "tenant_id_1_sha_1_repository_id_1"
+]
+
+def _merge_commit(copies: List[Dict[str, Any]], messages: Dict[Tuple[int, str], str]) -> Tuple[Any, Dict[str, Any], List[Any]]:
+    """The copy to keep, its update, and the copies to delete for one (tenant_id, sha)"""
+    # A copy already in the shared layout, from a sync or an interrupted run, is kept
+    copies.sort(key=lambda doc: "repositories" not in doc)
+    keep = copies[0]
+    members = {member["id"]: member["name"] for member in keep.get("repositories", [])}
+    for doc in copies:
+        if "repository_id" in doc:
+            members.setdefault(doc["repository_id"], doc.get("repository_name"))
+    update: Dict[str, Any] = {
+        "$set": {"repositories": [{"id": repository_id, "name": name} for repository_id, name in members.items()]},
+        "$unset": {"repository_id": "", "repository_name": ""}
+    }
+    if "message" in keep.get("truncated_fields", ()):
+        # Shared commits keep their messages inline
+        message = next((messages[doc["repository_id"], doc["sha"]] for doc in copies if (doc.get("repository_id"), doc["sha"]) in messages), None)
+        if message is not None:
+            update["$set"].update({"message": message, "truncated_fields": []})
+    return keep["_id"], update, [doc["_id"] for doc in copies[1:]]
+
+async def shared_commits(db):
+    """Merge per-repository commit copies into one document per (tenant_id, sha).
+
+    Each merged commit lists its repositories as ``repositories: [{id, name}]``,
+    and full messages are moved back inline from ``github_content``. Merging
+    happens before the unique (tenant_id, sha) index is built, which the
+    copies would otherwise violate. Content hashes of merged commits no longer
+    match, so the next sync rewrites them once.
+    """
+    commits = db.github_commits
+    merged = 0
+    while True:
+        batch = await commits.find(
+            {"repositories": {"$exists": False}}, {"_id": 0, "tenant_id": 1, "sha": 1}
+        ).sort([("tenant_id", 1), ("sha", 1)]).limit(BATCH_SIZE).to_list(length=BATCH_SIZE)
+        if not batch:
+            break
+        shas: Dict[int, List[str]] = {}
+        for doc in batch:
+            shas.setdefault(doc["tenant_id"], []).append(doc["sha"])
+        for tenant_id, keys in shas.items():
+            keys = list(set(keys))
+            copies: Dict[str, List[Dict[str, Any]]] = {}
+            async for doc in commits.find(
+                {"tenant_id": tenant_id, "sha": {"$in": keys}},
+                {"sha": 1, "repository_id": 1, "repository_name": 1, "repositories": 1, "truncated_fields": 1}
+            ):
+                copies.setdefault(doc["sha"], []).append(doc)
+            messages = {
+                (content["repository_id"], content["key"]): ContentStore.decode(content)
+                async for content in db.github_content.find(
+                    {"tenant_id": tenant_id, "collection": "github_commits", "key": {"$in": keys}, "field": "message"}
+                )
+            }
+            ops = []
+            for group in copies.values():
+                keep, update, duplicates = _merge_commit(group, messages)
+                ops.append(UpdateOne({"_id": keep}, update))
+                if duplicates:
+                    ops.append(DeleteMany({"_id": {"$in": duplicates}}))
+            await commits.bulk_write(ops, ordered=True)
+            merged += len(copies)
+    await db.github_content.delete_many({"collection": "github_commits"})
+    existing = await commits.index_information()
+    for name in PER_REPOSITORY_COMMIT_INDEXES:
+        # A unique (tenant_id, sha) index is already the shared one
+        if name in existing and not (name == "tenant_id_1_sha_1" and existing[name].get("unique")):
+            await commits.drop_index(name)
+            logger.info(f"Dropped index github_commits.{name}")
+    if merged:
+        logger.info(f"Merged {merged} commits into shared storage")
+
+async def bucket_sizes(db):
+    """Record item counts and sizes on buckets, and drop the one-bucket-per-month unique index"""
+    for collection in ("github_commits_buckets", "github_changelogs_buckets"):
+        existing = await db[collection].index_information()
+        for name, index in existing.items():
+            if index.get("unique") and name.startswith("tenant_id_1_repository_id_1_month_"):
+                await db[collection].drop_index(name)
+                logger.info(f"Dropped index {collection}.{name}")
+        result = await db[collection].update_many(
+            {"count": {"$exists": False}},
+            [BUCKET_SIZE]
+        )
+        if result.modified_count:
+            logger.info(f"Recorded sizes on {result.modified_count} {collection}")
+
+# Upsert key of each collection after tenant_id, and the non-unique index that
+# served it before the unique one replaced it
+UPSERT_KEY_FIELDS = {
+    "github_organizations": (("github_id",), "tenant_id_1_github_id_1"),
+    "github_repos": (("github_id",), "tenant_id_1_github_id_1"),
+    "github_commits": (("sha", "repository_id"), "tenant_id_1_sha_1"),
+    "github_pulls": (("github_id",), "tenant_id_1_github_id_1"),
+    "github_issues": (("github_id",), "tenant_id_1_github_id_1"),
+    "github_changelogs": (("github_id",), "tenant_id_1_github_id_1"),
+    "github_users": (("github_id",), "tenant_id_1_github_id_1")
+}
+
+async def unique_upsert_keys(db):
+    """Delete duplicate copies of documents sharing an upsert key, and drop the non-unique key indexes.
+
+    Concurrent syncs of one tenant could each insert the same document. The
+    oldest copy is kept; ``ensure_indexes`` then builds the unique indexes.
+    Shared commits are already unique per (tenant_id, sha) and are left alone.
+    """
+    for collection, (fields, obsolete) in UPSERT_KEY_FIELDS.items():
+        coll = db[collection]
+        cursor = coll.aggregate([
+            {"$group": {
+                "_id": {field: f"${field}" for field in ("tenant_id",) + fields},
+                "keep": {"$min": "$_id"},
+                "ids": {"$push": "$_id"},
+                "copies": {"$sum": 1}
+            }},
+            {"$match": {"copies": {"$gt": 1}}}
+        ], allowDiskUse=True)
+        duplicates = []
+        deleted = 0
+        async for group in cursor:
+            duplicates.extend(doc_id for doc_id in group["ids"] if doc_id != group["keep"])
+            if len(duplicates) >= BATCH_SIZE:
+                deleted += (await coll.delete_many({"_id": {"$in": duplicates}})).deleted_count
+                duplicates = []
+        if duplicates:
+            deleted += (await coll.delete_many({"_id": {"$in": duplicates}})).deleted_count
+        if deleted:
+            logger.info(f"Deleted {deleted} duplicate {collection} documents")
+        existing = await coll.index_information()
+        if obsolete in existing and not existing[obsolete].get("unique"):
+            await coll.drop_index(obsolete)
+            logger.info(f"Dropped index {collection}.{obsolete}")
+
+MIGRATIONS: List[Tuple[str, Callable[..., Awaitable[None]]]] = [
+    ("0001_tenant_key", tenant_key),
+    ("0002_shared_commits", shared_commits),
+    ("0003_bucket_sizes", bucket_sizes),
+    ("0004_unique_upsert_keys", unique_upsert_keys)
+]
+
+# Migrations that only apply to some configurations; they stay pending until they do
+CONDITIONS: Dict[str, Callable[[], bool]] = {
+    "0002_shared_commits": lambda: settings.COMMIT_STORAGE == "shared"
+}
+
+async def run_migrations(db):
+    """Apply the migrations this database has not recorded yet"""
+    applied = {doc["_id"] async for doc in db.schema_migrations.find({}, {"_id": 1})}
+    for name, migration in MIGRATIONS:
+        if name in applied or not CONDITIONS.get(name, lambda: True)():
+            continue
+        logger.info(f"Applying migration {name}")
+        await migration(db)
+        await db.schema_migrations.insert_one({"_id": name, "applied_at": datetime.utcnow()})
+
+async def _main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from src.config import settings
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        await run_migrations(client[settings.DATABASE_NAME])
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,249 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple, Union, get_args, get_origin
+from src.config import settings
+from src.helpers.bucket_storage import BUCKETS
+from src.helpers.indexes import INDEXES
+from src.helpers.transformers import MAPPINGS
+import logging
+import operator
+import re
+
+logger = logging.getLogger(__name__)
+
+# Operators of the filter language; the Mongo "$" spellings are accepted too
+COMPARISONS = {"eq": "$eq", "in": "$in", "gt": "$gt", "gte": "$gte", "lt": "$lt", "lte": "$lte"}
+RANGE_OPERATORS = {"gt", "gte", "lt", "lte"}
+MAX_IN_VALUES = 500
+
+class FilterError(ValueError):
+    """A filter the language does not allow; the message is safe to show clients"""
+
+def _coerce_int(value: Any) -> int:
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.lstrip("-").isdigit():
+        return int(value)
+    raise ValueError
+
+def _coerce_float(value: Any) -> float:
+    if isinstance(value, bool):
+        raise ValueError
+    return float(value)
+
+def _coerce_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    raise ValueError
+
+def _coerce_str(value: Any) -> str:
+    if not isinstance(value, str):
+        raise ValueError
+    return value
+
+def _coerce_datetime(value: Any) -> datetime:
+    """ISO 8601 dates or timestamps; naive values are taken as UTC, like the stored ones"""
+    if not isinstance(value, str):
+        raise ValueError
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+COERCERS = {
+    int: _coerce_int,
+    float: _coerce_float,
+    bool: _coerce_bool,
+    str: _coerce_str,
+    datetime: _coerce_datetime
+}
+ORDERED_TYPES = {int, float, datetime}
+
+class FieldType:
+    """Filterable type of one model field"""
+
+    __slots__ = ("name", "type", "nullable", "is_list")
+
+    def __init__(self, name: str, annotation: Any):
+        self.name = name
+        self.nullable = False
+        self.is_list = False
+        if get_origin(annotation) is Union:
+            args = [arg for arg in get_args(annotation) if arg is not type(None)]
+            self.nullable = len(args) < len(get_args(annotation))
+            annotation = args[0]
+        if get_origin(annotation) in (list, List):
+            # Equality on a list field matches any element, as in MongoDB
+            self.is_list = True
+            annotation = get_args(annotation)[0]
+        self.type = annotation
+
+    def coerce(self, value: Any) -> Any:
+        if value is None:
+            if self.nullable:
+                return None
+            raise FilterError(f"'{self.name}' cannot be null")
+        try:
+            return COERCERS[self.type](value)
+        except (ValueError, TypeError):
+            raise FilterError(f"Invalid value for '{self.name}': expected {self.type.__name__}")
+
+def _field_types(collection: str) -> Dict[str, FieldType]:
+    model = MAPPINGS[collection].model
+    return {
+        name: FieldType(name, field.annotation)
+        for name, field in model.model_fields.items()
+        # The tenant is set by the controller, never by the client
+        if name not in ("id", "tenant_id") and field.annotation is not None and _base_type(field.annotation) in COERCERS
+    }
+
+def _base_type(annotation: Any) -> Any:
+    while get_origin(annotation) in (Union, list, List):
+        annotation = [arg for arg in get_args(annotation) if arg is not type(None)][0]
+    return annotation
+
+FIELD_TYPES = {collection: _field_types(collection) for collection in MAPPINGS}
+
+def _leading_keys(collection: str) -> Set[str]:
+    """Fields an index can seek on once the query is scoped to a tenant"""
+    if collection in BUCKETS:
+        # Buckets are indexed by repository and month; _id sorts follow the time field
+        return {"_id", "repository_id", BUCKETS[collection].time_field}
+    keys = set()
+    for index in INDEXES.get(collection, []):
+        if "collation" in index.document:
+            # Only queries with the same collation can use it
+            continue
+        fields = list(index.document["key"])
+        if fields[0] == "tenant_id":
+            fields = fields[1:]
+        if fields:
+            keys.add(fields[0])
+    return keys
+
+LEADING_KEYS = {collection: _leading_keys(collection) for collection in MAPPINGS}
+
+def compile_filter(collection: str, filters: Any) -> Dict[str, Any]:
+    """Validate a client filter against the collection's model and build the Mongo query.
+
+    ``{"state": "open"}`` is equality, ``{"repository_id": {"in": [1, 2]}}``
+    membership and ``{"created_at": {"gte": "2024-01-01", "lt": "2024-02-01"}}``
+    a range. Values are coerced to the field's type; anything else (unknown
+    fields, other operators such as ``$where`` or ``$regex``) is rejected.
+    """
+    if not isinstance(filters, dict):
+        raise FilterError("Filter must be a JSON object of field conditions")
+
+    fields = FIELD_TYPES[collection]
+    query = {}
+    for name, condition in filters.items():
+        field = fields.get(name)
+        if field is None:
+            raise FilterError(f"Cannot filter {collection} on '{name}'. Filterable fields: {', '.join(sorted(fields))}")
+
+        if not isinstance(condition, dict):
+            query[name] = field.coerce(condition)
+            continue
+        if not condition:
+            raise FilterError(f"Empty condition for '{name}'")
+
+        compiled = {}
+        for operator, value in condition.items():
+            key = operator[1:] if operator.startswith("$") else operator
+            if key not in COMPARISONS:
+                raise FilterError(f"Unsupported operator '{operator}'. Use one of: {', '.join(COMPARISONS)}")
+            if key in RANGE_OPERATORS and field.type not in ORDERED_TYPES:
+                raise FilterError(f"Range operators are not supported on '{name}'")
+            if key == "in":
+                if not isinstance(value, list) or not value:
+                    raise FilterError(f"'in' for '{name}' needs a non-empty list")
+                if len(value) > MAX_IN_VALUES:
+                    raise FilterError(f"'in' for '{name}' accepts at most {MAX_IN_VALUES} values")
+                compiled["$in"] = [field.coerce(item) for item in value]
+            else:
+                compiled[COMPARISONS[key]] = field.coerce(value)
+        query[name] = compiled
+    return query
+
+def check_sort_field(collection: str, field: str):
+    if field != "_id" and field not in FIELD_TYPES[collection]:
+        raise FilterError(f"Cannot sort {collection} by '{field}'")
+
+def plan_violation(collection: str, query: Dict[str, Any], sort: List[Tuple[str, int]]) -> Optional[str]:
+    """Why a query would scan the whole collection, or None when an index can serve it.
+
+    Queries are always scoped to a tenant and every index leads with
+    ``tenant_id``, so a filter must also constrain the key that follows it
+    in some index, and an unfiltered listing must sort on one. Keyword
+    search (``$or`` of regexes) is not considered: it scans the tenant.
+    """
+    indexed = LEADING_KEYS[collection]
+    filtered = [name for name in query if not name.startswith("$") and name != "tenant_id"]
+    if filtered:
+        if any(name in indexed for name in filtered):
+            return None
+        return f"Filter on {', '.join(filtered)} is not served by an index; include one of: {', '.join(sorted(indexed))}"
+    if not sort or sort[0][0] in indexed:
+        return None
+    return f"Sorting all of {collection} by '{sort[0][0]}' needs an index; sort by one of {', '.join(sorted(indexed))} or add a filter"
+
+def guard_query(collection: str, query: Dict[str, Any], sort: List[Tuple[str, int]]):
+    """Apply FILTER_GUARD_MODE to a query shape: raise, log or ignore a full scan"""
+    mode = settings.FILTER_GUARD_MODE
+    if mode == "off":
+        return
+    violation = plan_violation(collection, query, sort)
+    if violation is None:
+        return
+    if mode == "reject":
+        raise FilterError(violation)
+    logger.warning(f"Unindexed query on {collection}: {violation}")
+
+MATCHERS = {
+    "$eq": operator.eq, "$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le
+}
+
+def _matches_value(condition: Any, value: Any) -> bool:
+    if isinstance(value, datetime) and value.tzinfo is None:
+        # Stored times are naive UTC, filter values are aware
+        value = value.replace(tzinfo=timezone.utc)
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+    for op, expected in condition.items():
+        if op == "$options":
+            continue
+        if op == "$regex":
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            try:
+                matched = isinstance(value, str) and re.search(expected, value, flags) is not None
+            except re.error:
+                matched = False
+        elif op == "$in":
+            matched = value in expected
+        elif expected is None or value is None:
+            matched = op == "$eq" and value is expected
+        else:
+            try:
+                matched = MATCHERS[op](value, expected)
+            except TypeError:
+                matched = False
+        if not matched:
+            return False
+    return True
+
+def matches(query: Dict[str, Any], doc: Dict[str, Any]) -> bool:
+    """Evaluate a query built by compile_filter (plus keyword search) against one document"""
+    for name, condition in query.items():
+        if name == "$or":
+            if not any(matches(part, doc) for part in condition):
+                return False
+            continue
+        value = doc.get(name)
+        # A condition on a list field matches any element, as in MongoDB
+        values = value if isinstance(value, list) else [value]
+        if not any(_matches_value(condition, item) for item in values):
+            return False
+    return True
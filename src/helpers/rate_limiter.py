@@ -0,0 +1,175 @@
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from pymongo import ReturnDocument
+from typing import Dict, Optional, Tuple
+from src.config import settings
+from src.helpers.database import get_database
+from src.helpers.metrics import RATE_LIMITED
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_COLLECTION = "api_rate_limits"
+
+# Idle buckets are dropped from memory once there are this many clients
+MAX_MEMORY_BUCKETS = 10000
+
+class MemoryBucketStore:
+    """Token buckets of this process, keyed by client"""
+
+    def __init__(self):
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, key: str, cost: float, rate: float, burst: float) -> float:
+        """Spend ``cost`` tokens; returns 0 when allowed, else seconds until it would be"""
+        now = time.monotonic()
+        if len(self.buckets) >= MAX_MEMORY_BUCKETS:
+            self._prune(now, rate, burst)
+        tokens, updated = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= cost:
+            self.buckets[key] = (tokens - cost, now)
+            return 0.0
+        self.buckets[key] = (tokens, now)
+        return (cost - tokens) / rate
+
+    def _prune(self, now: float, rate: float, burst: float):
+        # A bucket idle long enough to have refilled holds nothing worth keeping
+        full_after = burst / rate
+        self.buckets = {
+            key: (tokens, updated) for key, (tokens, updated) in self.buckets.items()
+            if now - updated < full_after
+        }
+
+class MongoBucketStore:
+    """Token buckets shared by every API process through one document per client.
+
+    Refill and spend happen in a single pipeline update using the server's
+    clock, so concurrent requests from several processes cannot overspend.
+    """
+
+    async def take(self, key: str, cost: float, rate: float, burst: float) -> float:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        bucket = await get_database()[RATE_LIMIT_COLLECTION].find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "tokens": {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]},
+                    "updated_at": "$$NOW"
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]}}}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (cost - bucket["tokens"]) / rate
+
+def _route(path: str) -> Optional[str]:
+    """The data API route a path belongs to, or None outside the data API"""
+    parts = [part for part in path.split("/") if part]
+    if not parts or parts[0] != "data":
+        return None
+    if len(parts) == 1:
+        return "search"
+    if len(parts) == 2:
+        return "list"
+    if len(parts) == 3 and parts[2] == "changes":
+        return "changes"
+    return "document"
+
+def _int_param(request: Request, name: str, default: int) -> int:
+    value = request.query_params.get(name, "")
+    return int(value) if value.isdigit() else default
+
+def request_cost(route: str, request: Request) -> float:
+    """Tokens a request spends: global searches and deep pages cost more"""
+    if route == "search":
+        return settings.RATE_LIMIT_SEARCH_COST
+    if route == "list":
+        skip = (max(_int_param(request, "page", 1), 1) - 1) * _int_param(request, "limit", 20)
+        return 1 + skip // settings.RATE_LIMIT_SKIP_PER_TOKEN
+    return 1
+
+def address_key(request: Request) -> str:
+    return f"addr:{request.client.host if request.client else 'unknown'}"
+
+def client_key(request: Request) -> str:
+    """Requests are counted per integration and address, or per address when none is named.
+
+    ``user_id`` is only a query parameter, so it is never trusted alone: a
+    caller naming someone else's integration spends its own bucket, not theirs.
+    """
+    user_id = request.query_params.get("user_id")
+    if user_id:
+        return f"user:{user_id}@{address_key(request).removeprefix('addr:')}"
+    return address_key(request)
+
+def _too_many(route: str, reason: str, retry_after: float) -> JSONResponse:
+    RATE_LIMITED.inc(route=route, reason=reason)
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests" if reason == "rate" else "Too many concurrent requests"},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+class RateLimiter:
+    """Per-client token buckets and per-route concurrency caps for the data API.
+
+    Each client's bucket holds up to ``RATE_LIMIT_BURST`` tokens and refills at
+    ``RATE_LIMIT_RATE`` per second. Requests naming a ``user_id`` also spend
+    from their address's bucket (``RATE_LIMIT_ADDRESS_BURST`` and
+    ``RATE_LIMIT_ADDRESS_RATE``), so sending a different ``user_id`` each time
+    does not get an address more than that. Concurrency is capped per route and per
+    process by ``RATE_LIMIT_CONCURRENCY``. Requests over either limit get a 429
+    with ``Retry-After``.
+    """
+
+    def __init__(self):
+        mongo = settings.RATE_LIMIT_STORE == "mongo"
+        self.store = MongoBucketStore() if mongo else MemoryBucketStore()
+        # Address buckets refill at their own rate, so memory ones are pruned apart
+        self.address_store = self.store if mongo else MemoryBucketStore()
+        self.in_flight: Dict[str, int] = {}
+
+    async def _wait(self, request: Request, cost: float) -> float:
+        """Seconds until the request is allowed; 0 when both its buckets had the tokens"""
+        key = client_key(request)
+        wait = await self.store.take(key, min(cost, settings.RATE_LIMIT_BURST), settings.RATE_LIMIT_RATE, settings.RATE_LIMIT_BURST)
+        if wait > 0 or key == address_key(request):
+            return wait
+        return await self.address_store.take(
+            address_key(request), min(cost, settings.RATE_LIMIT_ADDRESS_BURST),
+            settings.RATE_LIMIT_ADDRESS_RATE, settings.RATE_LIMIT_ADDRESS_BURST
+        )
+
+    async def __call__(self, request: Request, call_next):
+        route = _route(request.url.path)
+        if route is None or not settings.RATE_LIMIT_ENABLED:
+            return await call_next(request)
+
+        try:
+            wait = await self._wait(request, request_cost(route, request))
+        except Exception as e:
+            # Better to serve unlimited than to fail every request with the store
+            logger.error(f"Rate limit store unavailable: {e}")
+            wait = 0.0
+        if wait > 0:
+            return _too_many(route, "rate", wait)
+
+        cap = settings.RATE_LIMIT_CONCURRENCY.get(route)
+        if cap is None:
+            return await call_next(request)
+        if self.in_flight.get(route, 0) >= cap:
+            return _too_many(route, "concurrency", 1)
+        self.in_flight[route] = self.in_flight.get(route, 0) + 1
+        try:
+            return await call_next(request)
+        finally:
+            self.in_flight[route] -= 1
+
+rate_limiter = RateLimiter()
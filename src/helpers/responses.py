@@ -0,0 +1,42 @@
+from bson import Decimal128, ObjectId
+from datetime import date, datetime
+from fastapi.responses import Response
+from typing import Any
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback
+    orjson = None
+
+def _bson_default(value: Any) -> Any:
+    """Encode the BSON types documents come back with from Motor"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        # orjson encodes these natively; only the stdlib path gets here
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """JSON-encode documents as read from MongoDB, without a ``jsonable_encoder`` pass"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_bson_default)
+    return json.dumps(
+        content, default=_bson_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+class BSONJSONResponse(Response):
+    """JSON response for raw MongoDB documents.
+
+    Returning a response from an endpoint skips FastAPI's ``jsonable_encoder``,
+    which walks every nested value. ObjectIds and datetimes are encoded
+    directly instead, with orjson when it is installed.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,198 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+from src.config import settings
+from src.helpers.archiver import file_schema
+from src.helpers.bucket_storage import BUCKETS
+from src.helpers.content_store import CONTENT_FIELDS, ContentStore
+from src.helpers.metrics import SNAPSHOT_ROWS
+import asyncio
+import logging
+import os
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Snapshots are optional
+    pa = None
+
+SNAPSHOT_COLLECTION = "github_snapshots"
+
+# Field an incremental snapshot continues from. Commits and changelog events
+# never change once written, so the time they were made is enough.
+SNAPSHOT_CURSOR_FIELDS = {
+    "github_organizations": "updated_at",
+    "github_repos": "updated_at",
+    "github_commits": "committer_date",
+    "github_pulls": "updated_at",
+    "github_issues": "updated_at",
+    "github_changelogs": "created_at",
+    "github_users": "updated_at"
+}
+
+def snapshot_schema(collection: str):
+    """Columns of a snapshot file: the archive columns plus the owning tenant"""
+    return pa.schema([pa.field("tenant_id", pa.int64())] + list(file_schema(collection)))
+
+def snapshot_path(tenant_id: int, collection: str, snapshot_id: ObjectId) -> str:
+    return os.path.join(settings.SNAPSHOT_PATH, f"tenant_id={tenant_id}", collection, f"{snapshot_id}.parquet")
+
+def delete_snapshot_files(tenant_id: int):
+    shutil.rmtree(os.path.join(settings.SNAPSHOT_PATH, f"tenant_id={tenant_id}"), ignore_errors=True)
+
+class SnapshotWriter:
+    """Streams one tenant's collection from MongoDB into a Parquet file.
+
+    Documents are read ``SNAPSHOT_BATCH_SIZE`` at a time and each batch is
+    written as its own row group, so memory stays bounded by the batch size
+    whatever the size of the collection. The file is written under a
+    temporary name and only renamed once complete.
+    """
+
+    def __init__(self, db, snapshot: Dict[str, Any]):
+        self.db = db
+        self.snapshot = snapshot
+        self.collection = snapshot["collection"]
+        self.cursor_field = SNAPSHOT_CURSOR_FIELDS[self.collection]
+        self.schema = snapshot_schema(self.collection)
+        self.rows = 0
+        self.watermark: Optional[datetime] = None
+
+    def query(self) -> Dict[str, Any]:
+        query = dict(self.snapshot.get("query") or {})
+        if self.snapshot.get("since") is not None:
+            # $gte: documents sharing the previous watermark may have landed after it was taken
+            query[self.cursor_field] = {"$gte": self.snapshot["since"]}
+        query["tenant_id"] = self.snapshot["tenant_id"]
+        return query
+
+    def _cursor(self):
+        batch_size = settings.SNAPSHOT_BATCH_SIZE
+        if self.collection in BUCKETS:
+            return BUCKETS[self.collection].stream(self.db, self.query(), batch_size)
+        return self.db[self.collection].find(self.query()).batch_size(batch_size)
+
+    async def _batches(self):
+        batch = []
+        async for doc in self._cursor():
+            batch.append(doc)
+            if len(batch) >= settings.SNAPSHOT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _table(self, docs: List[Dict[str, Any]]):
+        return pa.Table.from_pylist([{name: doc.get(name) for name in self.schema.names} for doc in docs], schema=self.schema)
+
+    async def write(self) -> Dict[str, Any]:
+        path = snapshot_path(self.snapshot["tenant_id"], self.collection, self.snapshot["_id"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        writer = pq.ParquetWriter(path + ".tmp", self.schema, compression=settings.SNAPSHOT_COMPRESSION)
+        try:
+            async for docs in self._batches():
+                if self.collection in CONTENT_FIELDS:
+                    await ContentStore.hydrate(self.db, self.collection, docs)
+                await asyncio.to_thread(writer.write_table, self._table(docs))
+                self.rows += len(docs)
+                SNAPSHOT_ROWS.inc(len(docs), collection=self.collection)
+                times = [doc[self.cursor_field] for doc in docs if doc.get(self.cursor_field)]
+                if times:
+                    self.watermark = max([self.watermark, *times]) if self.watermark else max(times)
+        except BaseException:
+            writer.close()
+            os.remove(path + ".tmp")
+            raise
+        writer.close()
+        os.replace(path + ".tmp", path)
+        return {
+            "path": os.path.relpath(path, settings.SNAPSHOT_PATH),
+            "rows": self.rows,
+            "bytes": os.path.getsize(path),
+            # An empty incremental snapshot carries the previous watermark forward
+            "watermark": self.watermark or self.snapshot.get("since")
+        }
+
+class _Chunks:
+    """Write target for the Arrow IPC writer that hands back what was written since the last take"""
+
+    closed = False
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+def arrow_stream(path: str):
+    """Re-encode a snapshot file as an Arrow IPC stream, one row group at a time"""
+    parquet = pq.ParquetFile(path)
+    chunks = _Chunks()
+    with pa.ipc.new_stream(chunks, parquet.schema_arrow) as writer:
+        for batch in parquet.iter_batches(batch_size=settings.SNAPSHOT_BATCH_SIZE):
+            writer.write_batch(batch)
+            yield chunks.take()
+    yield chunks.take()
+
+async def previous_watermark(db, tenant_id: int, collection: str, filter_params: Optional[str]) -> Optional[datetime]:
+    """Watermark of the last completed snapshot taken with the same filter"""
+    previous = await db[SNAPSHOT_COLLECTION].find_one(
+        {"tenant_id": tenant_id, "collection": collection, "filter": filter_params, "status": "complete"},
+        {"watermark": 1},
+        sort=[("started_at", -1)]
+    )
+    return previous.get("watermark") if previous else None
+
+# Running snapshots by id; holding the task keeps it from being garbage collected
+_snapshots: Dict[ObjectId, asyncio.Task] = {}
+_slots: Optional[asyncio.Semaphore] = None
+
+def start_snapshot(db, snapshot: Dict[str, Any]):
+    """Write a snapshot already recorded as pending in the background"""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.SNAPSHOT_CONCURRENCY)
+    _snapshots[snapshot["_id"]] = asyncio.create_task(_run_snapshot(db, snapshot))
+
+async def _run_snapshot(db, snapshot: Dict[str, Any]):
+    coll = db[SNAPSHOT_COLLECTION]
+    try:
+        async with _slots:
+            await coll.update_one({"_id": snapshot["_id"]}, {"$set": {"status": "running"}})
+            started = time.perf_counter()
+            written = await SnapshotWriter(db, snapshot).write()
+            await coll.update_one(
+                {"_id": snapshot["_id"]},
+                {"$set": {"status": "complete", "completed_at": datetime.utcnow(), **written}}
+            )
+            logger.info(
+                f"Snapshot {snapshot['_id']} of {snapshot['collection']} for {snapshot['tenant_id']}: "
+                f"{written['rows']} rows in {time.perf_counter() - started:.1f}s"
+            )
+    except asyncio.CancelledError:
+        await coll.update_one({"_id": snapshot["_id"]}, {"$set": {"status": "failed", "error": "Interrupted by shutdown"}})
+        raise
+    except Exception as e:
+        logger.error(f"Error writing snapshot {snapshot['_id']}: {e}")
+        await coll.update_one({"_id": snapshot["_id"]}, {"$set": {"status": "failed", "error": str(e)}})
+    finally:
+        _snapshots.pop(snapshot["_id"], None)
+
+async def stop_snapshots():
+    """Cancel running snapshots at shutdown; they are marked failed and can be requested again"""
+    tasks = list(_snapshots.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
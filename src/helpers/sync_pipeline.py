@@ -0,0 +1,433 @@
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from pymongo import DeleteMany, UpdateOne
+from src.config import settings
+from src.helpers.archiver import active_policies
+from src.helpers.bucket_storage import BUCKETS
+from src.helpers.change_detector import ChangeDetector, HASH_KEYS
+from src.helpers.content_store import CONTENT_COLLECTION, CONTENT_FIELDS, content_store
+from src.helpers.event_bus import SyncProgress
+from src.helpers.metrics import MONGO_BATCH_SIZE, MONGO_OPERATION_SECONDS, SYNC_DOCUMENTS, SYNC_QUEUE_DEPTH, timed
+from src.helpers.sync_profiler import SyncProfiler
+from src.helpers.transformers import MAPPINGS
+from src.helpers.user_directory import USERS_COLLECTION, IdentityCache
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class SyncStopped(Exception):
+    """The integration being synced was removed while the sync ran"""
+
+# Pipelines running in this process by tenant, so a removal can stop them first
+_running: Dict[int, Set["SyncPipeline"]] = {}
+
+async def stop_syncs(tenant_id: int):
+    """Stop this process's syncs of a tenant and wait until none of them can write"""
+    pipelines = list(_running.get(tenant_id, ()))
+    for pipeline in pipelines:
+        pipeline.stop()
+    await asyncio.gather(*(pipeline.closed.wait() for pipeline in pipelines))
+
+class RawPage:
+    """A page of GitHub API items waiting to be turned into documents"""
+
+    __slots__ = ("collection", "items", "transform", "context", "extra_update", "known_hashes")
+
+    def __init__(
+        self,
+        collection: str,
+        items: List[Dict[str, Any]],
+        transform: Callable,
+        context: Dict[str, Any],
+        extra_update: Optional[Dict[str, Any]] = None,
+        known_hashes: Optional[Dict[Any, Optional[str]]] = None
+    ):
+        self.collection = collection
+        self.items = items
+        self.transform = transform
+        self.context = context
+        self.extra_update = extra_update
+        self.known_hashes = known_hashes
+
+class PipelineStage:
+    """A pool of workers draining one bounded queue.
+
+    ``put`` blocks while the queue is full, which is what propagates
+    backpressure from slow stages back to the GitHub fetchers.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[None]], workers: int, queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.workers = max(workers, 1)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.tasks: List[asyncio.Task] = []
+        self.processed = 0
+        self.errors = 0
+        self.peak_depth = 0
+        self.busy_seconds = 0.0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def put(self, item: Any):
+        await self.queue.put(item)
+        depth = self.queue.qsize()
+        self.peak_depth = max(self.peak_depth, depth)
+        SYNC_QUEUE_DEPTH.set(depth, stage=self.name)
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                if item is _STOP:
+                    return
+                started = time.monotonic()
+                await self.handler(item)
+                self.busy_seconds += time.monotonic() - started
+                self.processed += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error in {self.name} stage: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def close(self):
+        """Let queued work finish, then stop the workers"""
+        for _ in self.tasks:
+            await self.queue.put(_STOP)
+        await asyncio.gather(*self.tasks)
+        self.stopped_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = (self.stopped_at or time.monotonic()) - (self.started_at or time.monotonic())
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "peak_queue_depth": self.peak_depth,
+            "queue_size": self.queue.maxsize,
+            "processed": self.processed,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "throughput_per_sec": round(self.processed / elapsed, 2) if elapsed > 0 else 0.0
+        }
+
+class SyncPipeline:
+    """Fetch -> detail fetch -> transform -> batch write, connected by bounded queues.
+
+    ``submit`` schedules a fetch job: an async generator yielding ``RawPage``s.
+    Jobs may hand follow-up requests (e.g. per-issue events) to the detail
+    stage, which never schedules further work, so bounded queues cannot
+    deadlock.
+    """
+
+    def __init__(
+        self,
+        db,
+        fetch_workers: int = settings.SYNC_FETCH_WORKERS,
+        detail_workers: int = settings.SYNC_DETAIL_WORKERS,
+        transform_workers: int = settings.SYNC_TRANSFORM_WORKERS,
+        write_workers: int = settings.SYNC_WRITE_WORKERS,
+        queue_size: int = settings.SYNC_QUEUE_SIZE,
+        batch_size: int = settings.SYNC_WRITE_BATCH_SIZE,
+        validate: bool = settings.SYNC_VALIDATE_DOCUMENTS,
+        detect_changes: bool = settings.SYNC_CHANGE_DETECTION,
+        delete_stale: bool = settings.SYNC_DELETE_STALE,
+        profiler: Optional[SyncProfiler] = None,
+        progress: Optional[SyncProgress] = None,
+        identities: Optional[IdentityCache] = None,
+        tenant_id: Optional[int] = None
+    ):
+        self.db = db
+        # With a tenant, writes stop once its integration is no longer active
+        self.tenant_id = tenant_id
+        self.stopped = False
+        self.closed = asyncio.Event()
+        self.batch_size = batch_size
+        self.validate = validate
+        self.changes = ChangeDetector(db) if detect_changes else None
+        self.stale_deletes = delete_stale
+        self.profiler = profiler
+        self.progress = progress
+        self.identities = identities
+        self.buffers: Dict[str, List[Any]] = {}
+        # Repository each buffered operation came from, kept only while profiling
+        self.sources: Dict[str, List[Optional[str]]] = {}
+        self.documents_written = 0
+        self.documents_deleted = 0
+        self.write_batches = 0
+        self.deferred: List[Callable[[], Awaitable[Any]]] = []
+        # Items past their retention age belong in the archive; syncing them would bring archived documents back
+        self.retention = {collection: (policy, policy.boundary()) for collection, policy in active_policies().items()}
+        self.fetch = PipelineStage("fetch", self._run_job, fetch_workers, queue_size)
+        self.detail = PipelineStage("detail", self._run_job, detail_workers, queue_size)
+        self.transform = PipelineStage("transform", self._transform_page, transform_workers, queue_size)
+        self.write = PipelineStage("write", self._write_ops, write_workers, queue_size)
+        self.stages = [self.fetch, self.detail, self.transform, self.write]
+
+    def start(self):
+        if self.tenant_id is not None:
+            _running.setdefault(self.tenant_id, set()).add(self)
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        """Drop queued and further work, and write nothing more"""
+        self.stopped = True
+
+    async def _active(self) -> bool:
+        """Whether writes may go ahead; checked before each one, as a removal may start at any time"""
+        if self.stopped:
+            return False
+        if self.tenant_id is None:
+            return True
+        integration = await self.db.github_integration.find_one(
+            {"github_user_id": self.tenant_id, "integration_status": "active"}, {"_id": 1}
+        )
+        if integration is None:
+            logger.warning(f"Integration {self.tenant_id} is no longer active; stopping its sync")
+            self.stopped = True
+        return not self.stopped
+
+    async def submit(self, job: Callable[[], Any]):
+        """Queue a fetch job (a callable returning an async iterator of pages)"""
+        if self.stopped:
+            raise SyncStopped()
+        await self.fetch.put(job)
+
+    async def submit_detail(self, job: Callable[[], Any]):
+        """Queue a follow-up fetch job from inside a fetch job"""
+        await self.detail.put(job)
+
+    async def emit(self, page: RawPage):
+        """Hand a fetched page straight to the transform stage"""
+        if page.items:
+            await self.transform.put(page)
+
+    async def queue_writes(self, collection: str, ops: List[Any], repository: Optional[str] = None):
+        """Queue writes built outside the transform stage; they are batched with its upserts"""
+        if ops:
+            await self.write.put((collection, ops, repository))
+
+    def since(self, collection: str) -> Optional[datetime]:
+        """How far back a listing of ``collection`` needs to go, or None for its full history.
+
+        Policies limited to some states keep older items in other states, so
+        they do not bound listings.
+        """
+        policy, boundary = self.retention.get(collection, (None, None))
+        if policy is None or policy.states:
+            return None
+        return boundary
+
+    def defer(self, task: Callable[[], Awaitable[Any]]):
+        """Run ``task`` after the pipeline has drained, for work that reads what the sync wrote"""
+        self.deferred.append(task)
+
+    async def _run_job(self, job: Callable[[], Any]):
+        if self.stopped:
+            return
+        pages = job()
+        try:
+            async for page in pages:
+                if self.stopped:
+                    break
+                await self.emit(page)
+        finally:
+            await pages.aclose()
+
+    async def _transform_page(self, page: RawPage):
+        if self.stopped:
+            return
+        started = time.perf_counter()
+        keys = UPSERT_KEYS[page.collection]
+        transform, context = page.transform, page.context
+        if self.identities is not None:
+            self.identities.observe(page.collection, page.items)
+            if page.collection == USERS_COLLECTION:
+                # Written once, by the user directory, when the pipeline closes
+                return
+        docs = [doc for doc in (transform(item, context) for item in page.items) if doc is not None]
+        if self.identities is not None:
+            # Before change detection, so the stored hash covers the attribution
+            self.identities.resolve(page.collection, docs)
+        retention = self.retention.get(page.collection)
+        if retention is not None and docs:
+            policy, boundary = retention
+            kept = [doc for doc in docs if not policy.expired(doc, boundary)]
+            if len(kept) < len(docs):
+                SYNC_DOCUMENTS.inc(len(docs) - len(kept), collection=page.collection, outcome="expired")
+            docs = kept
+        if self.validate and docs:
+            docs = MAPPINGS[page.collection].validate(docs)
+        skipped = 0
+        if page.known_hashes is not None and self.changes is not None:
+            checked = len(docs)
+            docs = self.changes.filter(page.collection, docs, page.known_hashes)
+            skipped = checked - len(docs)
+            if skipped:
+                SYNC_DOCUMENTS.inc(skipped, collection=page.collection, outcome="skipped")
+
+        content_ops = []
+        if content_store is not None and docs:
+            content_ops = content_store.split(page.collection, docs)
+
+        ops = []
+        buckets = BUCKETS.get(page.collection)
+        if buckets is not None:
+            ops = buckets.upserts(docs)
+        else:
+            for doc in docs:
+                update = {"$set": doc}
+                if page.extra_update:
+                    update.update(page.extra_update)
+                ops.append(UpdateOne({key: doc[key] for key in keys}, update, upsert=True))
+        repository = page.context.get("repository_name")
+        if self.profiler is not None:
+            self.profiler.record_transform(repository, page.collection, len(page.items), time.perf_counter() - started, skipped)
+        if content_ops:
+            await self.write.put((CONTENT_COLLECTION, content_ops, repository))
+        if ops:
+            await self.write.put((page.collection, ops, repository))
+            # Yield between pages so fetchers are not starved by CPU-heavy transforms
+            await asyncio.sleep(0)
+
+    async def delete_stale(self, collection: str, tenant_id: int, repository_id: int, keys: List[Any], repository: Optional[str] = None):
+        """Queue deletes for documents GitHub no longer returns, when stale deletes are on"""
+        if not self.stale_deletes:
+            return
+        key = HASH_KEYS[collection]
+        for start in range(0, len(keys), self.batch_size):
+            chunk = keys[start:start + self.batch_size]
+            if collection in BUCKETS:
+                stale = BUCKETS[collection].delete(tenant_id, repository_id, chunk)
+            else:
+                stale = [DeleteMany({"tenant_id": tenant_id, "repository_id": repository_id, key: {"$in": chunk}})]
+            await self.write.put((collection, stale, repository))
+            if content_store is not None and collection in CONTENT_FIELDS:
+                await self.write.put((CONTENT_COLLECTION, [content_store.delete(collection, tenant_id, repository_id, chunk)], repository))
+        self.documents_deleted += len(keys)
+        if keys:
+            SYNC_DOCUMENTS.inc(len(keys), collection=collection, outcome="deleted")
+
+    def delete_unlisted(self, tenant_id: int, repository_ids: Set[int], organization_logins: List[str]):
+        """Remove the repositories and organizations complete listings no longer return, when stale deletes are on.
+
+        A removed repository's commits, pull requests, issues, events and full
+        text go with it. This runs once the pipeline is drained.
+        """
+        if not self.stale_deletes:
+            return
+
+        async def delete():
+            cursor = self.db.github_repos.find(
+                {"tenant_id": tenant_id, "github_id": {"$nin": list(repository_ids)}}, {"_id": 0, "github_id": 1}
+            )
+            removed = [repo["github_id"] async for repo in cursor]
+            for start in range(0, len(removed), self.batch_size):
+                chunk = removed[start:start + self.batch_size]
+                for collection in HASH_KEYS:
+                    storage = BUCKETS.get(collection)
+                    if storage is not None:
+                        ops = storage.delete_repositories(tenant_id, chunk)
+                    else:
+                        ops = [DeleteMany({"tenant_id": tenant_id, "repository_id": {"$in": chunk}})]
+                    result = await self.db[storage.name if storage is not None else collection].bulk_write(ops, ordered=False)
+                    self.documents_deleted += result.deleted_count
+                await self.db[CONTENT_COLLECTION].delete_many({"tenant_id": tenant_id, "repository_id": {"$in": chunk}})
+                result = await self.db.github_repos.delete_many({"tenant_id": tenant_id, "github_id": {"$in": chunk}})
+                self.documents_deleted += result.deleted_count
+            result = await self.db.github_organizations.delete_many({"tenant_id": tenant_id, "login": {"$nin": organization_logins}})
+            self.documents_deleted += result.deleted_count
+            if removed:
+                logger.info(f"Removed {len(removed)} repositories of user {tenant_id} that GitHub no longer lists")
+
+        self.defer(delete)
+
+    async def _write_ops(self, batch: Tuple[str, List[Any], Optional[str]]):
+        collection, ops, repository = batch
+        buffer = self.buffers.setdefault(collection, [])
+        buffer.extend(ops)
+        if self.profiler is not None:
+            self.sources.setdefault(collection, []).extend([repository] * len(ops))
+        if len(buffer) >= self.batch_size:
+            self.buffers[collection] = []
+            await self._flush(collection, buffer, self.sources.pop(collection, None))
+
+    async def _flush(self, collection: str, ops: List[Any], sources: Optional[List[Optional[str]]] = None):
+        if not ops or not await self._active():
+            return
+        started = time.perf_counter()
+        target = BUCKETS[collection].name if collection in BUCKETS else collection
+        ordered = getattr(BUCKETS.get(collection), "ordered", False)
+        with timed(MONGO_OPERATION_SECONDS, "mongo.bulk_write", collection=collection, operation="bulk_write"):
+            await self.db[target].bulk_write(ops, ordered=ordered)
+        if self.profiler is not None and sources:
+            self.profiler.record_write(collection, sources, time.perf_counter() - started)
+        MONGO_BATCH_SIZE.observe(len(ops), collection=collection)
+        # A bucket update writes several documents
+        written = sum(getattr(op, "documents", 1) for op in ops if isinstance(op, UpdateOne))
+        SYNC_DOCUMENTS.inc(written, collection=collection, outcome="written")
+        self.documents_written += written
+        self.write_batches += 1
+        if self.progress is not None and written:
+            self.progress.emit("documents_written", collection=collection, count=written, total=self.documents_written)
+
+    async def close(self):
+        """Drain every stage in order and flush partially filled batches"""
+        try:
+            for stage in self.stages:
+                await stage.close()
+            for collection in list(self.buffers):
+                ops = self.buffers.pop(collection)
+                try:
+                    await self._flush(collection, ops, self.sources.pop(collection, None))
+                except Exception as e:
+                    logger.error(f"Error flushing {collection} batch: {e}")
+            if self.identities is not None and await self._active():
+                try:
+                    await self.identities.flush(self.db)
+                except Exception as e:
+                    logger.error(f"Error writing the user directory: {e}")
+            for task in self.deferred:
+                if not await self._active():
+                    break
+                try:
+                    await task()
+                except Exception as e:
+                    logger.error(f"Error in deferred sync task: {e}")
+            self.deferred = []
+        finally:
+            if self.tenant_id is not None:
+                _running.get(self.tenant_id, set()).discard(self)
+                if not _running.get(self.tenant_id):
+                    _running.pop(self.tenant_id, None)
+            self.closed.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stages": {stage.name: stage.stats() for stage in self.stages},
+            "documents_written": self.documents_written,
+            "documents_deleted": self.documents_deleted,
+            "write_batches": self.write_batches,
+            "change_detection": self.changes.stats() if self.changes is not None else None,
+            "user_directory": self.identities.stats() if self.identities is not None else None
+        }
+
+# Fields that identify a document for upserts; every tenant keeps its own copy
+UPSERT_KEYS = {
+    "github_organizations": ("tenant_id", "github_id"),
+    "github_repos": ("tenant_id", "github_id"),
+    "github_commits": ("tenant_id", "sha", "repository_id"),
+    "github_pulls": ("tenant_id", "github_id"),
+    "github_issues": ("tenant_id", "github_id"),
+    "github_changelogs": ("tenant_id", "github_id"),
+    "github_users": ("tenant_id", "github_id")
+}
@@ -0,0 +1,222 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from src.config import settings
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Collection each GitHubClient method feeds
+METHOD_COLLECTIONS = {
+    "get_user": "github_users",
+    "get_organizations": "github_organizations",
+    "get_organization_members": "github_users",
+    "get_user_repos": "github_repos",
+    "get_organization_repos": "github_repos",
+    # Fork parents, for shared commit storage
+    "get_repository": "github_repos",
+    "get_repository_commits": "github_commits",
+    # Fork divergence from the parent
+    "compare_commits": "github_commits",
+    "get_repository_pulls": "github_pulls",
+    "get_repository_issues": "github_issues",
+    "get_issue_events": "github_changelogs",
+    # The scheduler's budget check feeds no collection
+    "get_rate_limit": "(rate limit)"
+}
+
+# Label for requests and documents that belong to no single repository
+ACCOUNT = "(account)"
+
+class ResourceProfile:
+    """Time and volume for one resource (collection) of one repository"""
+
+    __slots__ = (
+        "requests", "retries", "http_seconds", "token_wait_seconds", "pages", "documents",
+        "transform_seconds", "skipped", "write_ops", "write_seconds"
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.http_seconds = 0.0
+        self.token_wait_seconds = 0.0
+        self.pages = 0
+        self.documents = 0
+        self.transform_seconds = 0.0
+        self.skipped = 0
+        self.write_ops = 0
+        self.write_seconds = 0.0
+
+    @property
+    def total_seconds(self) -> float:
+        return self.http_seconds + self.token_wait_seconds + self.transform_seconds + self.write_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        doc = {name: getattr(self, name) for name in self.__slots__}
+        for name, value in doc.items():
+            if isinstance(value, float):
+                doc[name] = round(value, 4)
+        doc["total_seconds"] = round(self.total_seconds, 4)
+        return doc
+
+    def add(self, other: "ResourceProfile"):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+class StackSampler:
+    """Samples the event loop thread's Python stack on a background thread.
+
+    Cheap enough to leave on for a whole sync at the default 5ms interval,
+    and needs no profiler dependency.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: Dict[str, int] = {}
+        self.total_counts: Dict[str, int] = {}
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sync-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    @staticmethod
+    def _label(frame) -> str:
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            self.samples += 1
+            leaf = self._label(frame)
+            self.self_counts[leaf] = self.self_counts.get(leaf, 0) + 1
+            seen = set()
+            while frame is not None:
+                label = self._label(frame)
+                if label not in seen:
+                    seen.add(label)
+                    self.total_counts[label] = self.total_counts.get(label, 0) + 1
+                frame = frame.f_back
+
+    def report(self, top: int = 30) -> Dict[str, Any]:
+        def ranked(counts: Dict[str, int]) -> List[Dict[str, Any]]:
+            return [
+                {"function": label, "samples": count, "share": round(count / self.samples, 4)}
+                for label, count in sorted(counts.items(), key=lambda item: -item[1])[:top]
+            ]
+        return {
+            "interval_seconds": self.interval,
+            "samples": self.samples,
+            "self": ranked(self.self_counts) if self.samples else [],
+            "cumulative": ranked(self.total_counts) if self.samples else []
+        }
+
+class SyncProfiler:
+    """Per-repository, per-resource breakdown of where a sync spends its time"""
+
+    def __init__(self, user_id: int, cpu_profile: bool = False):
+        self.user_id = user_id
+        self.resources: Dict[Tuple[str, str], ResourceProfile] = {}
+        self.sampler = StackSampler(settings.SYNC_PROFILE_CPU_INTERVAL) if cpu_profile else None
+        self.started_at: Optional[datetime] = None
+        self._started = 0.0
+        self.duration = 0.0
+
+    def start(self):
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+        if self.sampler is not None:
+            self.sampler.start()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self._started
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def _resource(self, repository: Optional[str], collection: str) -> ResourceProfile:
+        key = (repository or ACCOUNT, collection)
+        profile = self.resources.get(key)
+        if profile is None:
+            profile = self.resources[key] = ResourceProfile()
+        return profile
+
+    def record_request(self, repository: Optional[str], method: str, seconds: float, token_wait: float = 0.0, retried: bool = False):
+        profile = self._resource(repository, METHOD_COLLECTIONS.get(method, method))
+        profile.requests += 1
+        profile.http_seconds += seconds
+        profile.token_wait_seconds += token_wait
+        if retried:
+            profile.retries += 1
+
+    def record_transform(self, repository: Optional[str], collection: str, items: int, seconds: float, skipped: int):
+        profile = self._resource(repository, collection)
+        profile.pages += 1
+        profile.documents += items
+        profile.transform_seconds += seconds
+        profile.skipped += skipped
+
+    def record_write(self, collection: str, repositories: List[Optional[str]], seconds: float):
+        """Split one bulk write's time across the repositories its operations came from"""
+        if not repositories:
+            return
+        counts: Dict[Optional[str], int] = {}
+        for repository in repositories:
+            counts[repository] = counts.get(repository, 0) + 1
+        for repository, count in counts.items():
+            profile = self._resource(repository, collection)
+            profile.write_ops += count
+            profile.write_seconds += seconds * count / len(repositories)
+
+    def report(self, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """The sync-report document stored in ``github_sync_reports``"""
+        repositories: Dict[str, Dict[str, ResourceProfile]] = {}
+        for (repository, collection), profile in self.resources.items():
+            repositories.setdefault(repository, {})[collection] = profile
+
+        totals = ResourceProfile()
+        ranked = []
+        for repository, resources in repositories.items():
+            combined = ResourceProfile()
+            for profile in resources.values():
+                combined.add(profile)
+            totals.add(combined)
+            ranked.append((combined.total_seconds, repository, combined, resources))
+        ranked.sort(key=lambda item: -item[0])
+
+        # Keep the report well under MongoDB's document size limit for huge organizations
+        limit = settings.SYNC_PROFILE_MAX_REPOSITORIES
+        others = ResourceProfile()
+        for _, _, combined, _ in ranked[limit:]:
+            others.add(combined)
+
+        return {
+            "tenant_id": self.user_id,
+            "started_at": self.started_at,
+            "finished_at": datetime.utcnow(),
+            "duration_seconds": round(self.duration, 3),
+            "totals": totals.to_dict(),
+            "repositories": [
+                {
+                    "repository": repository,
+                    **combined.to_dict(),
+                    "resources": {collection: profile.to_dict() for collection, profile in resources.items()}
+                }
+                for _, repository, combined, resources in ranked[:limit]
+            ],
+            "other_repositories": {"count": max(len(ranked) - limit, 0), **others.to_dict()},
+            "sync_stats": stats,
+            "cpu_profile": self.sampler.report() if self.sampler is not None else None
+        }
@@ -0,0 +1,220 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from pymongo import UpdateOne
+from src.config import settings
+from src.controllers.sync_controller import SyncController
+from src.helpers.github_client import GitHubClient
+from src.helpers.transformers import parse_timestamp
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_COLLECTION = "github_sync_schedule"
+
+# Weight of the latest observation in a repository's change rate
+RATE_ALPHA = 0.3
+
+class RepositorySchedule:
+    """When one repository of an integration is due for its next sync.
+
+    ``change_rate`` is a moving average of how often the repository had
+    changed when it was synced, from 0 (never) to 1 (every time). Busy
+    repositories are polled every ``SCHEDULER_MIN_INTERVAL`` seconds and the
+    interval stretches towards ``SCHEDULER_MAX_INTERVAL`` as they go quiet.
+    """
+
+    def __init__(self, state: Optional[Dict[str, Any]]):
+        state = state or {}
+        self.pushed_at = state.get("pushed_at")
+        self.updated_at = state.get("updated_at")
+        self.last_synced_at: Optional[datetime] = state.get("last_synced_at")
+        self.change_rate: float = state.get("change_rate", 1.0)
+        self.cost: int = state.get("cost", settings.SCHEDULER_DEFAULT_REPO_COST)
+        self.known = bool(state)
+
+    @property
+    def interval(self) -> timedelta:
+        low, high = settings.SCHEDULER_MIN_INTERVAL, settings.SCHEDULER_MAX_INTERVAL
+        return timedelta(seconds=low + (high - low) * (1 - self.change_rate))
+
+    def touched(self, repo_data: Dict[str, Any]) -> bool:
+        """Whether the listing shows a push or an update since the last sync"""
+        return repo_data.get("pushed_at") != self.pushed_at or repo_data.get("updated_at") != self.updated_at
+
+    def due(self, repo_data: Dict[str, Any], now: datetime) -> bool:
+        if not self.known:
+            return True
+        elapsed = now - self.last_synced_at
+        if self.touched(repo_data):
+            return elapsed >= self.interval
+        # Issue and pull request activity does not always move the repository's
+        # timestamps, so even untouched repositories are polled now and then
+        return elapsed >= timedelta(seconds=settings.SCHEDULER_MAX_INTERVAL)
+
+    def priority(self, now: datetime) -> tuple:
+        """Sort key: repositories never synced first, then the busiest and most overdue"""
+        if not self.known:
+            return (1, 0.0, 0.0)
+        overdue = (now - self.last_synced_at).total_seconds() / max(self.interval.total_seconds(), 1)
+        return (0, self.change_rate, overdue)
+
+    def synced(self, repo_data: Dict[str, Any], now: datetime, requests: Optional[int]) -> Dict[str, Any]:
+        changed = 1.0 if self.touched(repo_data) else 0.0
+        change_rate = RATE_ALPHA * changed + (1 - RATE_ALPHA) * self.change_rate if self.known else changed
+        return {
+            "full_name": repo_data["full_name"],
+            "pushed_at": repo_data.get("pushed_at"),
+            "updated_at": repo_data.get("updated_at"),
+            "last_synced_at": now,
+            "change_rate": round(change_rate, 4),
+            "cost": requests or self.cost
+        }
+
+def _resource(repo_data: Dict[str, Any]) -> str:
+    # The name repository requests are counted under by the client
+    return f"{repo_data['owner']['login']}/{repo_data['name']}"
+
+def _unchanged_since(repo_data: Dict[str, Any], last_sync: Optional[datetime]) -> bool:
+    """Whether a full sync at ``last_sync`` already saw the repository as it is now"""
+    if last_sync is None:
+        return False
+    times = [repo_data.get("pushed_at"), repo_data.get("updated_at")]
+    return all(value and parse_timestamp(value).replace(tzinfo=None) <= last_sync for value in times)
+
+class SyncScheduler:
+    """Periodically syncs the repositories of active integrations that changed.
+
+    Every run lists each integration's repositories, which costs one request
+    per hundred repositories. Repositories whose ``pushed_at`` and
+    ``updated_at`` have not moved are skipped. The due ones are synced in
+    priority order until the run's share of the rate limit is spent; the
+    rest wait for the next run.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.sync_controller = SyncController()
+
+    async def run_once(self):
+        cursor = self.db.github_integration.find({"integration_status": "active"})
+        async for integration in cursor:
+            try:
+                await self.run_integration(integration)
+            except Exception as e:
+                logger.error(f"Error in scheduled sync for user {integration['github_user_id']}: {e}")
+
+    def budget(self, rate: Dict[str, Any], spent: int) -> int:
+        """Requests this run may still make with the integration's token"""
+        per_run = rate["limit"] * settings.SCHEDULER_RATE_SHARE * settings.SCHEDULER_INTERVAL / 3600
+        return int(min(per_run - spent, rate["remaining"] - settings.TOKEN_POOL_MIN_REMAINING))
+
+    async def run_integration(self, integration: Dict[str, Any]) -> Dict[str, Any]:
+        user_id = integration["github_user_id"]
+        now = datetime.utcnow()
+        schedules = {
+            state["repository_id"]: RepositorySchedule(state)
+            async for state in self.db[SCHEDULE_COLLECTION].find({"tenant_id": user_id})
+        }
+        members_synced_at = integration.get("members_synced_at") or integration.get("last_sync")
+        refresh_members = members_synced_at is None or now - members_synced_at >= timedelta(seconds=settings.SCHEDULER_MAX_INTERVAL)
+        summary = {"listed": 0, "untouched": 0, "due": 0, "synced": 0, "deferred": 0}
+        chosen: List[Dict[str, Any]] = []
+        baseline: List[Dict[str, Any]] = []
+
+        async def select(repos: List[dict], github_client: GitHubClient) -> List[dict]:
+            summary["listed"] = len(repos)
+            due = []
+            for repo_data in repos:
+                schedule = schedules.setdefault(repo_data["id"], RepositorySchedule(None))
+                if not schedule.known and _unchanged_since(repo_data, integration.get("last_sync")):
+                    # Already covered by the last full sync; start tracking it from here
+                    baseline.append(repo_data)
+                elif schedule.due(repo_data, now):
+                    due.append(repo_data)
+                elif not schedule.touched(repo_data):
+                    summary["untouched"] += 1
+            due.sort(key=lambda repo_data: schedules[repo_data["id"]].priority(now), reverse=True)
+            summary["due"] = len(due)
+
+            budget = self.budget(await github_client.get_rate_limit(), sum(github_client.requests.values()))
+            for repo_data in due:
+                cost = schedules[repo_data["id"]].cost
+                if cost > budget and (chosen or budget <= 0):
+                    continue
+                chosen.append(repo_data)
+                budget -= cost
+            summary["synced"] = len(chosen)
+            summary["deferred"] = len(due) - len(chosen)
+            return chosen
+
+        stats = await self.sync_controller.sync_repositories(
+            user_id, integration["access_token"], select, refresh_members=refresh_members
+        )
+
+        ops = [
+            UpdateOne(
+                {"tenant_id": user_id, "repository_id": repo_data["id"]},
+                {"$set": schedules[repo_data["id"]].synced(repo_data, now, stats["requests"].get(_resource(repo_data)))},
+                upsert=True
+            )
+            for repo_data in chosen
+        ] + [
+            UpdateOne(
+                {"tenant_id": user_id, "repository_id": repo_data["id"]},
+                {"$set": schedules[repo_data["id"]].synced(repo_data, integration["last_sync"], None)},
+                upsert=True
+            )
+            for repo_data in baseline
+        ]
+        if ops:
+            await self.db[SCHEDULE_COLLECTION].bulk_write(ops, ordered=False)
+        update = {"last_scheduled_sync": now}
+        if refresh_members:
+            update["members_synced_at"] = now
+        await self.db.github_integration.update_one({"github_user_id": user_id}, {"$set": update})
+
+        summary["requests"] = sum(stats["requests"].values())
+        logger.info(
+            f"Scheduled sync for user {user_id}: {summary['synced']} of {summary['listed']} repositories synced, "
+            f"{summary['untouched']} untouched, {summary['deferred']} deferred, {summary['requests']} requests"
+        )
+        return summary
+
+_task: Optional[asyncio.Task] = None
+
+async def run_scheduler(db):
+    scheduler = SyncScheduler(db)
+    while True:
+        try:
+            await scheduler.run_once()
+        except Exception as e:
+            logger.error(f"Error running scheduled syncs: {e}")
+        await asyncio.sleep(settings.SCHEDULER_INTERVAL)
+
+def start_scheduler(db):
+    """Run scheduled syncs in the background when enabled"""
+    global _task
+    if settings.SCHEDULER_ENABLED:
+        _task = asyncio.create_task(run_scheduler(db))
+
+async def stop_scheduler():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+async def _main():
+    # A separate worker process, for deployments that run several API replicas
+    from src.helpers.database import close_mongo_connection, connect_to_mongo, get_sync_database
+
+    await connect_to_mongo()
+    try:
+        await run_scheduler(get_sync_database())
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
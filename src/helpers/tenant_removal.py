@@ -0,0 +1,171 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from src.config import settings
+from src.helpers.archiver import delete_tenant_files
+from src.helpers.indexes import TENANT_COLLECTIONS
+from src.helpers.metrics import MONGO_OPERATION_SECONDS, REMOVAL_DOCUMENTS, timed
+from src.helpers.snapshots import delete_snapshot_files
+from src.helpers.sync_pipeline import stop_syncs
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MIN_BATCH_SIZE = 100
+LAG_CHECK_INTERVAL = 1.0
+
+class TenantRemoval:
+    """Deletes one integration's documents in small batches without swamping the database.
+
+    Each batch is one ``delete_many`` on a bounded list of ``_id`` values.
+    Slow batches halve the batch size and pause for as long as the batch
+    took, and the next batch waits while secondaries lag more than
+    ``REMOVAL_MAX_REPLICATION_LAG``. Progress is kept on the integration
+    document under ``removal``.
+    """
+
+    def __init__(self, db, user_id: int):
+        self.db = db
+        self.user_id = user_id
+        self.batch_size = settings.REMOVAL_BATCH_SIZE
+        self.deleted: Dict[str, int] = {}
+        self.estimated: Dict[str, int] = {}
+        self.throttled_seconds = 0.0
+        self._lag_supported = True
+        self._lag_checked = 0.0
+        self._saved = 0.0
+
+    async def run(self):
+        started = time.perf_counter()
+        # Syncs check the status before each write; ours are waited for here
+        await stop_syncs(self.user_id)
+        for collection in TENANT_COLLECTIONS:
+            self.estimated[collection] = await self.db[collection].count_documents({"tenant_id": self.user_id})
+        await self._save_progress(None, force=True)
+
+        for collection in TENANT_COLLECTIONS:
+            await self._purge(collection)
+        # A sync in another process may have checked the status just before the
+        # integration was marked removing; its last write is caught here
+        for collection in TENANT_COLLECTIONS:
+            await self._purge(collection)
+        await asyncio.to_thread(delete_tenant_files, self.user_id)
+        await asyncio.to_thread(delete_snapshot_files, self.user_id)
+        # The integration goes last, so an interrupted removal is resumed on startup
+        await self.db.github_integration.delete_one({"github_user_id": self.user_id, "integration_status": "removing"})
+        logger.info(
+            f"Removed integration {self.user_id}: {sum(self.deleted.values())} documents in "
+            f"{time.perf_counter() - started:.1f}s ({self.throttled_seconds:.1f}s throttled)"
+        )
+
+    async def _purge(self, collection: str):
+        coll = self.db[collection]
+        self.deleted.setdefault(collection, 0)
+        while True:
+            await self._wait_for_replication()
+            batch = await coll.find({"tenant_id": self.user_id}, {"_id": 1}).limit(self.batch_size).to_list(length=self.batch_size)
+            if not batch:
+                break
+
+            started = time.perf_counter()
+            with timed(MONGO_OPERATION_SECONDS, "mongo.delete_many", collection=collection, operation="delete_many"):
+                result = await coll.delete_many({"tenant_id": self.user_id, "_id": {"$in": [doc["_id"] for doc in batch]}})
+            elapsed = time.perf_counter() - started
+
+            self.deleted[collection] += result.deleted_count
+            REMOVAL_DOCUMENTS.inc(result.deleted_count, collection=collection)
+            await self._throttle(elapsed)
+            await self._save_progress(collection)
+        await self._save_progress(collection, force=True)
+
+    async def _throttle(self, elapsed: float):
+        """Back off after slow batches and grow back once they are fast again"""
+        if elapsed > settings.REMOVAL_MAX_BATCH_SECONDS:
+            self.batch_size = max(self.batch_size // 2, MIN_BATCH_SIZE)
+            self.throttled_seconds += elapsed
+            await asyncio.sleep(elapsed)
+        else:
+            self.batch_size = min(self.batch_size * 2, settings.REMOVAL_BATCH_SIZE)
+            await asyncio.sleep(0)
+
+    async def _replication_lag(self) -> Optional[float]:
+        """Seconds the slowest secondary trails the primary, or None outside a replica set"""
+        try:
+            replica_set = await self.db.client.admin.command("replSetGetStatus")
+        except Exception:
+            # Standalone server, or no clusterMonitor privilege
+            self._lag_supported = False
+            return None
+        members = replica_set.get("members", [])
+        primary = next((member["optimeDate"] for member in members if member.get("state") == 1), None)
+        secondaries = [member["optimeDate"] for member in members if member.get("state") == 2]
+        if primary is None or not secondaries:
+            return None
+        return max((primary - min(secondaries)).total_seconds(), 0.0)
+
+    async def _wait_for_replication(self):
+        while self._lag_supported and time.monotonic() - self._lag_checked >= LAG_CHECK_INTERVAL:
+            self._lag_checked = time.monotonic()
+            lag = await self._replication_lag()
+            if lag is None or lag <= settings.REMOVAL_MAX_REPLICATION_LAG:
+                return
+            logger.info(f"Removal of integration {self.user_id} paused: replication lag {lag:.1f}s")
+            self.throttled_seconds += LAG_CHECK_INTERVAL
+            await asyncio.sleep(LAG_CHECK_INTERVAL)
+
+    async def _save_progress(self, collection: Optional[str], force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._saved < settings.REMOVAL_PROGRESS_INTERVAL:
+            return
+        self._saved = now
+        await self.db.github_integration.update_one(
+            {"github_user_id": self.user_id},
+            {"$set": {"removal": self.progress(collection)}}
+        )
+
+    def progress(self, collection: Optional[str]) -> Dict[str, Any]:
+        return {
+            "current_collection": collection,
+            "deleted": dict(self.deleted),
+            "deleted_total": sum(self.deleted.values()),
+            "estimated_total": sum(self.estimated.values()),
+            "batch_size": self.batch_size,
+            "throttled_seconds": round(self.throttled_seconds, 1),
+            "updated_at": datetime.utcnow()
+        }
+
+# Running removals by user id; holding the task keeps it from being garbage collected
+_removals: Dict[int, asyncio.Task] = {}
+
+def start_removal(db, user_id: int) -> bool:
+    """Start removing an integration in the background; False if it is already running"""
+    task = _removals.get(user_id)
+    if task is not None and not task.done():
+        return False
+    task = asyncio.create_task(_run_removal(db, user_id))
+    _removals[user_id] = task
+    return True
+
+async def _run_removal(db, user_id: int):
+    try:
+        await TenantRemoval(db, user_id).run()
+    except Exception as e:
+        # The integration stays "removing" and is picked up again on the next startup
+        logger.error(f"Error removing integration {user_id}: {e}")
+    finally:
+        _removals.pop(user_id, None)
+
+async def resume_removals(db):
+    """Restart removals interrupted by a shutdown"""
+    cursor = db.github_integration.find({"integration_status": "removing"}, {"github_user_id": 1})
+    async for integration in cursor:
+        logger.info(f"Resuming removal of integration {integration['github_user_id']}")
+        start_removal(db, integration["github_user_id"])
+
+async def stop_removals():
+    """Cancel running removals at shutdown; they resume on the next startup"""
+    tasks = list(_removals.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,194 @@
+from typing import Dict, Iterable, List, Optional, Set
+from src.config import settings
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_LIMIT = 5000
+
+class TokenState:
+    """Rate-limit bookkeeping for a single access token"""
+
+    def __init__(self, user_id: int, token: str):
+        self.user_id = user_id
+        self.token = token
+        self.limit = DEFAULT_RATE_LIMIT
+        self.remaining = DEFAULT_RATE_LIMIT
+        self.reset_at = 0.0
+        self.in_flight = 0
+        self.borrowed = 0  # Requests spent on behalf of other users this window
+        self.disabled = False
+
+    def roll_window(self, now: float):
+        """Restore the budget once GitHub's reset time has passed"""
+        if self.reset_at and now >= self.reset_at:
+            self.remaining = self.limit
+            self.borrowed = 0
+            self.reset_at = 0.0
+
+    def available(self, owner: bool) -> int:
+        """Requests this token can still serve for the pool"""
+        budget = self.remaining - self.in_flight - settings.TOKEN_POOL_MIN_REMAINING
+        if not owner:
+            cap = int(self.limit * settings.TOKEN_POOL_MAX_SHARE) - self.borrowed - self.in_flight
+            budget = min(budget, cap)
+        return max(budget, 0)
+
+class TokenPool:
+    """Picks the healthiest authorized token for each GitHub request.
+
+    Budgets are tracked from the ``X-RateLimit-*`` response headers. A token
+    only serves another user's sync up to ``TOKEN_POOL_MAX_SHARE`` of its
+    hourly limit, so no single integration's quota is drained by the pool.
+    """
+
+    def __init__(self):
+        self.tokens: Dict[str, TokenState] = {}
+        self.grants: Dict[str, Set[int]] = {}
+        self.public_resources: Set[str] = set()
+        self._lock = asyncio.Lock()
+
+    def add_token(self, user_id: int, token: str) -> TokenState:
+        """Register a user's token, keeping existing budget state if already known.
+
+        A user has one token; registering a new one (after re-authorizing)
+        replaces the old.
+        """
+        state = self.tokens.get(token)
+        if state is None:
+            for stale in [known for known, other in self.tokens.items() if other.user_id == user_id]:
+                del self.tokens[stale]
+            state = TokenState(user_id, token)
+            self.tokens[token] = state
+        return state
+
+    def remove(self, user_id: int):
+        """Stop lending a user's token and drop the user's grants"""
+        for token in [token for token, state in self.tokens.items() if state.user_id == user_id]:
+            del self.tokens[token]
+        for users in self.grants.values():
+            users.discard(user_id)
+
+    async def refresh(self, db):
+        """Match the pool to the active integrations.
+
+        Tokens and grants of integrations that were removed or deactivated
+        are dropped, and re-authorized users' old tokens are replaced.
+        """
+        cursor = db.github_integration.find(
+            {"integration_status": "active"},
+            {"github_user_id": 1, "access_token": 1}
+        )
+        active = {integration["github_user_id"]: integration["access_token"] async for integration in cursor}
+        for token in [token for token, state in self.tokens.items() if active.get(state.user_id) != token]:
+            del self.tokens[token]
+        for users in self.grants.values():
+            users.intersection_update(active)
+        for user_id, token in active.items():
+            self.add_token(user_id, token)
+
+    def grant(self, resource: str, user_ids: Iterable[int], private: bool = True):
+        """Record which users' tokens may read a resource"""
+        self.grants.setdefault(resource, set()).update(user_ids)
+        if not private:
+            self.public_resources.add(resource)
+
+    async def load_grants(self, db, repo_id: int, resource: str):
+        """Load the users known to have access to a repository: every tenant holding a copy of it"""
+        copies = await db.github_repos.find(
+            {"github_id": repo_id},
+            {"tenant_id": 1, "private": 1}
+        ).to_list(length=None)
+        if copies:
+            self.grant(resource, [repo["tenant_id"] for repo in copies], copies[0].get("private", True))
+
+    def _candidates(self, resource: str, owner_token: str) -> List[TokenState]:
+        if resource in self.public_resources and settings.TOKEN_POOL_SHARE_PUBLIC:
+            return [state for state in self.tokens.values() if not state.disabled]
+        allowed = self.grants.get(resource, set())
+        return [
+            state for state in self.tokens.values()
+            if not state.disabled and (state.token == owner_token or state.user_id in allowed)
+        ]
+
+    def _pick(self, resource: str, owner_token: str) -> Optional[TokenState]:
+        now = time.time()
+        best = None
+        best_key = None
+        for state in self._candidates(resource, owner_token):
+            state.roll_window(now)
+            owner = state.token == owner_token
+            if state.available(owner) <= 0:
+                continue
+            # Healthiest first; fewer borrowed requests breaks ties so load rotates
+            key = ((state.remaining - state.in_flight) / state.limit, -state.borrowed, owner)
+            if best_key is None or key > best_key:
+                best, best_key = state, key
+        return best
+
+    async def acquire(self, resource: str, owner_token: str) -> TokenState:
+        """Reserve a token for one request against ``resource``"""
+        deadline = time.monotonic() + settings.TOKEN_POOL_MAX_WAIT
+        while True:
+            async with self._lock:
+                state = self._pick(resource, owner_token)
+                if state is not None:
+                    state.in_flight += 1
+                    if state.token != owner_token:
+                        state.borrowed += 1
+                    return state
+
+                resets = [s.reset_at for s in self._candidates(resource, owner_token) if s.reset_at]
+            wait = min(resets) - time.time() if resets else 0
+            if wait <= 0 or time.monotonic() + wait > deadline:
+                # Nothing healthy left; fall back to the owner's token and let GitHub decide
+                async with self._lock:
+                    state = self.tokens.get(owner_token)
+                    if state is None:
+                        raise RuntimeError("Owner token is not registered with the pool")
+                    state.in_flight += 1
+                    return state
+            logger.info(f"All tokens for {resource} exhausted, waiting {wait:.0f}s for reset")
+            await asyncio.sleep(wait)
+
+    def release(self, state: TokenState, headers=None, status_code: Optional[int] = None):
+        """Return a token and record the budget reported by GitHub"""
+        state.in_flight = max(state.in_flight - 1, 0)
+        if status_code == 401:
+            state.disabled = True
+            logger.warning(f"Token for user {state.user_id} was rejected, removing it from the pool")
+            return
+        if headers is None:
+            return
+        self.update(state, headers)
+
+    def update(self, state: TokenState, headers):
+        """Apply ``X-RateLimit-*`` headers to a token's state"""
+        try:
+            if "x-ratelimit-limit" in headers:
+                state.limit = int(headers["x-ratelimit-limit"])
+            if "x-ratelimit-remaining" in headers:
+                state.remaining = int(headers["x-ratelimit-remaining"])
+            if "x-ratelimit-reset" in headers:
+                state.reset_at = float(headers["x-ratelimit-reset"])
+        except ValueError:
+            logger.warning(f"Malformed rate-limit headers for user {state.user_id}")
+
+    def stats(self) -> List[Dict[str, int]]:
+        """Budget snapshot per token (tokens themselves are never exposed)"""
+        return [
+            {
+                "user_id": state.user_id,
+                "limit": state.limit,
+                "remaining": state.remaining,
+                "borrowed": state.borrowed,
+                "in_flight": state.in_flight,
+                "reset_at": int(state.reset_at),
+                "disabled": state.disabled
+            }
+            for state in self.tokens.values()
+        ]
+
+token_pool = TokenPool()
@@ -0,0 +1,315 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Type
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from src.models.github_models import (
+    GitHubOrganization, GitHubRepository, GitHubCommit, GitHubPullRequest,
+    GitHubIssue, GitHubChangelog, GitHubUser
+)
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_CACHE_SIZE = 131072
+
+if sys.version_info >= (3, 11):
+    # fromisoformat accepts the trailing "Z" natively
+    _fromisoformat = datetime.fromisoformat
+else:
+    def _fromisoformat(value: str) -> datetime:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+class _TimestampCache(dict):
+    """Memoized GitHub ISO-8601 parsing (the same values repeat across a sync).
+
+    A plain dict subscript is the cheapest cached lookup available to the
+    generated transformers; the cache is simply reset once it grows too large.
+    """
+
+    def __missing__(self, value: str) -> datetime:
+        if len(self) >= TIMESTAMP_CACHE_SIZE:
+            self.clear()
+        parsed = self[value] = _fromisoformat(value)
+        return parsed
+
+_timestamps = _TimestampCache()
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse a GitHub ISO-8601 timestamp"""
+    return _timestamps[value]
+
+parse_timestamp.cache_clear = _timestamps.clear
+
+_EMPTY: Dict[str, Any] = {}
+
+class Field:
+    """Where a document field comes from in a GitHub API item"""
+
+    def __init__(self, path: str, optional: bool = False):
+        self.path = tuple(path.split("."))
+        self.optional = optional
+
+    def parent(self, scope: "_Scope") -> str:
+        """Expression for the object holding the last key of the path"""
+        return scope.lookup(self.path[:-1], self.optional)
+
+    def source(self, scope: "_Scope") -> str:
+        parent = self.parent(scope)
+        if self.optional:
+            return f"{parent}.get({self.path[-1]!r})"
+        return f"{parent}[{self.path[-1]!r}]"
+
+class Timestamp(Field):
+    def source(self, scope: "_Scope") -> str:
+        value = super().source(scope)
+        if not self.optional:
+            return f"_ts[{value}]"
+        return f"(_ts[_v] if (_v := {value}) else None)"
+
+class Context(Field):
+    """A value supplied by the sync (tenant, repository) rather than the item"""
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def source(self, scope: "_Scope") -> str:
+        return f"context[{self.key!r}]"
+
+class Const(Field):
+    def __init__(self, value: Any):
+        self.value = value
+
+    def source(self, scope: "_Scope") -> str:
+        return repr(self.value)
+
+class Pluck(Field):
+    """Collect one key from each element of a list, e.g. label names"""
+
+    def __init__(self, path: str, key: str):
+        super().__init__(path, optional=True)
+        self.key = key
+
+    def source(self, scope: "_Scope") -> str:
+        return f"[element[{self.key!r}] for element in ({super().source(scope)} or ())]"
+
+class Now(Field):
+    def __init__(self):
+        pass
+
+    def source(self, scope: "_Scope") -> str:
+        return "datetime.utcnow()"
+
+class _Scope:
+    """Hoists nested lookups shared by several fields into local variables"""
+
+    def __init__(self):
+        self.names: Dict[tuple, str] = {}
+        self.lines: List[str] = []
+
+    def lookup(self, path: tuple, optional: bool) -> str:
+        if not path:
+            return "item"
+        key = (path, optional)
+        if key not in self.names:
+            parent = self.lookup(path[:-1], optional)
+            name = f"_p{len(self.names)}"
+            if optional:
+                # Missing or null parents behave like an empty object
+                self.lines.append(f"    {name} = {parent}.get({path[-1]!r}) or _EMPTY")
+            else:
+                self.lines.append(f"    {name} = {parent}[{path[-1]!r}]")
+            self.names[key] = name
+        return self.names[key]
+
+class DocumentMapping:
+    """Declarative GitHub item -> Mongo document mapping for one collection.
+
+    ``compile`` generates a single flat function per mapping, so building a
+    document costs one dict literal instead of a chain of helper calls.
+    """
+
+    def __init__(self, collection: str, model: Type[BaseModel], fields: Dict[str, Field], skip_if: Optional[str] = None):
+        self.collection = collection
+        self.model = model
+        self.fields = fields
+        self.skip_if = skip_if
+        self._check_model()
+        self.transform = self.compile()
+        self.adapter = TypeAdapter(List[model])
+
+    def _check_model(self):
+        """Keep the mapping and its Pydantic model from drifting apart"""
+        model_fields = {name for name in self.model.model_fields if name != "id"}
+        required = {name for name in model_fields if self.model.model_fields[name].is_required()}
+        unknown = set(self.fields) - model_fields
+        missing = required - set(self.fields)
+        if unknown or missing:
+            raise ValueError(
+                f"Mapping for {self.collection} does not match {self.model.__name__}: "
+                f"unknown={sorted(unknown)}, missing={sorted(missing)}"
+            )
+
+    def compile(self) -> Callable[[Dict[str, Any], Dict[str, Any]], Optional[Dict[str, Any]]]:
+        scope = _Scope()
+        entries = [f"        {name!r}: {spec.source(scope)}," for name, spec in self.fields.items()]
+        lines = ["def transform(item, context):"]
+        if self.skip_if:
+            lines.append(f"    if item.get({self.skip_if!r}):")
+            lines.append("        return None")
+        lines.extend(scope.lines)
+        lines.append("    return {")
+        lines.extend(entries)
+        lines.append("    }")
+        self.source = "\n".join(lines)
+        namespace = {"datetime": datetime, "_ts": _timestamps, "_EMPTY": _EMPTY}
+        exec(compile(self.source, f"<transform {self.collection}>", "exec"), namespace)
+        return namespace["transform"]
+
+    def validate(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Validate a batch against the model, dropping invalid documents"""
+        try:
+            self.adapter.validate_python(docs)
+            return docs
+        except ValidationError as e:
+            invalid = {error["loc"][0] for error in e.errors() if error["loc"]}
+            logger.error(f"Dropping {len(invalid)} invalid {self.collection} documents: {e.errors()[0]['msg']}")
+            return [doc for index, doc in enumerate(docs) if index not in invalid]
+
+MAPPINGS = {
+    mapping.collection: mapping
+    for mapping in [
+        DocumentMapping("github_organizations", GitHubOrganization, {
+            "tenant_id": Context("user_id"),
+            "github_id": Field("id"),
+            "login": Field("login"),
+            "name": Field("name", optional=True),
+            "description": Field("description", optional=True),
+            "url": Field("url"),
+            "avatar_url": Field("avatar_url", optional=True),
+            "created_at": Timestamp("created_at"),
+            "updated_at": Timestamp("updated_at"),
+            "user_id": Context("user_id")
+        }),
+        DocumentMapping("github_repos", GitHubRepository, {
+            "tenant_id": Context("user_id"),
+            "github_id": Field("id"),
+            "name": Field("name"),
+            "full_name": Field("full_name"),
+            "description": Field("description", optional=True),
+            "private": Field("private"),
+            "owner_login": Field("owner.login"),
+            "owner_id": Field("owner.id"),
+            "html_url": Field("html_url"),
+            "clone_url": Field("clone_url"),
+            "language": Field("language", optional=True),
+            "stargazers_count": Field("stargazers_count"),
+            "watchers_count": Field("watchers_count"),
+            "forks_count": Field("forks_count"),
+            "open_issues_count": Field("open_issues_count"),
+            "default_branch": Field("default_branch"),
+            "created_at": Timestamp("created_at"),
+            "updated_at": Timestamp("updated_at"),
+            "pushed_at": Timestamp("pushed_at", optional=True),
+            "user_id": Context("user_id")
+        }),
+        DocumentMapping("github_commits", GitHubCommit, {
+            "tenant_id": Context("user_id"),
+            "sha": Field("sha"),
+            "message": Field("commit.message"),
+            "author_name": Field("commit.author.name", optional=True),
+            "author_email": Field("commit.author.email", optional=True),
+            # The GitHub account the commit is attributed to, when GitHub could match one
+            "author_login": Field("author.login", optional=True),
+            "author_id": Field("author.id", optional=True),
+            "author_date": Timestamp("commit.author.date"),
+            "committer_name": Field("commit.committer.name", optional=True),
+            "committer_email": Field("commit.committer.email", optional=True),
+            "committer_date": Timestamp("commit.committer.date"),
+            "html_url": Field("html_url"),
+            "repository_id": Context("repository_id"),
+            "repository_name": Context("repository_name"),
+            "additions": Field("stats.additions", optional=True),
+            "deletions": Field("stats.deletions", optional=True),
+            "total_changes": Field("stats.total", optional=True),
+            "user_id": Context("user_id")
+        }),
+        DocumentMapping("github_pulls", GitHubPullRequest, {
+            "tenant_id": Context("user_id"),
+            "github_id": Field("id"),
+            "number": Field("number"),
+            "title": Field("title"),
+            "body": Field("body", optional=True),
+            "state": Field("state"),
+            "user_login": Field("user.login"),
+            "user_id": Field("user.id"),
+            "assignee_login": Field("assignee.login", optional=True),
+            "assignee_id": Field("assignee.id", optional=True),
+            "html_url": Field("html_url"),
+            "created_at": Timestamp("created_at"),
+            "updated_at": Timestamp("updated_at"),
+            "closed_at": Timestamp("closed_at", optional=True),
+            "merged_at": Timestamp("merged_at", optional=True),
+            "head_ref": Field("head.ref"),
+            "base_ref": Field("base.ref"),
+            "repository_id": Context("repository_id"),
+            "repository_name": Context("repository_name"),
+            "integration_user_id": Context("user_id")
+        }),
+        # Pull requests also appear in the issues API
+        DocumentMapping("github_issues", GitHubIssue, {
+            "tenant_id": Context("user_id"),
+            "github_id": Field("id"),
+            "number": Field("number"),
+            "title": Field("title"),
+            "body": Field("body", optional=True),
+            "state": Field("state"),
+            "user_login": Field("user.login"),
+            "user_id": Field("user.id"),
+            "assignee_login": Field("assignee.login", optional=True),
+            "assignee_id": Field("assignee.id", optional=True),
+            "labels": Pluck("labels", "name"),
+            "html_url": Field("html_url"),
+            "created_at": Timestamp("created_at"),
+            "updated_at": Timestamp("updated_at"),
+            "closed_at": Timestamp("closed_at", optional=True),
+            "repository_id": Context("repository_id"),
+            "repository_name": Context("repository_name"),
+            "integration_user_id": Context("user_id")
+        }, skip_if="pull_request"),
+        DocumentMapping("github_changelogs", GitHubChangelog, {
+            "tenant_id": Context("user_id"),
+            "github_id": Field("id"),
+            "event": Field("event"),
+            "actor_login": Field("actor.login"),
+            "actor_id": Field("actor.id"),
+            "created_at": Timestamp("created_at"),
+            "issue_id": Field("issue.id", optional=True),
+            "issue_number": Context("issue_number"),
+            "repository_id": Context("repository_id"),
+            "repository_name": Context("repository_name"),
+            "integration_user_id": Context("user_id")
+        }),
+        # Basic member info doesn't include profile details
+        DocumentMapping("github_users", GitHubUser, {
+            "tenant_id": Context("user_id"),
+            "github_id": Field("id"),
+            "login": Field("login"),
+            "name": Const(None),
+            "email": Const(None),
+            "bio": Const(None),
+            "avatar_url": Field("avatar_url", optional=True),
+            "html_url": Field("html_url"),
+            "company": Const(None),
+            "location": Const(None),
+            "created_at": Const(None),
+            "updated_at": Now(),
+            "public_repos": Const(0),
+            "public_gists": Const(0),
+            "followers": Const(0),
+            "following": Const(0),
+            "integration_user_id": Context("user_id")
+        })
+    ]
+}
+
+TRANSFORMERS = {collection: mapping.transform for collection, mapping in MAPPINGS.items()}
@@ -0,0 +1,144 @@
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from pymongo import UpdateOne
+from src.config import settings
+from src.helpers.change_detector import content_hash
+from src.helpers.metrics import MONGO_OPERATION_SECONDS, SYNC_DOCUMENTS, timed
+from src.helpers.transformers import TRANSFORMERS
+
+USERS_COLLECTION = "github_users"
+
+# Fields of each collection's API items holding GitHub users (a user or a list
+# of them); None is the item itself
+USER_FIELDS = {
+    "github_repos": ("owner",),
+    "github_commits": ("author", "committer"),
+    "github_pulls": ("user", "assignees", "requested_reviewers"),
+    "github_issues": ("user", "assignees"),
+    "github_changelogs": ("actor", "assignee", "assigner"),
+    "github_users": (None,)
+}
+
+# Commit fields whose GitHub account and git email appear side by side
+COMMIT_IDENTITIES = ("author", "committer")
+
+# Refreshed on every write, so left out of the comparison with the stored copy
+UNHASHED_FIELDS = ("updated_at",)
+
+class IdentityCache:
+    """Every GitHub user one sync comes across, written to ``github_users`` once.
+
+    Users are collected from organization members and from the authors,
+    assignees, reviewers and actors on fetched items, keyed by GitHub id, so a
+    member of several organizations or the author of many commits is handled
+    once. Commit emails are linked to the account GitHub attributed the commit
+    to, which lets commits without one (such as those read from a git
+    mirror) be attributed by email. At the end of the sync only users that
+    are new or changed since their stored copy are written.
+    """
+
+    def __init__(self, tenant_id: int):
+        self.tenant_id = tenant_id
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.emails: Dict[int, Set[str]] = {}
+        # Email -> (login, github_id); emails are stored lowercased
+        self.accounts: Dict[str, Tuple[str, int]] = {}
+        self.resolved = 0
+        self.written = 0
+        self.unchanged = 0
+
+    async def load(self, db):
+        """Email links stored by earlier syncs"""
+        cursor = db[USERS_COLLECTION].find(
+            {"tenant_id": self.tenant_id, "emails.0": {"$exists": True}},
+            {"_id": 0, "github_id": 1, "login": 1, "emails": 1}
+        )
+        with timed(MONGO_OPERATION_SECONDS, "mongo.find", collection=USERS_COLLECTION, operation="find"):
+            async for user in cursor:
+                for email in user["emails"]:
+                    self.accounts[email.lower()] = (user["login"], user["github_id"])
+
+    @staticmethod
+    def _users(fields: Tuple[Optional[str], ...], item: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for field in fields:
+            value = item if field is None else item.get(field)
+            for user in value if isinstance(value, list) else (value,):
+                # Organizations own repositories but are not users
+                if user and "login" in user and user.get("type") != "Organization":
+                    yield user
+
+    def observe(self, collection: str, items: List[Dict[str, Any]]):
+        """Record the users on a page of API items"""
+        fields = USER_FIELDS.get(collection)
+        if fields is None:
+            return
+        for item in items:
+            for user in self._users(fields, item):
+                self.users[user["id"]] = user
+            if collection == "github_commits":
+                self._link_emails(item)
+
+    def _link_emails(self, item: Dict[str, Any]):
+        commit = item.get("commit") or {}
+        for field in COMMIT_IDENTITIES:
+            user = item.get(field)
+            email = (commit.get(field) or {}).get("email")
+            if user and email and "login" in user:
+                self.emails.setdefault(user["id"], set()).add(email.lower())
+                self.accounts[email.lower()] = (user["login"], user["id"])
+
+    def resolve(self, collection: str, docs: List[Dict[str, Any]]):
+        """Attribute commits without a GitHub account to the one their author email is linked to"""
+        if collection != "github_commits":
+            return
+        for doc in docs:
+            if doc.get("author_login") is None and doc.get("author_email"):
+                account = self.accounts.get(doc["author_email"].lower())
+                if account is not None:
+                    doc["author_login"], doc["author_id"] = account
+                    self.resolved += 1
+
+    async def flush(self, db):
+        """Upsert the users that are new or changed, in bulk"""
+        transform = TRANSFORMERS[USERS_COLLECTION]
+        context = {"user_id": self.tenant_id}
+        github_ids = list(self.users)
+        batch_size = settings.SYNC_WRITE_BATCH_SIZE
+        for start in range(0, len(github_ids), batch_size):
+            chunk = github_ids[start:start + batch_size]
+            cursor = db[USERS_COLLECTION].find(
+                {"tenant_id": self.tenant_id, "github_id": {"$in": chunk}},
+                {"_id": 0, "github_id": 1, "content_hash": 1, "emails": 1}
+            )
+            with timed(MONGO_OPERATION_SECONDS, "mongo.find", collection=USERS_COLLECTION, operation="find"):
+                stored = {user["github_id"]: user async for user in cursor}
+
+            ops = []
+            for github_id in chunk:
+                doc = transform(self.users[github_id], context)
+                digest = content_hash({field: value for field, value in doc.items() if field not in UNHASHED_FIELDS})
+                known = stored.get(github_id, {})
+                emails = sorted(self.emails.get(github_id, set()) - set(known.get("emails", ())))
+                if known.get("content_hash") == digest and not emails:
+                    continue
+                doc["content_hash"] = digest
+                update = {"$set": doc}
+                if emails:
+                    update["$addToSet"] = {"emails": {"$each": emails}}
+                ops.append(UpdateOne({"tenant_id": self.tenant_id, "github_id": github_id}, update, upsert=True))
+
+            if ops:
+                with timed(MONGO_OPERATION_SECONDS, "mongo.bulk_write", collection=USERS_COLLECTION, operation="bulk_write"):
+                    await db[USERS_COLLECTION].bulk_write(ops, ordered=False)
+            self.written += len(ops)
+            self.unchanged += len(chunk) - len(ops)
+        SYNC_DOCUMENTS.inc(self.written, collection=USERS_COLLECTION, outcome="written")
+        SYNC_DOCUMENTS.inc(self.unchanged, collection=USERS_COLLECTION, outcome="skipped")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users_seen": len(self.users),
+            "written": self.written,
+            "unchanged": self.unchanged,
+            "emails_linked": len(self.accounts),
+            "commits_resolved": self.resolved
+        }
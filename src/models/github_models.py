@@ -1,12 +1,16 @@
 from typing import Optional, Dict, Any, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+from pydantic_core import core_schema
 from datetime import datetime
 from bson import ObjectId
 
 class PyObjectId(ObjectId):
     @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
+    def __get_pydantic_core_schema__(cls, source_type, handler):
+        return core_schema.no_info_plain_validator_function(
+            cls.validate,
+            serialization=core_schema.to_string_ser_schema()
+        )
 
     @classmethod
     def validate(cls, v):
@@ -15,8 +19,8 @@ class PyObjectId(ObjectId):
         return ObjectId(v)
 
     @classmethod
-    def __modify_schema__(cls, field_schema):
-        field_schema.update(type="string")
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        return {"type": "string"}
 
 class GitHubIntegration(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
@@ -28,13 +32,11 @@ class GitHubIntegration(BaseModel):
     connection_timestamp: datetime
     last_sync: Optional[datetime]
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
 
 class GitHubOrganization(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    tenant_id: int  # github_user_id of the integration that owns this copy
     github_id: int
     login: str
     name: Optional[str]
@@ -45,13 +47,11 @@ class GitHubOrganization(BaseModel):
     updated_at: datetime
     user_id: int  # Reference to integrated user
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
 
 class GitHubRepository(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    tenant_id: int  # github_user_id of the integration that owns this copy
     github_id: int
     name: str
     full_name: str
@@ -72,17 +72,17 @@ class GitHubRepository(BaseModel):
     pushed_at: Optional[datetime]
     user_id: int
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
 
 class GitHubCommit(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    tenant_id: int  # github_user_id of the integration that owns this copy
     sha: str
     message: str
     author_name: Optional[str]
     author_email: Optional[str]
+    author_login: Optional[str]
+    author_id: Optional[int]
     author_date: datetime
     committer_name: Optional[str]
     committer_email: Optional[str]
@@ -94,14 +94,14 @@ class GitHubCommit(BaseModel):
     deletions: Optional[int]
     total_changes: Optional[int]
     user_id: int
+    content_hash: Optional[str] = None  # Set by change detection
+    truncated_fields: List[str] = []  # Fields whose full text is in github_content
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
 
 class GitHubPullRequest(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    tenant_id: int  # github_user_id of the integration that owns this copy
     github_id: int
     number: int
     title: str
@@ -121,14 +121,14 @@ class GitHubPullRequest(BaseModel):
     repository_id: int
     repository_name: str
     integration_user_id: int
+    content_hash: Optional[str] = None  # Set by change detection
+    truncated_fields: List[str] = []  # Fields whose full text is in github_content
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
 
 class GitHubIssue(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    tenant_id: int  # github_user_id of the integration that owns this copy
     github_id: int
     number: int
     title: str
@@ -146,32 +146,31 @@ class GitHubIssue(BaseModel):
     repository_id: int
     repository_name: str
     integration_user_id: int
+    content_hash: Optional[str] = None  # Set by change detection
+    truncated_fields: List[str] = []  # Fields whose full text is in github_content
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
 
 class GitHubChangelog(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    tenant_id: int  # github_user_id of the integration that owns this copy
     github_id: int
     event: str
     actor_login: str
     actor_id: int
     created_at: datetime
-    issue_id: int
+    issue_id: Optional[int]
     issue_number: int
     repository_id: int
     repository_name: str
     integration_user_id: int
+    content_hash: Optional[str] = None  # Set by change detection
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
 
 class GitHubUser(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    tenant_id: int  # github_user_id of the integration that owns this copy
     github_id: int
     login: str
     name: Optional[str]
@@ -181,15 +180,14 @@ class GitHubUser(BaseModel):
     html_url: str
     company: Optional[str]
     location: Optional[str]
-    created_at: datetime
+    created_at: Optional[datetime]  # Not included in basic member info
     updated_at: datetime
     public_repos: int
     public_gists: int
     followers: int
     following: int
     integration_user_id: int
+    emails: List[str] = []  # Commit emails linked to this account, added by syncs
+    content_hash: Optional[str] = None
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
\ No newline at end of file
+    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
\ No newline at end of file
@@ -1,3 +1,5 @@
 from .auth_routes import router as auth_routes
 from .integration_routes import router as integration_routes
-from .data_routes import router as data_routes
\ No newline at end of file
+from .data_routes import router as data_routes
+from .archive_routes import router as archive_routes
+from .snapshot_routes import router as snapshot_routes
\ No newline at end of file
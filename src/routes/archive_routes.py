@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Query, Path
+from typing import Optional
+from src.controllers.archive_controller import ArchiveController
+
+router = APIRouter(prefix="/archive", tags=["Archive"])
+
+@router.get("/{collection}")
+async def query_archive(
+    collection: str = Path(...),
+    user_id: int = Query(...),
+    filter: Optional[str] = Query(None, alias="filter"),
+    columns: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1)
+):
+    """Query archived documents of a collection"""
+    return await ArchiveController.query_archive(
+        collection=collection,
+        user_id=user_id,
+        filter_params=filter,
+        columns=columns,
+        limit=limit
+    )
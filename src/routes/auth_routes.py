@@ -1,19 +1,14 @@
 from fastapi import APIRouter, Query
-from src.controllers.integration_controller import IntegrationController
+from src.controllers.auth_controller import AuthController
 
-router = APIRouter(prefix="/integration", tags=["Integration"])
+router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-@router.get("/status")
-async def get_status(user_id: int = Query(...)):
-    """Check integration status"""
-    return await IntegrationController.get_status(user_id)
+@router.get("/github/login")
+async def github_login():
+    """Redirect to the GitHub OAuth authorization page"""
+    return AuthController.github_login()
 
-@router.post("/remove")
-async def remove_integration(user_id: int = Query(...)):
-    """Delete integration data from MongoDB"""
-    return await IntegrationController.remove_integration(user_id)
-
-@router.post("/resync")
-async def resync_data(user_id: int = Query(...)):
-    """Re-fetch all GitHub data and re-store"""
-    return await IntegrationController.resync_data(user_id)
\ No newline at end of file
+@router.get("/github/callback")
+async def github_callback(code: str = Query(...)):
+    """Exchange the OAuth code for a token and store the integration"""
+    return await AuthController.github_callback(code)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Query, Path
+from fastapi import APIRouter, Header, Query, Path
 from typing import Optional
 from src.controllers.data_controller import DataController
 
@@ -7,28 +7,70 @@ router = APIRouter(prefix="/data", tags=["Data"])
 @router.get("/{collection}")
 async def get_collection_data(
     collection: str = Path(...),
+    user_id: int = Query(...),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     sort_by: Optional[str] = Query(None),
     sort_order: str = Query("desc", regex="^(asc|desc)$"),
     filter: Optional[str] = Query(None, alias="filter"),
-    search: Optional[str] = Query(None)
+    search: Optional[str] = Query(None),
+    include_content: bool = Query(False)
 ):
     """Get paginated data from any GitHub collection"""
     return await DataController.get_collection_data(
         collection=collection,
+        user_id=user_id,
         page=page,
         limit=limit,
         sort_by=sort_by,
         sort_order=sort_order,
         filter_params=filter,
-        search=search
+        search=search,
+        include_content=include_content
     )
 
+# Declared before /{collection}/{key}, which would otherwise match them
+@router.get("/github_users/lookup")
+async def lookup_users(
+    user_id: int = Query(...),
+    logins: Optional[str] = Query(None),
+    ids: Optional[str] = Query(None),
+    emails: Optional[str] = Query(None)
+):
+    """Resolve many users by login, GitHub id or commit email in one request"""
+    return await DataController.lookup_users(user_id, logins, ids, emails)
+
+@router.get("/{collection}/changes")
+async def subscribe_changes(
+    collection: str = Path(...),
+    user_id: int = Query(...),
+    filter: Optional[str] = Query(None, alias="filter"),
+    search: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """Stream inserts and updates matching a filter as Server-Sent Events"""
+    return await DataController.subscribe_changes(
+        collection=collection,
+        user_id=user_id,
+        filter_params=filter,
+        search=search,
+        last_event_id=last_event_id
+    )
+
+@router.get("/{collection}/{key}")
+async def get_document(
+    collection: str = Path(...),
+    key: str = Path(...),
+    user_id: int = Query(...)
+):
+    """Get one document with its full text fields"""
+    return await DataController.get_document(collection, key, user_id)
+
 @router.get("/")
 async def global_search(
+    user_id: int = Query(...),
     q: str = Query(..., min_length=1),
     limit: int = Query(50, ge=1, le=100)
 ):
     """Search across all GitHub collections"""
-    return await DataController.global_search(q, limit)
\ No newline at end of file
+    return await DataController.global_search(user_id, q, limit)
\ No newline at end of file
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Header, Query
+from typing import Optional
 from src.controllers.integration_controller import IntegrationController
 
 router = APIRouter(prefix="/integration", tags=["Integration"])
@@ -14,7 +15,25 @@ async def remove_integration(user_id: int = Query(...)):
     return await IntegrationController.remove_integration(user_id)
 
 @router.post("/resync", operation_id="resync_github_data")
-async def resync_data(user_id: int = Query(...)):
+async def resync_data(
+    user_id: int = Query(...),
+    profile: bool = Query(False),
+    cpu_profile: bool = Query(False)
+):
     """Re-fetch all GitHub data and re-store"""
-    return await IntegrationController.resync_data(user_id)
+    return await IntegrationController.resync_data(user_id, profile, cpu_profile)
+
+@router.get("/sync-events", operation_id="stream_sync_events")
+async def stream_sync_events(
+    user_id: int = Query(...),
+    sync_id: Optional[str] = Query(None),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """Stream sync progress as Server-Sent Events"""
+    return await IntegrationController.stream_sync_events(user_id, sync_id, last_event_id)
+
+@router.get("/sync-report", operation_id="get_sync_report")
+async def get_sync_report(user_id: int = Query(...), report_id: Optional[str] = Query(None)):
+    """Get the profiling report of a sync run with profile=true"""
+    return await IntegrationController.get_sync_report(user_id, report_id)
 
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Query, Path
+from typing import Optional
+from src.controllers.snapshot_controller import SnapshotController
+
+router = APIRouter(prefix="/snapshots", tags=["Snapshots"])
+
+@router.post("")
+async def create_snapshots(
+    user_id: int = Query(...),
+    collections: Optional[str] = Query(None),
+    filter: Optional[str] = Query(None, alias="filter"),
+    incremental: bool = Query(False)
+):
+    """Write Parquet snapshots of collections in the background"""
+    return await SnapshotController.create_snapshots(
+        user_id=user_id,
+        collections=collections,
+        filter_params=filter,
+        incremental=incremental
+    )
+
+@router.get("")
+async def list_snapshots(
+    user_id: int = Query(...),
+    collection: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """List recent snapshots"""
+    return await SnapshotController.list_snapshots(user_id=user_id, collection=collection, limit=limit)
+
+@router.get("/{snapshot_id}")
+async def get_snapshot(
+    snapshot_id: str = Path(...),
+    user_id: int = Query(...)
+):
+    """Get the status of a snapshot"""
+    return await SnapshotController.get_snapshot(snapshot_id=snapshot_id, user_id=user_id)
+
+@router.get("/{snapshot_id}/download")
+async def download_snapshot(
+    snapshot_id: str = Path(...),
+    user_id: int = Query(...),
+    format: str = Query("parquet", regex="^(parquet|arrow)$")
+):
+    """Download a snapshot as Parquet or as an Arrow IPC stream"""
+    return await SnapshotController.download_snapshot(snapshot_id=snapshot_id, user_id=user_id, format=format)
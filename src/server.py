@@ -1,10 +1,20 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 import logging
+import time
 
-from src.helpers.database import connect_to_mongo, close_mongo_connection
-from src.routes import auth_routes, integration_routes, data_routes
+from src.helpers.database import connect_to_mongo, close_mongo_connection, get_database, get_sync_database, pool_stats
+from src.helpers.archiver import start_archiver, stop_archiver
+from src.helpers.tenant_removal import resume_removals, stop_removals
+from src.helpers.snapshots import stop_snapshots
+from src.helpers.sync_scheduler import start_scheduler, stop_scheduler
+from src.helpers.change_streams import change_hub
+from src.helpers.compression import CompressionMiddleware
+from src.helpers.rate_limiter import rate_limiter
+from src.routes import auth_routes, integration_routes, data_routes, archive_routes, snapshot_routes
+from src.helpers.metrics import HTTP_REQUEST_SECONDS, registry
 from src.config import settings
 
 # Setup logging
@@ -19,6 +29,9 @@ async def lifespan(app: FastAPI):
     # Startup
     try:
         await connect_to_mongo()
+        await resume_removals(get_database())
+        start_archiver(get_database())
+        start_scheduler(get_sync_database())
         logger.info("Application startup complete")
     except Exception as e:
         logger.error(f"Failed to start application: {e}")
@@ -27,6 +40,11 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    await stop_scheduler()
+    await stop_removals()
+    await stop_archiver()
+    await stop_snapshots()
+    await change_hub.close()
     await close_mongo_connection()
     logger.info("Application shutdown complete")
 
@@ -47,10 +65,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Time each request, labelled by route template rather than raw path"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    if path != "/metrics":
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method, route=path, status=response.status_code
+        )
+    return response
+
+# Quotas for the data API; registered after the metrics middleware so it runs before request timing
+app.middleware("http")(rate_limiter)
+
+# Outermost, so every response (including 429s) can be compressed
+if settings.RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.RESPONSE_COMPRESSION_MIN_SIZE)
+
 # Include routers
 app.include_router(auth_routes)
 app.include_router(integration_routes)
 app.include_router(data_routes)
+app.include_router(archive_routes)
+app.include_router(snapshot_routes)
 
 # Root endpoint
 @app.get("/")
@@ -64,7 +105,13 @@ async def root():
 # Health check
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "mongo_pools": pool_stats()}
+
+# Prometheus scrape endpoint
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,128 @@
+from datetime import datetime
+import asyncio
+import bson
+from pymongo import DeleteMany, UpdateMany
+from src.config import settings
+from src.helpers.bucket_storage import BucketStorage, BucketUpdate, bucket_month
+
+def commit(sha, date, repository_id=10):
+    return {
+        "tenant_id": 5, "sha": sha, "message": "Fix", "author_date": date,
+        "repository_id": repository_id, "repository_name": "octo/repo"
+    }
+
+class FakeAggregate:
+    def __init__(self, pipelines):
+        self.pipelines = pipelines
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        return self
+
+    async def to_list(self, length):
+        return []
+
+class FakeDB:
+    def __init__(self):
+        self.pipelines = []
+
+    def __getitem__(self, name):
+        return FakeAggregate(self.pipelines)
+
+def test_bucket_month():
+    assert bucket_month(datetime(2024, 3, 17, 8, 30, 5, 12)) == datetime(2024, 3, 1)
+    assert bucket_month(None) is None
+
+def test_chunks_respect_item_and_byte_limits(monkeypatch):
+    items = [{"sha": str(index)} for index in range(5)]
+    size = len(bson.encode(items[0]))
+    monkeypatch.setattr(settings, "BUCKET_MAX_ITEMS", 2)
+    assert [len(chunk) for chunk, _ in BucketStorage._chunks(items)] == [2, 2, 1]
+    monkeypatch.setattr(settings, "BUCKET_MAX_ITEMS", 100)
+    monkeypatch.setattr(settings, "BUCKET_MAX_BYTES", size * 3)
+    chunks = BucketStorage._chunks(items)
+    assert [len(chunk) for chunk, _ in chunks] == [3, 2]
+    assert [total for _, total in chunks] == [size * 3, size * 2]
+
+def test_upserts_group_by_month_and_leave_room(monkeypatch):
+    monkeypatch.setattr(settings, "BUCKET_MAX_ITEMS", 1000)
+    storage = BucketStorage("github_commits")
+    ops = storage.upserts([
+        commit("a", datetime(2024, 1, 5)),
+        commit("b", datetime(2024, 1, 20)),
+        commit("c", datetime(2024, 2, 1))
+    ])
+
+    assert [type(op) for op in ops] == [UpdateMany, BucketUpdate, UpdateMany, BucketUpdate]
+    january = ops[1]._filter
+    assert january["month"] == datetime(2024, 1, 1)
+    assert january["count"] == {"$lte": 998}
+    assert ops[1].documents == 2
+    items = ops[1]._doc[0]["$set"]["items"]["$concatArrays"][1]["$literal"]
+    assert [item["sha"] for item in items] == ["a", "b"]
+    # Fields kept on the bucket are not repeated on its items
+    assert "tenant_id" not in items[0] and "repository_id" not in items[0]
+    # The page's keys are taken out of the month before they are added back
+    assert ops[0]._filter == {"tenant_id": 5, "repository_id": 10, "month": datetime(2024, 1, 1), "items.sha": {"$in": ["a", "b"]}}
+
+def test_deletes():
+    storage = BucketStorage("github_commits")
+    [remove] = storage.delete(5, 10, ["a"])
+    assert remove._filter == {"tenant_id": 5, "repository_id": 10, "items.sha": {"$in": ["a"]}}
+    [drop] = storage.delete_repositories(5, [10, 11])
+    assert isinstance(drop, DeleteMany)
+    assert drop._filter == {"tenant_id": 5, "repository_id": {"$in": [10, 11]}}
+
+def test_bucket_match_narrows_to_months():
+    storage = BucketStorage("github_commits")
+    assert storage._bucket_match({"tenant_id": 5, "sha": "a"}) == {"tenant_id": 5}
+    assert storage._bucket_match({"author_date": datetime(2024, 1, 5)}) == {"month": datetime(2024, 1, 1)}
+    assert storage._bucket_match({"author_date": {"$in": [datetime(2024, 2, 3), datetime(2024, 1, 5), None]}}) == {
+        "month": {"$in": [datetime(2024, 1, 1), datetime(2024, 2, 1)]}
+    }
+    assert storage._bucket_match({"author_date": {"$gt": datetime(2024, 1, 5), "$lt": datetime(2024, 3, 2)}}) == {
+        "month": {"$gte": datetime(2024, 1, 1), "$lte": datetime(2024, 3, 1)}
+    }
+
+def test_unwind_restores_flat_documents():
+    storage = BucketStorage("github_commits")
+    query = {"tenant_id": 5, "message": "Fix"}
+    pipeline = storage._unwind(query)
+    assert pipeline[0] == {"$match": {"tenant_id": 5}}
+    assert pipeline[1] == {"$unwind": "$items"}
+    assert pipeline[2]["$replaceRoot"]["newRoot"]["$mergeObjects"][0] == {"_id": "$items.sha"}
+    assert pipeline[-1] == {"$match": query}
+    assert storage._sort([("_id", -1)]) == [("author_date", -1)]
+
+def test_page_months_skips_whole_months():
+    storage = BucketStorage("github_commits")
+
+    async def months(db, query, direction):
+        return [(datetime(2024, 3, 1), 10), (datetime(2024, 2, 1), 10), (datetime(2024, 1, 1), 10)]
+    storage._months = months
+
+    assert asyncio.run(storage._page_months(None, {}, -1, 0, 5)) == ([datetime(2024, 3, 1)], 0)
+    assert asyncio.run(storage._page_months(None, {}, -1, 12, 5)) == ([datetime(2024, 2, 1)], 2)
+    assert asyncio.run(storage._page_months(None, {}, -1, 18, 5)) == ([datetime(2024, 2, 1), datetime(2024, 1, 1)], 8)
+    assert asyncio.run(storage._page_months(None, {}, -1, 30, 5)) == ([], 0)
+
+def test_find_reads_only_the_page_months():
+    storage = BucketStorage("github_commits")
+
+    async def months(db, query, direction):
+        return [(datetime(2024, 3, 1), 10), (datetime(2024, 2, 1), 10)]
+    storage._months = months
+    db = FakeDB()
+
+    asyncio.run(storage.find(db, {"tenant_id": 5}, [("_id", -1)], 12, 5))
+    [pipeline] = db.pipelines
+    assert pipeline[0] == {"$match": {"tenant_id": 5, "month": {"$in": [datetime(2024, 2, 1)]}}}
+    assert pipeline[-3:] == [{"$sort": {"author_date": -1}}, {"$skip": 2}, {"$limit": 5}]
+
+def test_find_unwinds_item_level_queries():
+    storage = BucketStorage("github_commits")
+    db = FakeDB()
+    asyncio.run(storage.find(db, {"tenant_id": 5, "sha": "a"}, [], 0, 20))
+    [pipeline] = db.pipelines
+    assert pipeline[:-2] == storage._unwind({"tenant_id": 5, "sha": "a"})
+    assert pipeline[-2:] == [{"$skip": 0}, {"$limit": 20}]
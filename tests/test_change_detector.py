@@ -0,0 +1,30 @@
+from datetime import datetime
+from src.helpers.change_detector import ChangeDetector, content_hash
+
+def test_content_hash_follows_content():
+    doc = {"sha": "abc", "message": "Fix", "author_date": datetime(2024, 1, 1)}
+    assert content_hash(doc) == content_hash(dict(doc))
+    assert content_hash(doc) != content_hash({**doc, "message": "Fix typo"})
+    assert len(content_hash(doc)) == 32
+
+def test_filter_skips_unchanged_documents():
+    detector = ChangeDetector(db=None)
+    unchanged = {"github_id": 1, "title": "Same"}
+    changed = {"github_id": 2, "title": "New title"}
+    new = {"github_id": 3, "title": "New"}
+    known = {1: content_hash(unchanged), 2: content_hash({"github_id": 2, "title": "Old title"})}
+
+    result = detector.filter("github_pulls", [dict(unchanged), changed, new], known)
+
+    assert [doc["github_id"] for doc in result] == [2, 3]
+    assert result[0]["content_hash"] == content_hash({"github_id": 2, "title": "New title"})
+    assert detector.stats()["checked"] == 3
+    assert detector.stats()["skipped"] == 1
+    assert detector.stats()["collections"]["github_pulls"]["skip_ratio"] == round(1 / 3, 4)
+
+def test_stale_keys():
+    assert sorted(ChangeDetector.stale({"a": "1", "b": "2", "c": None}, ["a", "c", "d"])) == ["b"]
+    assert ChangeDetector.stale({}, ["a"]) == []
+
+def test_stats_without_checks():
+    assert ChangeDetector(db=None).stats() == {"checked": 0, "skipped": 0, "skip_ratio": 0.0, "collections": {}}
@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+import pytest
+from src.config import settings
+from src.helpers.query_filter import (
+    MAX_IN_VALUES, FilterError, check_sort_field, compile_filter, guard_query, matches, plan_violation
+)
+
+def test_equality_is_coerced_to_the_field_type():
+    assert compile_filter("github_pulls", {"state": "open", "number": "42"}) == {"state": "open", "number": 42}
+
+def test_membership_and_ranges():
+    query = compile_filter("github_pulls", {
+        "repository_id": {"in": [1, "2"]},
+        "created_at": {"gte": "2024-01-01T00:00:00Z", "$lt": "2024-02-01"}
+    })
+    assert query["repository_id"] == {"$in": [1, 2]}
+    assert query["created_at"] == {
+        "$gte": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "$lt": datetime(2024, 2, 1, tzinfo=timezone.utc)
+    }
+
+def test_nullable_fields_accept_null():
+    assert compile_filter("github_pulls", {"merged_at": None}) == {"merged_at": None}
+    with pytest.raises(FilterError, match="cannot be null"):
+        compile_filter("github_pulls", {"state": None})
+
+@pytest.mark.parametrize("filters, message", [
+    ([], "JSON object"),
+    ({"tenant_id": 1}, "Cannot filter"),
+    ({"secret": 1}, "Cannot filter"),
+    ({"state": {"$where": "1"}}, "Unsupported operator"),
+    ({"title": {"$regex": "x"}}, "Unsupported operator"),
+    ({"state": {"gt": "a"}}, "Range operators"),
+    ({"state": {}}, "Empty condition"),
+    ({"number": {"in": []}}, "non-empty list"),
+    ({"number": {"in": list(range(MAX_IN_VALUES + 1))}}, "at most"),
+    ({"number": "many"}, "expected int"),
+    ({"number": True}, "expected int"),
+    ({"created_at": "yesterday"}, "expected datetime")
+])
+def test_rejected_filters(filters, message):
+    with pytest.raises(FilterError, match=message):
+        compile_filter("github_pulls", filters)
+
+def test_sort_fields():
+    check_sort_field("github_pulls", "_id")
+    check_sort_field("github_pulls", "created_at")
+    with pytest.raises(FilterError):
+        check_sort_field("github_pulls", "tenant_id")
+
+def test_plan_violation():
+    assert plan_violation("github_pulls", {"tenant_id": 1, "state": "open"}, []) is None
+    assert plan_violation("github_pulls", {"tenant_id": 1}, [("updated_at", -1)]) is None
+    assert plan_violation("github_pulls", {"tenant_id": 1, "title": "x"}, []) is not None
+    assert plan_violation("github_pulls", {"tenant_id": 1}, [("title", 1)]) is not None
+    # A filter on an indexed key serves any sort
+    assert plan_violation("github_pulls", {"tenant_id": 1, "repository_id": 3}, [("title", 1)]) is None
+
+def test_id_is_only_indexed_where_an_index_leads_with_it():
+    assert plan_violation("github_repos", {"tenant_id": 1}, [("_id", 1)]) is None
+    assert plan_violation("github_commits", {"tenant_id": 1}, [("_id", 1)]) is not None
+
+def test_user_lookups_are_served_by_the_exact_indexes():
+    # The collated login and email indexes only serve queries with their collation
+    assert plan_violation("github_users", {"tenant_id": 1, "login": "octocat"}, []) is None
+    assert plan_violation("github_users", {"tenant_id": 1, "emails": "octo@example.com"}, []) is None
+
+def test_guard_modes(monkeypatch):
+    query, sort = {"tenant_id": 1, "title": "x"}, []
+    monkeypatch.setattr(settings, "FILTER_GUARD_MODE", "reject")
+    with pytest.raises(FilterError):
+        guard_query("github_pulls", query, sort)
+    monkeypatch.setattr(settings, "FILTER_GUARD_MODE", "warn")
+    guard_query("github_pulls", query, sort)
+    monkeypatch.setattr(settings, "FILTER_GUARD_MODE", "off")
+    guard_query("github_pulls", query, sort)
+
+def test_matches_compiled_filters():
+    doc = {"state": "open", "number": 7, "labels": ["bug", "ui"], "created_at": datetime(2024, 1, 15), "merged_at": None}
+    assert matches(compile_filter("github_issues", {"state": "open", "labels": "bug"}), doc)
+    assert not matches(compile_filter("github_issues", {"labels": "docs"}), doc)
+    # Stored times are naive UTC
+    assert matches(compile_filter("github_issues", {"created_at": {"gte": "2024-01-01", "lt": "2024-02-01"}}), doc)
+    assert not matches(compile_filter("github_issues", {"created_at": {"gt": "2024-01-15T00:00:00Z"}}), doc)
+    assert matches(compile_filter("github_issues", {"number": {"in": [1, 7]}}), doc)
+    assert matches({"merged_at": None}, doc)
+    assert not matches({"number": {"$gt": None}}, doc)
+
+def test_matches_keyword_search():
+    doc = {"title": "Fix Login", "body": None}
+    search = {"$or": [{"title": {"$regex": "login", "$options": "i"}}, {"body": {"$regex": "login", "$options": "i"}}]}
+    assert matches(search, doc)
+    assert not matches({"$or": [{"title": {"$regex": "login"}}]}, doc)
+    assert not matches({"title": {"$regex": "("}}, doc)
@@ -0,0 +1,86 @@
+import asyncio
+from starlette.requests import Request
+from src.config import settings
+from src.helpers.rate_limiter import (
+    MemoryBucketStore, RateLimiter, _route, address_key, client_key, request_cost
+)
+
+def request(query: str = "", path: str = "/data/github_pulls", host: str = "1.2.3.4") -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": path, "query_string": query.encode(),
+        "client": (host, 1234), "headers": []
+    })
+
+def test_routes():
+    assert _route("/data") == "search"
+    assert _route("/data/github_pulls") == "list"
+    assert _route("/data/github_pulls/changes") == "changes"
+    assert _route("/data/github_pulls/123") == "document"
+    assert _route("/integrations") is None
+    assert _route("/") is None
+
+def test_request_cost(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_SEARCH_COST", 10)
+    monkeypatch.setattr(settings, "RATE_LIMIT_SKIP_PER_TOKEN", 1000)
+    assert request_cost("search", request()) == 10
+    assert request_cost("list", request()) == 1
+    assert request_cost("list", request("page=11&limit=100")) == 2
+    assert request_cost("list", request("page=abc")) == 1
+    assert request_cost("document", request("page=1000")) == 1
+
+def test_client_keys():
+    assert client_key(request("user_id=5")) == "user:5@1.2.3.4"
+    assert client_key(request()) == "addr:1.2.3.4"
+    assert address_key(request("user_id=5")) == "addr:1.2.3.4"
+
+def test_memory_bucket_spends_and_refills():
+    store = MemoryBucketStore()
+    assert asyncio.run(store.take("a", 3, rate=1, burst=3)) == 0
+    wait = asyncio.run(store.take("a", 2, rate=1, burst=3))
+    assert 1.9 < wait <= 2
+    # Another client has its own bucket
+    assert asyncio.run(store.take("b", 3, rate=1, burst=3)) == 0
+
+def test_memory_bucket_refills_over_time(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("src.helpers.rate_limiter.time.monotonic", lambda: clock[0])
+    store = MemoryBucketStore()
+    assert asyncio.run(store.take("a", 3, rate=1, burst=3)) == 0
+    assert asyncio.run(store.take("a", 1, rate=1, burst=3)) == 1
+    clock[0] += 1
+    assert asyncio.run(store.take("a", 1, rate=1, burst=3)) == 0
+
+def test_address_bucket_caps_rotating_user_ids(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_STORE", "memory")
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 5)
+    monkeypatch.setattr(settings, "RATE_LIMIT_RATE", 0.001)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ADDRESS_BURST", 8)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ADDRESS_RATE", 0.001)
+    limiter = RateLimiter()
+
+    waits = [asyncio.run(limiter._wait(request(f"user_id={user_id}"), 1)) for user_id in range(10)]
+    assert waits[:8] == [0] * 8
+    assert all(wait > 0 for wait in waits[8:])
+    # Another address is not affected
+    assert asyncio.run(limiter._wait(request("user_id=1", host="5.6.7.8"), 1)) == 0
+
+def test_user_bucket_is_spent_before_the_address_bucket(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_STORE", "memory")
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 2)
+    monkeypatch.setattr(settings, "RATE_LIMIT_RATE", 0.001)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ADDRESS_BURST", 100)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ADDRESS_RATE", 0.001)
+    limiter = RateLimiter()
+
+    waits = [asyncio.run(limiter._wait(request("user_id=1"), 1)) for _ in range(3)]
+    assert waits[:2] == [0, 0]
+    assert waits[2] > 0
+    # A denied request does not also spend from its address
+    tokens, _ = limiter.address_store.buckets["addr:1.2.3.4"]
+    assert round(tokens) == 98
+
+def test_costs_above_the_burst_are_capped(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_STORE", "memory")
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 5)
+    limiter = RateLimiter()
+    assert asyncio.run(limiter._wait(request(), 50)) == 0
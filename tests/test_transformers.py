@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from src.helpers.transformers import MAPPINGS, TRANSFORMERS, parse_timestamp
+
+CONTEXT = {"user_id": 5, "repository_id": 10, "repository_name": "octo/repo", "issue_number": 3}
+
+USER = {"login": "octocat", "id": 1}
+
+def test_parse_timestamp():
+    assert parse_timestamp("2024-03-01T12:30:00Z") == datetime(2024, 3, 1, 12, 30, tzinfo=timezone.utc)
+
+def test_organization():
+    doc = TRANSFORMERS["github_organizations"]({
+        "login": "octo", "id": 9, "url": "https://api.github.com/orgs/octo", "avatar_url": None,
+        "created_at": "2020-01-01T00:00:00Z", "updated_at": "2024-01-01T00:00:00Z"
+    }, CONTEXT)
+    assert doc["tenant_id"] == 5
+    assert doc["github_id"] == 9
+    assert doc["name"] is None
+    assert doc["description"] is None
+    assert doc["created_at"] == datetime(2020, 1, 1, tzinfo=timezone.utc)
+    assert MAPPINGS["github_organizations"].validate([doc]) == [doc]
+
+def test_commit_nested_and_missing_fields():
+    doc = TRANSFORMERS["github_commits"]({
+        "sha": "abc",
+        "commit": {
+            "message": "$set everything",
+            "author": {"name": "Octo", "email": "octo@example.com", "date": "2024-01-02T03:04:05Z"},
+            "committer": {"date": "2024-01-02T03:04:06Z"}
+        },
+        # GitHub sends null when it cannot match the author to an account
+        "author": None,
+        "html_url": "https://github.com/octo/repo/commit/abc"
+    }, CONTEXT)
+    assert doc["message"] == "$set everything"
+    assert doc["author_name"] == "Octo"
+    assert doc["author_login"] is None
+    assert doc["committer_name"] is None
+    assert doc["additions"] is None
+    assert doc["repository_id"] == 10
+    assert doc["repository_name"] == "octo/repo"
+    assert MAPPINGS["github_commits"].validate([doc]) == [doc]
+
+def test_issues_skip_pull_requests_and_pluck_labels():
+    item = {
+        "id": 4, "number": 3, "title": "Broken", "state": "open", "user": USER,
+        "labels": [{"name": "bug"}, {"name": "ui"}], "html_url": "https://github.com/octo/repo/issues/3",
+        "created_at": "2024-01-01T00:00:00Z", "updated_at": "2024-01-02T00:00:00Z"
+    }
+    doc = TRANSFORMERS["github_issues"](item, CONTEXT)
+    assert doc["labels"] == ["bug", "ui"]
+    assert doc["closed_at"] is None
+    assert doc["assignee_login"] is None
+    assert TRANSFORMERS["github_issues"]({**item, "pull_request": {"url": "x"}}, CONTEXT) is None
+    assert TRANSFORMERS["github_issues"]({**item, "labels": None}, CONTEXT)["labels"] == []
+
+def test_validate_drops_only_invalid_documents():
+    item = {
+        "id": 1, "event": "closed", "actor": USER, "created_at": "2024-01-01T00:00:00Z", "issue": {"id": 4}
+    }
+    good = TRANSFORMERS["github_changelogs"](item, CONTEXT)
+    bad = {**good, "actor_id": "not a number"}
+    assert MAPPINGS["github_changelogs"].validate([bad, good]) == [good]
+
+def test_users_fill_profile_defaults():
+    doc = TRANSFORMERS["github_users"]({**USER, "html_url": "https://github.com/octocat"}, CONTEXT)
+    assert doc["integration_user_id"] == 5
+    assert doc["followers"] == 0
+    assert doc["name"] is None
+    assert isinstance(doc["updated_at"], datetime)